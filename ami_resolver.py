@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Iterable
+from dotenv import load_dotenv
+from aws_pool import aws
+
+load_dotenv()
+
+AMI_CACHE_TTL = float(os.getenv("AMI_CACHE_TTL", "21600"))
+AMI_MAX_WORKERS = int(os.getenv("AMI_MAX_WORKERS", "16"))
+SSM_PREFIX = "resolve:ssm:"
+
+
+class AMIResolver:
+    # Turns `resolve:ssm:` AMI sources into concrete AMI IDs, so launches and
+    # tfvars carry the ID actually used and RunInstances skips its own SSM
+    # lookup. Literal AMI IDs pass straight through.
+    #
+    # start() prefetches every region at once (one GetParameters per region,
+    # regions in parallel) and re-fetches in the background every ttl/2, so
+    # lookups are normally cache hits. An expired entry is still served while
+    # a refresh is queued; a region that has never resolved is fetched inline.
+    # If SSM is unreachable, the last good ID or else the SSM source itself
+    # (which EC2 and terraform can still resolve) is returned.
+    def __init__(self, sources: dict[str, str], ttl: float = AMI_CACHE_TTL):
+        self.sources = dict(sources)
+        self.ttl = ttl
+        self._cache: dict[str, tuple[str, float]] = {}
+        self._errors: dict[str, str] = {}
+        self._pool = ThreadPoolExecutor(max_workers=min(AMI_MAX_WORKERS, len(self.sources)) or 1,
+                                        thread_name_prefix="ami")
+        self._region_locks = {region: threading.Lock() for region in self.sources}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # === Fetch ===
+    def _fetch_region(self, region: str, force: bool = True):
+        source = self.sources[region]
+        if not source.startswith(SSM_PREFIX):
+            return
+        parameter = source[len(SSM_PREFIX):]
+        with self._region_locks[region]:
+            if not force and region in self._cache:
+                # Someone else fetched it while we waited for the lock.
+                return
+            try:
+                response = aws.call(lambda: aws.client("ssm", region).get_parameters(Names=[parameter]))
+                values = {p["Name"]: p["Value"] for p in response["Parameters"]}
+                ami_id = values.get(parameter)
+                if not ami_id:
+                    raise LookupError(f"parameter {parameter} not found")
+                self._cache[region] = (ami_id, time.time())
+                self._errors.pop(region, None)
+            except Exception as e:
+                self._errors[region] = str(e)
+                print(f"⚠️ AMI lookup failed for {region}: {e}")
+
+    def refresh(self, regions: Iterable[str] | None = None):
+        list(self._pool.map(self._fetch_region, [r for r in (regions or self.sources) if r in self.sources]))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._wake.wait(self.ttl / 2)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ami-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    # === Lookups ===
+    def resolve(self, region: str, fetch: bool = True) -> str | None:
+        source = self.sources.get(region)
+        if source is None or not source.startswith(SSM_PREFIX):
+            return source
+        cached = self._cache.get(region)
+        if cached is None and fetch:
+            self._fetch_region(region, force=False)
+            cached = self._cache.get(region)
+        elif cached and time.time() - cached[1] > self.ttl:
+            self._wake.set()
+        return cached[0] if cached else source
+
+    def images(self, regions: Iterable[str]) -> dict[str, str]:
+        # Several regions at once; any missing ones are fetched in parallel first.
+        regions = [r for r in regions if r in self.sources]
+        missing = [r for r in regions if r not in self._cache]
+        if missing:
+            list(self._pool.map(partial(self._fetch_region, force=False), missing))
+        return {r: self.resolve(r, fetch=False) for r in regions}
+
+    def snapshot(self) -> dict[str, dict]:
+        now = time.time()
+        return {region: {
+            "source": source,
+            "ami_id": self._cache[region][0] if region in self._cache else None,
+            "age": round(now - self._cache[region][1]) if region in self._cache else None,
+            "error": self._errors.get(region),
+        } for region, source in self.sources.items()}
@@ -0,0 +1,81 @@
+import threading
+import boto3
+from botocore.exceptions import ClientError, NoCredentialsError
+
+# Error codes that mean the pooled credentials are stale rather than the call being bad.
+EXPIRED_CREDENTIAL_CODES = {"ExpiredToken", "ExpiredTokenException", "RequestExpired", "InvalidClientTokenId"}
+
+
+class AWSClientPool:
+    # One boto3 Session per credential source (profile, or the default chain),
+    # shared by every region. Credentials are resolved once per session; when
+    # they are refreshable (instance role, SSO, assume-role) botocore refreshes
+    # them in place, so every pooled client picks up new keys centrally.
+    #
+    # Clients are thread-safe and cached per (profile, region, service).
+    # Resources are not, so they are cached per (profile, region, service) per thread.
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sessions: dict[str | None, boto3.session.Session] = {}
+        self._clients: dict[tuple, object] = {}
+        self._local = threading.local()
+        self._generation = 0
+
+    def session(self, profile: str | None = None) -> boto3.session.Session:
+        with self._lock:
+            session = self._sessions.get(profile)
+            if session is None:
+                session = boto3.session.Session(profile_name=profile)
+                self._sessions[profile] = session
+            return session
+
+    def client(self, service: str, region: str | None = None, profile: str | None = None):
+        key = (profile, region, service)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self.session(profile).client(service, region_name=region)
+                    self._clients[key] = client
+        return client
+
+    def resource(self, service: str, region: str | None = None, profile: str | None = None):
+        if getattr(self._local, "generation", None) != self._generation:
+            self._local.resources = {}
+            self._local.generation = self._generation
+        key = (profile, region, service)
+        resource = self._local.resources.get(key)
+        if resource is None:
+            with self._lock:
+                resource = self.session(profile).resource(service, region_name=region)
+            self._local.resources[key] = resource
+        return resource
+
+    def invalidate(self, profile: str | None = None):
+        # Drops the session and everything built from it, so the next call
+        # re-resolves credentials (e.g. after static keys were rotated).
+        with self._lock:
+            self._sessions.pop(profile, None)
+            for key in [k for k in self._clients if k[0] == profile]:
+                del self._clients[key]
+            self._generation += 1
+
+    def call(self, fn, profile: str | None = None):
+        # Runs fn() and, if it fails on stale credentials, refreshes the pool once and retries.
+        try:
+            return fn()
+        except (ClientError, NoCredentialsError) as e:
+            if not is_expired_credentials_error(e):
+                raise
+            self.invalidate(profile)
+            return fn()
+
+
+def is_expired_credentials_error(error: Exception) -> bool:
+    if isinstance(error, NoCredentialsError):
+        return True
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") in EXPIRED_CREDENTIAL_CODES
+
+
+aws = AWSClientPool()
@@ -0,0 +1,305 @@
+import asyncio
+import base64
+import importlib.util
+import os
+import random
+import time
+from dotenv import load_dotenv
+import httpx
+
+load_dotenv()
+
+AZURE_API_VERSION = "7.1-preview.1"
+
+AZURE_HTTP_TIMEOUT = float(os.getenv("AZURE_HTTP_TIMEOUT", "15"))
+AZURE_HTTP_RETRIES = int(os.getenv("AZURE_HTTP_RETRIES", "3"))
+AZURE_HTTP_BACKOFF = float(os.getenv("AZURE_HTTP_BACKOFF", "0.5"))
+AZURE_HTTP_MAX_CONNECTIONS = int(os.getenv("AZURE_HTTP_MAX_CONNECTIONS", "20"))
+# h2 is in requirements.txt; the check only keeps environments without it
+# (httpx raises on http2=True if h2 is missing) on HTTP/1.1.
+AZURE_HTTP2 = importlib.util.find_spec("h2") is not None
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Poll fast while a run is queued/starting, then back off for long applies.
+PIPELINE_POLL_MIN = float(os.getenv("PIPELINE_POLL_MIN", "5"))
+PIPELINE_POLL_MAX = float(os.getenv("PIPELINE_POLL_MAX", "60"))
+PIPELINE_POLL_BACKOFF = float(os.getenv("PIPELINE_POLL_BACKOFF", "1.5"))
+PIPELINE_RUN_TIMEOUT = float(os.getenv("PIPELINE_RUN_TIMEOUT", "7200"))
+
+PIPELINE_ID_TTL = float(os.getenv("PIPELINE_ID_TTL", "3600"))
+PIPELINE_PAGE_SIZE = int(os.getenv("PIPELINE_PAGE_SIZE", "200"))
+
+RESULT_ICONS = {"succeeded": "✅", "failed": "❌", "canceled": "❎"}
+
+
+class AzureDevOpsClient:
+    # One pooled, keep-alive client for all dev.azure.com traffic, opened and
+    # closed with the app lifespan. The auth header is built once here.
+    #
+    # Retries use full-jitter exponential backoff (honouring Retry-After).
+    # Non-idempotent requests (triggering a run) are only retried when they
+    # provably never ran: connect failures and 429s.
+    def __init__(self, org: str, project: str, pat: str, retries: int = AZURE_HTTP_RETRIES):
+        self.base_url = f"https://dev.azure.com/{org}/{project}/_apis"
+        self.headers = {
+            "Authorization": "Basic " + base64.b64encode(f":{pat}".encode()).decode(),
+            "Accept": "application/json",
+        }
+        self.retries = retries
+        self._client = None
+
+    def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                http2=AZURE_HTTP2,
+                timeout=httpx.Timeout(AZURE_HTTP_TIMEOUT, connect=5),
+                limits=httpx.Limits(max_connections=AZURE_HTTP_MAX_CONNECTIONS,
+                                    max_keepalive_connections=AZURE_HTTP_MAX_CONNECTIONS, keepalive_expiry=60),
+            )
+
+    async def aclose(self):
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        self.start()
+        kwargs["params"] = {"api-version": AZURE_API_VERSION, **kwargs.get("params", {})}
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(self.retries + 1):
+            delay = None
+            try:
+                resp = await self._client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                retryable = idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if attempt == self.retries or not retryable:
+                    raise
+            else:
+                retryable = resp.status_code in RETRY_STATUSES and (idempotent or resp.status_code == 429)
+                if attempt == self.retries or not retryable:
+                    return resp
+                delay = _retry_after(resp)
+            await asyncio.sleep(delay if delay is not None else random.uniform(0, AZURE_HTTP_BACKOFF * 2 ** attempt))
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    try:
+        return min(float(resp.headers["Retry-After"]), 60.0)
+    except (KeyError, ValueError):
+        return None
+
+
+class PipelineResolver:
+    # Pipeline name -> ID, cached for PIPELINE_ID_TTL. A miss walks the
+    # pipeline list a page at a time (continuation tokens) and stops at the
+    # first match; concurrent misses for the same name share one lookup.
+    # Callers invalidate() a name when its ID comes back 404 (pipeline
+    # deleted or recreated) and resolve again.
+    def __init__(self, api: AzureDevOpsClient, ttl: float = PIPELINE_ID_TTL):
+        self.api = api
+        self.ttl = ttl
+        self._ids: dict[str, tuple[int, float]] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    def start(self, warm: list[str] = ()):
+        # Warm-up lookups run in the background; a request arriving first
+        # simply joins the in-flight lookup.
+        for name in warm:
+            self._lookup_task(name.lower())
+
+    async def stop(self):
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def resolve(self, name: str) -> int | None:
+        key = name.lower()
+        cached = self._ids.get(key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        return await asyncio.shield(self._lookup_task(key))
+
+    def _lookup_task(self, key: str) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._lookup(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key) if self._inflight.get(key) is t else None)
+        return task
+
+    def invalidate(self, name: str):
+        self._ids.pop(name.lower(), None)
+
+    async def _lookup(self, key: str) -> int | None:
+        token = None
+        try:
+            while True:
+                params = {"$top": PIPELINE_PAGE_SIZE, "orderBy": "name asc"}
+                if token:
+                    params["continuationToken"] = token
+                resp = await self.api.get("/pipelines", params=params)
+                resp.raise_for_status()
+                for p in resp.json().get("value", []):
+                    if p["name"].lower() == key:
+                        self._ids[key] = (p["id"], time.monotonic() + self.ttl)
+                        return p["id"]
+                token = resp.headers.get("x-ms-continuationtoken")
+                if not token:
+                    return None
+        except Exception as e:
+            print("Error fetching pipeline ID:", e)
+            return None
+
+
+class TrackedRun:
+    # One pipeline run and every job it carries (several when launches were
+    # coalesced into one run).
+    def __init__(self, jobs: list, pipeline_id: int, run_id: int, on_done=None):
+        self.jobs = jobs
+        self.pipeline_id = pipeline_id
+        self.run_id = run_id
+        self.on_done = on_done
+        self.started = time.monotonic()
+        self.interval = PIPELINE_POLL_MIN
+        self.next_check = self.started + self.interval
+        self.state = None
+        self.result = None
+
+    def backoff(self, now: float):
+        self.interval = min(self.interval * PIPELINE_POLL_BACKOFF, PIPELINE_POLL_MAX)
+        self.next_check = now + self.interval
+
+
+class PipelineRunPoller:
+    # One asyncio task tracks every outstanding run. Each tick it lists the
+    # recent runs of every pipeline that has a run due, so N runs of the same
+    # pipeline cost one request, and writes state changes back to their jobs.
+    def __init__(self, api: AzureDevOpsClient):
+        self.api = api
+        self.runs: dict[int, TrackedRun] = {}
+        self._task = None
+        self._wake = asyncio.Event()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def track(self, jobs: list, pipeline_id: int, run_id: int, on_done=None):
+        # on_done() runs once the run reaches a final state (or tracking gives up).
+        for job in jobs:
+            job.start()
+            job.meta.update(pipeline_id=pipeline_id, run_id=run_id)
+            job.progress(f"⏳ Waiting for pipeline run {run_id}...")
+        self.runs[run_id] = TrackedRun(jobs, pipeline_id, run_id, on_done)
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            due = [r for r in self.runs.values() if r.next_check <= now]
+            if due:
+                try:
+                    await self._check(due)
+                except Exception as e:
+                    print(f"[ERROR] Pipeline run poller tick failed: {e}")
+            wait = min((r.next_check for r in self.runs.values()), default=now + PIPELINE_POLL_MAX) - time.monotonic()
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(wait, 0.05))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _check(self, due: list[TrackedRun]):
+        by_pipeline: dict[int, list[TrackedRun]] = {}
+        for run in due:
+            by_pipeline.setdefault(run.pipeline_id, []).append(run)
+        results = await asyncio.gather(*(self._list_runs(pid) for pid in by_pipeline), return_exceptions=True)
+
+        now = time.monotonic()
+        for runs, listed in zip(by_pipeline.values(), results):
+            for run in runs:
+                info = listed.get(run.run_id) if isinstance(listed, dict) else None
+                if info is None and not isinstance(listed, Exception):
+                    # Older than the list window: fall back to a direct lookup.
+                    info = await self._get_run(run)
+                if info is not None:
+                    self._apply(run, info)
+                if run.run_id not in self.runs:
+                    continue
+                if now - run.started > PIPELINE_RUN_TIMEOUT:
+                    self._finish(run, "fail", f"❌ Gave up on pipeline run {run.run_id} after {PIPELINE_RUN_TIMEOUT:.0f}s.")
+                else:
+                    run.backoff(now)
+            if isinstance(listed, Exception):
+                print(f"[WARN] Pipeline run poll failed: {listed}")
+
+    async def _list_runs(self, pipeline_id: int) -> dict[int, dict]:
+        resp = await self.api.get(f"/pipelines/{pipeline_id}/runs")
+        resp.raise_for_status()
+        return {r["id"]: r for r in resp.json().get("value", [])}
+
+    async def _get_run(self, run: TrackedRun) -> dict | None:
+        try:
+            resp = await self.api.get(f"/pipelines/{run.pipeline_id}/runs/{run.run_id}")
+            resp.raise_for_status()
+            return resp.json()
+        except Exception as e:
+            print(f"[WARN] Pipeline run {run.run_id} lookup failed: {e}")
+            return None
+
+    def _apply(self, run: TrackedRun, info: dict):
+        state = info.get("state")
+        if state != run.state:
+            run.state = state
+            if state != "completed":
+                for job in run.jobs:
+                    job.progress(f"🔄 Pipeline run {run.run_id} is {state}.")
+        if state != "completed":
+            return
+        result = info.get("result", "unknown")
+        message = f"{RESULT_ICONS.get(result, '⚠️')} Pipeline run {run.run_id} {result}."
+        run.result = {
+            "pipeline_id": run.pipeline_id,
+            "run_id": run.run_id,
+            "result": result,
+            "url": info.get("_links", {}).get("web", {}).get("href"),
+            "finished": info.get("finishedDate"),
+        }
+        if result == "succeeded":
+            self._finish(run, "succeed", message)
+        elif result == "canceled":
+            self._finish(run, "cancel", message)
+        else:
+            self._finish(run, "fail", message)
+
+    def _finish(self, run: TrackedRun, outcome: str, message: str):
+        self.runs.pop(run.run_id, None)
+        for job in run.jobs:
+            if run.result:
+                job.result = dict(run.result)
+            if outcome == "succeed":
+                job.succeed(message, result=job.result)
+            else:
+                getattr(job, outcome)(message)
+        if run.on_done:
+            try:
+                run.on_done()
+            except Exception as e:
+                print(f"[ERROR] Pipeline run {run.run_id} completion callback failed: {e}")
@@ -0,0 +1,83 @@
+# Microbenchmark: compiled IntentRouter vs the old if/elif substring chain from main2.py.
+# Run with: python bench_intent_router.py [iterations]
+import sys
+import timeit
+from intent_router import INTENT_TABLE, IntentRouter, router
+
+CORPUS = [
+    "hi",
+    "hello there, what can you do?",
+    "this is a long message that mentions nothing the agent knows about but keeps going for a while",
+    "show me my account details please",
+    "which regions are available?",
+    "what is the total instance count in mumbai",
+    "create ec2 in mumbai",
+    "please spin up vm in oregon with t2.micro",
+    "launch instance in frankfurt",
+    "terminate ec2 in singapore",
+    "delete vm in ireland right now",
+    "status",
+    "what's the status of my last launch in ap-south-1?",
+    "yes",
+    "no, cancel that",
+    "how do I open port 22 on a security group in us-east-1 region?",
+    "what is terraform state and why does it drift from the real infrastructure?",
+]
+
+
+def legacy_route(user_input: str) -> str | None:
+    # Copy of the pre-router chain in main2.py's chat(), kept here for comparison.
+    if "hi" in user_input or "hello" in user_input:
+        return "greeting"
+    elif "account" in user_input and "detail" in user_input:
+        return "account_details"
+    elif "region" in user_input:
+        return "list_regions"
+    elif "total instance" in user_input:
+        return "total_instances"
+    elif any(kw in user_input for kw in ["create ec2", "launch instance", "spin up vm", "create vm", "start server", "create server"]):
+        return "create_ec2"
+    elif any(kw in user_input for kw in ["terminate ec2", "destroy ec2", "remove ec2", "delete ec2", "terminate instance", "delete vm", "remove instance"]):
+        return "terminate_ec2"
+    elif "status" in user_input:
+        return "status"
+    return None
+
+
+def per_message_us(fn, messages: list[str], iterations: int) -> float:
+    seconds = min(timeit.repeat(lambda: [fn(m) for m in messages], number=iterations, repeat=5))
+    return seconds / (iterations * len(messages)) * 1e6
+
+
+def scaled_table(extra: int) -> list[tuple[str, list[str]]]:
+    # Pads the real table with synthetic two-word phrases to show how each
+    # approach grows with the number of keywords.
+    filler = [f"keyword{i} phrase{i}" for i in range(extra)]
+    return INTENT_TABLE + [("filler", filler)]
+
+
+def run(iterations: int):
+    messages = [m.lower() for m in CORPUS]
+
+    print(f"Current table ({sum(len(p) for _, p in INTENT_TABLE)} phrases):")
+    print(f"  legacy chain   {per_message_us(legacy_route, messages, iterations):8.2f} µs/message")
+    print(f"  intent router  {per_message_us(router.route, messages, iterations):8.2f} µs/message")
+
+    for extra in (200, 1000):
+        table = scaled_table(extra)
+        phrases = [p for _, group in table for p in group]
+        scaled_router = IntentRouter(table)
+        chain = lambda m: [p for p in phrases if p in m]  # resolves every intent, like the router
+        print(f"\nScaled table ({len(phrases)} phrases):")
+        print(f"  substring scan {per_message_us(chain, messages, iterations // 10 or 1):8.2f} µs/message")
+        print(f"  intent router  {per_message_us(scaled_router.route, messages, iterations // 10 or 1):8.2f} µs/message")
+
+    print("\nRouting differences (legacy -> router):")
+    for m in messages:
+        old, new = legacy_route(m), router.route(m)
+        if old != new:
+            print(f"  {m!r}: {old} -> {new}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
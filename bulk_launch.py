@@ -0,0 +1,197 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+from aws_pool import aws
+from instance_watcher import watcher
+from region_resolver import find_regions
+
+load_dotenv()
+
+BULK_LAUNCH_MAX_PER_REGION = int(os.getenv("BULK_LAUNCH_MAX_PER_REGION", "100"))
+# At or above this many instances per region, CreateFleet is used instead of RunInstances.
+BULK_FLEET_THRESHOLD = int(os.getenv("BULK_FLEET_THRESHOLD", "50"))
+BULK_MAX_REGIONS = int(os.getenv("BULK_MAX_REGIONS", "16"))
+BULK_PROGRESS_INTERVAL = 1.0
+DEFAULT_INSTANCE_TYPE = "t2.micro"
+
+COUNT_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+               "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "dozen": 12}
+INSTANCE_TYPE = r"[a-z][a-z0-9-]*\d[a-z0-9-]*\.(?:nano|micro|small|medium|large|\d*xlarge|metal)"
+INSTANCE_TYPE_PATTERN = re.compile(rf"\b({INSTANCE_TYPE})\b")
+# "20 instances", "5 new ec2 servers", "3 x t3.large", "two t3.small vms"
+COUNT_PATTERN = re.compile(
+    r"\b(\d+|" + "|".join(COUNT_WORDS) + r")\s*(?:x\s*)?(?:new\s+)?"
+    rf"(?:{INSTANCE_TYPE}\b|(?:ec2\s+)?(?:instances?|servers?|vms?|machines?|nodes?|boxes)\b)"
+)
+TOTAL_PATTERN = re.compile(r"\b(in total|total|altogether|overall|split)\b")
+LAUNCH_VERB_PATTERN = re.compile(r"\b(?:launch|create|spin\s+up)\b")
+
+
+class LaunchRequest(NamedTuple):
+    regions: list[str]
+    counts: dict[str, int]
+    instance_type: str
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def describe(self) -> str:
+        return ", ".join(f"{n}× {self.instance_type} in **{r}**" for r, n in self.counts.items())
+
+
+def is_launch_request(text: str) -> bool:
+    # Intent detector for launches phrased around a count ("create 5 ec2
+    # instances in mumbai"): a launch verb, a count and a region.
+    text = text.lower()
+    return bool(LAUNCH_VERB_PATTERN.search(text) and COUNT_PATTERN.search(text) and find_regions(text))
+
+
+def parse_launch_request(text: str, default_type: str = DEFAULT_INSTANCE_TYPE) -> LaunchRequest:
+    # "launch 20 instances across mumbai and oregon" is 20 per region;
+    # "40 t3.small in total across mumbai and oregon" is split between them.
+    text = text.lower()
+    regions = find_regions(text)[:BULK_MAX_REGIONS]
+    match = COUNT_PATTERN.search(text)
+    count = 1
+    if match:
+        word = match.group(1)
+        count = int(word) if word.isdigit() else COUNT_WORDS[word]
+    type_match = INSTANCE_TYPE_PATTERN.search(text)
+    instance_type = type_match.group(1) if type_match else default_type
+
+    counts = {}
+    if regions and TOTAL_PATTERN.search(text) and len(regions) > 1:
+        share, extra = divmod(count, len(regions))
+        # Every named region gets at least one instance, even when the total
+        # is smaller than the number of regions; the reply shows the real counts.
+        counts = {r: share + (1 if i < extra else 0) for i, r in enumerate(regions)}
+    else:
+        counts = dict.fromkeys(regions, count)
+    counts = {r: max(1, min(n, BULK_LAUNCH_MAX_PER_REGION)) for r, n in counts.items()}
+    return LaunchRequest(list(counts), counts, instance_type)
+
+
+class _Group:
+    # Aggregate progress for one bulk launch across its regions.
+    def __init__(self, job, request: LaunchRequest):
+        self.job = job
+        self.request = request
+        self._lock = threading.Lock()
+        self._posted = 0.0
+        self.regions = {r: {"requested": n, "state": "launching", "instance_ids": [], "running": 0,
+                            "failed": 0, "errors": []} for r, n in request.counts.items()}
+
+    def update(self, region: str, force: bool = False, **changes):
+        with self._lock:
+            entry = self.regions[region]
+            for key, value in changes.items():
+                if key in ("running", "failed"):
+                    entry[key] += value
+                elif key == "errors":
+                    entry["errors"].extend(value)
+                else:
+                    entry[key] = value
+            now = time.monotonic()
+            if not force and now - self._posted < BULK_PROGRESS_INTERVAL:
+                return
+            self._posted = now
+            self.job.progress(self.line())
+
+    def line(self) -> str:
+        running = sum(e["running"] for e in self.regions.values())
+        parts = [f"{r}: {e['running']}/{e['requested']} {e['state']}" for r, e in self.regions.items()]
+        return f"🚀 {running}/{self.request.total} running · " + " · ".join(parts)
+
+
+def _launch_template(region: str, image_id: str, instance_type: str) -> str:
+    # CreateFleet needs a launch template; one per (AMI, type) is created on
+    # first use and reused after that.
+    name = "Terraform-Agent-" + hashlib.sha256(f"{image_id}|{instance_type}".encode()).hexdigest()[:12]
+    try:
+        aws.call(lambda: aws.client("ec2", region).create_launch_template(
+            LaunchTemplateName=name,
+            LaunchTemplateData={"ImageId": image_id, "InstanceType": instance_type},
+        ))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "InvalidLaunchTemplateName.AlreadyExistsException":
+            raise
+    return name
+
+
+def _tags(instance_name: str) -> list[dict]:
+    return [{"ResourceType": "instance", "Tags": [{"Key": "Name", "Value": instance_name}]}]
+
+
+def _start_instances(region: str, count: int, image_id: str, instance_type: str,
+                     instance_name: str) -> tuple[list[str], list[str]]:
+    # (instance IDs, capacity errors). Both calls are best effort: a partial
+    # launch returns what it got instead of failing the whole region.
+    if count < BULK_FLEET_THRESHOLD:
+        response = aws.call(lambda: aws.client("ec2", region).run_instances(
+            ImageId=image_id, InstanceType=instance_type, MinCount=1, MaxCount=count,
+            TagSpecifications=_tags(instance_name),
+        ))
+        return [i["InstanceId"] for i in response["Instances"]], []
+
+    template = _launch_template(region, image_id, instance_type)
+    response = aws.call(lambda: aws.client("ec2", region).create_fleet(
+        Type="instant",
+        TargetCapacitySpecification={"TotalTargetCapacity": count, "DefaultTargetCapacityType": "on-demand"},
+        LaunchTemplateConfigs=[{"LaunchTemplateSpecification": {"LaunchTemplateName": template, "Version": "$Latest"}}],
+        TagSpecifications=_tags(instance_name),
+    ))
+    ids = [i for group in response.get("Instances", []) for i in group.get("InstanceIds", [])]
+    errors = sorted({e.get("ErrorMessage") or e.get("ErrorCode", "") for e in response.get("Errors", [])})
+    return ids, errors
+
+
+_region_pool = ThreadPoolExecutor(max_workers=BULK_MAX_REGIONS, thread_name_prefix="bulk-launch")
+
+
+def bulk_launch(job, request: LaunchRequest, image_for: Callable[[str], str | None], instance_name: str):
+    # Job worker: one RunInstances/CreateFleet per region, all regions at
+    # once; the new instances are then tracked by the shared watcher.
+    group = _Group(job, request)
+    group.update(request.regions[0], force=True)
+
+    def launch_region(region: str) -> list[str]:
+        image_id = image_for(region)
+        if not image_id:
+            group.update(region, state="failed", errors=[f"no AMI configured for {region}"], force=True)
+            return []
+        try:
+            ids, errors = _start_instances(region, request.counts[region], image_id, request.instance_type,
+                                           instance_name)
+        except Exception as e:
+            group.update(region, state="failed", errors=[str(e)], force=True)
+            return []
+        group.update(region, state="starting", instance_ids=ids, errors=errors, force=True)
+        futures = watcher.watch(region, ids, "running")
+        for future in futures.values():
+            future.add_done_callback(lambda f, r=region: group.update(
+                r, **({"failed": 1} if f.exception() else {"running": 1})))
+        for future in futures.values():
+            future.exception()
+        entry = group.regions[region]
+        group.update(region, state="running" if entry["running"] == entry["requested"] else "partial", force=True)
+        return ids
+
+    all_ids = [i for ids in _region_pool.map(launch_region, request.regions) for i in ids]
+    running = sum(e["running"] for e in group.regions.values())
+    result = {"instance_ids": all_ids, "regions": group.regions}
+    summary = group.line()
+    problems = [f"⚠️ {r}: {err}" for r, e in group.regions.items() for err in e["errors"]]
+    if running == 0:
+        job.fail("\n".join([f"❌ Bulk launch failed. {summary}"] + problems))
+        job.result = result
+        return
+    icon = "✅" if running == request.total else "⚠️"
+    job.succeed("\n".join([f"{icon} {running}/{request.total} instance(s) running. {summary}"] + problems),
+                result=result)
@@ -0,0 +1,49 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LAUNCH_COALESCE_WINDOW = float(os.getenv("LAUNCH_COALESCE_WINDOW", "5"))
+LAUNCH_BATCH_MAX = int(os.getenv("LAUNCH_BATCH_MAX", "20"))
+
+
+class Coalescer:
+    # Collects items for up to `window` seconds after the first one arrives
+    # (or until `max_batch` are pending) and hands them to flush(items) as one
+    # batch. Each batch is flushed on its own task, so a slow flush never
+    # holds up the next window.
+    def __init__(self, flush, window: float = LAUNCH_COALESCE_WINDOW, max_batch: int = LAUNCH_BATCH_MAX):
+        self.flush = flush
+        self.window = window
+        self.max_batch = max_batch
+        self.pending: list = []
+        self._timer = None
+        self._flushing: set[asyncio.Task] = set()
+
+    def add(self, item):
+        self.pending.append(item)
+        if len(self.pending) >= self.max_batch:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        self._flush_now()
+
+    def _flush_now(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.create_task(self.flush(batch))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def drain(self):
+        # Flushes whatever is pending and waits for in-flight batches (shutdown).
+        self._flush_now()
+        await asyncio.gather(*self._flushing, return_exceptions=True)
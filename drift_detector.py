@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+from dotenv import load_dotenv
+from aws_pool import aws
+from tfstate_index import StateEntry
+
+load_dotenv()
+
+DRIFT_MAX_WORKERS = int(os.getenv("DRIFT_MAX_WORKERS", "16"))
+# EC2 rejects a filter with more than 200 values (FilterLimitExceeded).
+DRIFT_BATCH_SIZE = 200
+DRIFT_TAG = ("Name", os.getenv("DRIFT_TAG_VALUE", "Terraform-Agent-Instance"))
+
+LIVE_PROJECTION = "Reservations[].Instances[].[InstanceId, State.Name, InstanceType, ImageId, Tags]"
+GONE_STATES = {"terminated", "shutting-down"}
+
+
+class LiveInstance:
+    __slots__ = ("id", "state", "instance_type", "ami", "tags")
+
+    def __init__(self, instance_id, state, instance_type, ami, tags):
+        self.id = instance_id
+        self.state = state
+        self.instance_type = instance_type
+        self.ami = ami
+        self.tags = {t["Key"]: t["Value"] for t in tags or []}
+
+    def fingerprint(self) -> tuple:
+        return self.state, self.instance_type, self.ami, tuple(sorted(self.tags.items()))
+
+
+def compare(entry: StateEntry, live: LiveInstance | None) -> dict | None:
+    # None when state and reality agree, otherwise one drift record.
+    if live is None or live.state in GONE_STATES:
+        return {"kind": "missing", "address": entry.address, "id": entry.id, "region": entry.region,
+                "differences": {"instance_state": {"state": entry.attributes.get("instance_state"),
+                                                   "live": live.state if live else None}}}
+    attrs = entry.attributes
+    differences = {}
+    for name, live_value in (("instance_type", live.instance_type), ("ami", live.ami),
+                             ("instance_state", live.state), ("tags", live.tags)):
+        state_value = attrs.get(name, {} if name == "tags" else None)
+        if state_value != live_value:
+            differences[name] = {"state": state_value, "live": live_value}
+    if not differences:
+        return None
+    return {"kind": "modified", "address": entry.address, "id": entry.id, "region": entry.region,
+            "differences": differences}
+
+
+class DriftDetector:
+    # Compares every aws_instance in terraform state with what EC2 reports,
+    # and flags agent-tagged instances that no state knows about.
+    #
+    # Scans are incremental. One cheap paginated sweep per region lists the
+    # agent-tagged instances; only state entries whose state digest changed,
+    # whose tagged live fingerprint changed, or that were drifted last time
+    # are re-described (in batches of up to 200 IDs, regions in parallel).
+    # Everything else keeps its previous verdict.
+    def __init__(self, max_workers: int = DRIFT_MAX_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="drift")
+        self._lock = threading.Lock()
+        self._seen: dict[str, tuple[str, tuple | None]] = {}
+        self._verdicts: dict[str, dict | None] = {}
+        self.last_report: dict | None = None
+
+    # === AWS calls ===
+    def _describe(self, region: str, filters: list[dict]) -> list[LiveInstance]:
+        paginator = aws.client("ec2", region).get_paginator("describe_instances")
+        pages = paginator.paginate(Filters=filters, PaginationConfig={"PageSize": 1000})
+        return [LiveInstance(*row) for row in pages.search(LIVE_PROJECTION)]
+
+    def _tagged(self, region: str) -> list[LiveInstance]:
+        return aws.call(lambda: self._describe(region, [{"Name": f"tag:{DRIFT_TAG[0]}", "Values": [DRIFT_TAG[1]]}]))
+
+    def _by_ids(self, region: str, ids: list[str]) -> list[LiveInstance]:
+        # A filter (unlike InstanceIds=) tolerates IDs that no longer exist.
+        live = []
+        for start in range(0, len(ids), DRIFT_BATCH_SIZE):
+            batch = ids[start:start + DRIFT_BATCH_SIZE]
+            live += aws.call(lambda: self._describe(region, [{"Name": "instance-id", "Values": batch}]))
+        return live
+
+    def _fan_out(self, fn, work: dict[str, tuple]) -> tuple[dict, dict]:
+        futures = {region: self._pool.submit(fn, region, *args) for region, args in work.items()}
+        results, errors = {}, {}
+        for region, future in futures.items():
+            try:
+                results[region] = future.result()
+            except Exception as e:
+                errors[region] = str(e)
+        return results, errors
+
+    # === Scan ===
+    def scan(self, entries: Iterable[StateEntry], regions: Iterable[str], full: bool = False) -> dict:
+        with self._lock:
+            return self._scan([e for e in entries if e.type == "aws_instance" and e.id], regions, full)
+
+    def _scan(self, entries: list[StateEntry], regions: Iterable[str], full: bool) -> dict:
+        started = time.time()
+        sweep_regions = sorted(set(regions) | {e.region for e in entries if e.region})
+        tagged, errors = self._fan_out(self._tagged, dict.fromkeys(sweep_regions, ()))
+        tagged_live = {i.id: i for instances in tagged.values() for i in instances}
+
+        if full:
+            self._seen.clear()
+            self._verdicts.clear()
+        due: dict[str, list[StateEntry]] = {}
+        for e in entries:
+            live = tagged_live.get(e.id)
+            seen = (e.digest, live.fingerprint() if live else None)
+            if self._seen.get(e.address) != seen or self._verdicts.get(e.address) is not None:
+                due.setdefault(e.region, []).append(e)
+
+        described, describe_errors = self._fan_out(self._by_ids, {r: ([e.id for e in es],) for r, es in due.items()})
+        errors.update(describe_errors)
+        for region, region_entries in due.items():
+            if region not in described:
+                continue
+            live_by_id = {i.id: i for i in described[region]}
+            for e in region_entries:
+                live = live_by_id.get(e.id)
+                self._verdicts[e.address] = compare(e, live)
+                tagged_one = tagged_live.get(e.id)
+                self._seen[e.address] = (e.digest, tagged_one.fingerprint() if tagged_one else None)
+
+        addresses = {e.address for e in entries}
+        for address in list(self._seen):
+            if address not in addresses:
+                self._seen.pop(address)
+                self._verdicts.pop(address, None)
+
+        known_ids = {e.id for e in entries}
+        unmanaged = [{
+            "kind": "unmanaged", "address": None, "id": i.id, "region": region,
+            "differences": {"instance_state": {"state": None, "live": i.state}},
+        } for region, instances in tagged.items() for i in instances
+            if i.id not in known_ids and i.state not in GONE_STATES]
+
+        checked = sum(len(es) for es in due.values())
+        self.last_report = {
+            "scanned_at": started,
+            "duration": round(time.time() - started, 3),
+            "resources": len(entries),
+            "checked": checked,
+            "skipped": len(entries) - checked,
+            "drift": [v for v in self._verdicts.values() if v] + unmanaged,
+            "errors": errors,
+        }
+        return self.last_report
+
+
+def describe_report(report: dict, limit: int = 15) -> str:
+    drift = report["drift"]
+    lines = [f"🧭 Drift scan: {report['resources']} instance(s) in state, {report['checked']} rechecked, "
+             f"{report['skipped']} unchanged since last scan."]
+    if not drift:
+        lines.append("✅ Terraform state matches live EC2.")
+    icons = {"missing": "👻", "modified": "✏️", "unmanaged": "🆕"}
+    for item in drift[:limit]:
+        label = item["address"] or f"{DRIFT_TAG[1]} (not in state)"
+        details = ", ".join(f"{k}: {v['state']} → {v['live']}" for k, v in item["differences"].items())
+        lines.append(f"  {icons[item['kind']]} {item['kind']} · {label} · {item['id']} · {item['region']} · {details}")
+    if len(drift) > limit:
+        lines.append(f"  …and {len(drift) - limit} more")
+    for region, error in report["errors"].items():
+        lines.append(f"  ⚠️ {region}: {error}")
+    return "\n".join(lines)
+
+
+drift_detector = DriftDetector()
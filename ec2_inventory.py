@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, NamedTuple
+from dotenv import load_dotenv
+from aws_pool import aws
+
+load_dotenv()
+
+INVENTORY_REFRESH_INTERVAL = float(os.getenv("INVENTORY_REFRESH_INTERVAL", "60"))
+INVENTORY_MAX_WORKERS = int(os.getenv("INVENTORY_MAX_WORKERS", "16"))
+
+# Only the fields the index needs come back from each page.
+INSTANCE_PROJECTION = "Reservations[].Instances[].[InstanceId, State.Name, InstanceType, Tags]"
+LIVE_STATES = ["pending", "running", "shutting-down", "stopping", "stopped"]
+
+
+class InstanceRecord(NamedTuple):
+    instance_id: str
+    region: str
+    state: str
+    instance_type: str
+    name: str
+    tags: tuple[tuple[str, str], ...]
+
+
+class RegionSlice:
+    # Immutable snapshot of one region plus its secondary indexes. A refresh
+    # builds a new slice and swaps it in, so readers never need a lock.
+    def __init__(self, region: str, records: list[InstanceRecord], refreshed_at: float, error: str | None = None):
+        self.region = region
+        self.records = {r.instance_id: r for r in records}
+        self.refreshed_at = refreshed_at
+        self.error = error
+        self.by_state: dict[str, set[str]] = {}
+        self.by_type: dict[str, set[str]] = {}
+        self.by_tag: dict[tuple[str, str], set[str]] = {}
+        for r in records:
+            self.by_state.setdefault(r.state, set()).add(r.instance_id)
+            self.by_type.setdefault(r.instance_type, set()).add(r.instance_id)
+            for tag in r.tags:
+                self.by_tag.setdefault(tag, set()).add(r.instance_id)
+
+    def select(self, state: str | None = None, instance_type: str | None = None,
+               tag: tuple[str, str] | None = None) -> set[str] | None:
+        # None means "no filter given": every record in the slice matches.
+        sets = []
+        if state:
+            sets.append(self.by_state.get(state, set()))
+        if instance_type:
+            sets.append(self.by_type.get(instance_type, set()))
+        if tag:
+            sets.append(self.by_tag.get(tag, set()))
+        if not sets:
+            return None
+        return set.intersection(*sorted(sets, key=len))
+
+
+class EC2Inventory:
+    def __init__(self, regions: Iterable[str], interval: float = INVENTORY_REFRESH_INTERVAL):
+        self.regions = list(regions)
+        self.interval = interval
+        self.slices: dict[str, RegionSlice] = {}
+        self._pool = ThreadPoolExecutor(max_workers=min(INVENTORY_MAX_WORKERS, len(self.regions)) or 1,
+                                        thread_name_prefix="inventory")
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # === Refresh ===
+    def _fetch_region(self, region: str) -> RegionSlice:
+        try:
+            paginator = aws.client("ec2", region).get_paginator("describe_instances")
+            pages = paginator.paginate(
+                Filters=[{"Name": "instance-state-name", "Values": LIVE_STATES}],
+                PaginationConfig={"PageSize": 1000}
+            )
+            records = []
+            for instance_id, state, instance_type, tags in pages.search(INSTANCE_PROJECTION):
+                tags = tuple(sorted((t["Key"], t["Value"]) for t in tags or []))
+                name = dict(tags).get("Name", "")
+                records.append(InstanceRecord(instance_id, region, state, instance_type, name, tags))
+            return RegionSlice(region, records, time.time())
+        except Exception as e:
+            previous = self.slices.get(region)
+            # Keep serving the last good snapshot, flagged with the error.
+            records = list(previous.records.values()) if previous else []
+            refreshed_at = previous.refreshed_at if previous else 0.0
+            return RegionSlice(region, records, refreshed_at, error=str(e))
+
+    def refresh(self, regions: Iterable[str] | None = None):
+        # Fans out one paginated DescribeInstances per region concurrently. A
+        # caller arriving while a refresh runs waits for it instead of starting another.
+        with self._refresh_lock:
+            for region_slice in self._pool.map(self._fetch_region, list(regions or self.regions)):
+                self.slices[region_slice.region] = region_slice
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="inventory-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def refresh_soon(self):
+        self._wake.set()
+
+    # === Queries ===
+    def _slices(self, region: str | None) -> list[RegionSlice]:
+        if region:
+            return [self.slices[region]] if region in self.slices else []
+        return list(self.slices.values())
+
+    def count(self, region: str | None = None, state: str | None = None,
+              instance_type: str | None = None, tag: tuple[str, str] | None = None) -> int:
+        total = 0
+        for s in self._slices(region):
+            ids = s.select(state, instance_type, tag)
+            total += len(s.records) if ids is None else len(ids)
+        return total
+
+    def instances(self, region: str | None = None, state: str | None = None,
+                  instance_type: str | None = None, tag: tuple[str, str] | None = None) -> list[InstanceRecord]:
+        found = []
+        for s in self._slices(region):
+            ids = s.select(state, instance_type, tag)
+            found.extend(s.records.values() if ids is None else (s.records[i] for i in ids))
+        return found
+
+    def state_counts(self, region: str | None = None) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for s in self._slices(region):
+            for state, ids in s.by_state.items():
+                counts[state] = counts.get(state, 0) + len(ids)
+        return counts
+
+    def has(self, region: str) -> bool:
+        s = self.slices.get(region)
+        return s is not None and s.refreshed_at > 0
+
+    def age(self, region: str | None = None) -> float | None:
+        stamps = [s.refreshed_at for s in self._slices(region) if s.refreshed_at]
+        return time.time() - min(stamps) if stamps else None
+
+    def errors(self) -> dict[str, str]:
+        return {r: s.error for r, s in self.slices.items() if s.error}
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from typing import Iterable
+from dotenv import load_dotenv
+from aws_pool import aws
+
+load_dotenv()
+
+INSTANCE_WATCH_INTERVAL = float(os.getenv("INSTANCE_WATCH_INTERVAL", "5"))
+INSTANCE_WATCH_TIMEOUT = float(os.getenv("INSTANCE_WATCH_TIMEOUT", "600"))
+INSTANCE_WATCH_MAX_WORKERS = int(os.getenv("INSTANCE_WATCH_MAX_WORKERS", "16"))
+# EC2 rejects a filter with more than 200 values (FilterLimitExceeded).
+INSTANCE_WATCH_BATCH = 200
+
+WATCH_PROJECTION = "Reservations[].Instances[].[InstanceId, State.Name, PublicDnsName, PrivateIpAddress]"
+# States an instance can never come back from on its way to the target.
+DEAD_ENDS = {
+    "running": {"shutting-down", "terminated", "stopping", "stopped"},
+    "stopped": {"shutting-down", "terminated"},
+    "terminated": set(),
+}
+
+
+class InstanceStateError(Exception):
+    def __init__(self, instance_id: str, state: str, target: str):
+        self.instance_id = instance_id
+        self.state = state
+        self.target = target
+        super().__init__(f"instance {instance_id} went {state} while waiting for {target}")
+
+
+class _Watch:
+    __slots__ = ("region", "instance_id", "target", "deadline", "future")
+
+    def __init__(self, region: str, instance_id: str, target: str, deadline: float):
+        self.region = region
+        self.instance_id = instance_id
+        self.target = target
+        self.deadline = deadline
+        self.future: Future = Future()
+
+
+class InstanceWatcher:
+    # Replaces per-instance boto3 waiters. Every instance any job waits on is
+    # registered here with its target state; one background thread ticks
+    # every `interval` seconds and issues paginated DescribeInstances calls
+    # per region (instance-id filter, up to 200 IDs per call, regions in
+    # parallel), then resolves each instance's future once it reaches the
+    # target. A thousand pending instances cost five calls per region per
+    # tick instead of a thousand threads each polling on its own.
+    #
+    # The filter form is used rather than InstanceIds= because it tolerates
+    # IDs EC2 does not know yet (eventual consistency right after launch)
+    # or any more (long-terminated instances).
+    def __init__(self, interval: float = INSTANCE_WATCH_INTERVAL, max_workers: int = INSTANCE_WATCH_MAX_WORKERS):
+        self.interval = interval
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="instance-watch")
+        self._cond = threading.Condition()
+        self._watches: list[_Watch] = []
+        self._thread: threading.Thread | None = None
+        self.ticks = 0
+        self.calls = 0
+
+    def watch(self, region: str, instance_ids: Iterable[str], target: str = "running",
+              timeout: float = INSTANCE_WATCH_TIMEOUT) -> dict[str, Future]:
+        # One future per instance; each resolves to the instance's last
+        # described fields ({"state", "public_dns", "private_ip"}).
+        if target not in DEAD_ENDS:
+            raise ValueError(f"unsupported target state: {target}")
+        deadline = time.monotonic() + timeout
+        watches = [_Watch(region, i, target, deadline) for i in instance_ids]
+        with self._cond:
+            self._watches.extend(watches)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="instance-watcher", daemon=True)
+                self._thread.start()
+        return {w.instance_id: w.future for w in watches}
+
+    def wait(self, region: str, instance_ids: Iterable[str], target: str = "running",
+             timeout: float = INSTANCE_WATCH_TIMEOUT) -> dict[str, dict]:
+        # Blocking form for job workers: returns once every instance reached
+        # the target, or raises the first failure.
+        futures = self.watch(region, instance_ids, target, timeout)
+        wait_futures(futures.values())
+        return {instance_id: f.result() for instance_id, f in futures.items()}
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._watches)
+
+    # === Background loop ===
+    def _run(self):
+        while True:
+            with self._cond:
+                self._watches = [w for w in self._watches if not w.future.done()]
+                if not self._watches:
+                    self._thread = None
+                    return
+                watches = list(self._watches)
+            try:
+                self._tick(watches)
+            except Exception as e:
+                print(f"⚠️ Instance watcher tick failed: {e}")
+            with self._cond:
+                self._cond.wait(self.interval)
+
+    def _tick(self, watches: list[_Watch]):
+        self.ticks += 1
+        by_region: dict[str, list[_Watch]] = {}
+        for w in watches:
+            by_region.setdefault(w.region, []).append(w)
+        futures = {region: self._pool.submit(self._describe, region, sorted({w.instance_id for w in ws}))
+                   for region, ws in by_region.items()}
+
+        now = time.monotonic()
+        for region, region_watches in by_region.items():
+            try:
+                described = futures[region].result()
+            except Exception as e:
+                # Transient API errors just wait for the next tick.
+                print(f"⚠️ Instance watcher could not describe {region}: {e}")
+                described = None
+            for w in region_watches:
+                info = described.get(w.instance_id) if described is not None else None
+                self._settle(w, info, described is not None, now)
+
+    def _settle(self, w: _Watch, info: dict | None, described: bool, now: float):
+        if w.future.done():
+            # Cancelled by its caller in the meantime.
+            return
+        if info is None and described and w.target == "terminated":
+            # Gone from DescribeInstances entirely: terminated long enough ago.
+            w.future.set_result({"state": "terminated", "public_dns": None, "private_ip": None})
+        elif info and info["state"] == w.target:
+            w.future.set_result(info)
+        elif info and info["state"] in DEAD_ENDS[w.target]:
+            w.future.set_exception(InstanceStateError(w.instance_id, info["state"], w.target))
+        elif now >= w.deadline:
+            state = info["state"] if info else "unknown"
+            w.future.set_exception(TimeoutError(
+                f"instance {w.instance_id} still {state} after waiting for {w.target}"))
+
+    def _describe(self, region: str, instance_ids: list[str]) -> dict[str, dict]:
+        found = {}
+        for start in range(0, len(instance_ids), INSTANCE_WATCH_BATCH):
+            batch = instance_ids[start:start + INSTANCE_WATCH_BATCH]
+            self.calls += 1
+            pages = aws.call(lambda: list(aws.client("ec2", region).get_paginator("describe_instances").paginate(
+                Filters=[{"Name": "instance-id", "Values": batch}],
+                PaginationConfig={"PageSize": 1000},
+            ).search(WATCH_PROJECTION)))
+            for instance_id, state, public_dns, private_ip in pages:
+                found[instance_id] = {"state": state, "public_dns": public_dns or None, "private_ip": private_ip}
+        return found
+
+
+watcher = InstanceWatcher()
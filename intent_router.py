@@ -0,0 +1,103 @@
+import re
+from typing import Callable
+
+# === Intent table ===
+# Listed in priority order: when a message mentions several intents, the one
+# that appears first here wins ("hi, create ec2 in mumbai" is a launch, and
+# "create ec2 in region ap-south-1" is not a region listing). Phrases match on
+# word boundaries only, so "hi" no longer fires on "this" and "yes" no longer
+# fires on "yesterday".
+INTENT_TABLE: list[tuple[str, list[str]]] = [
+    ("create_ec2", [
+        "create ec2", "launch ec2", "launch instance", "launch an instance", "spin up vm",
+        "spin up an instance", "create vm", "create instance", "start server", "create server",
+    ]),
+    ("terminate_ec2", [
+        "terminate ec2", "destroy ec2", "remove ec2", "delete ec2", "terminate instance",
+        "terminate instances", "delete vm", "remove instance", "destroy instance",
+    ]),
+    ("refresh_inventory", [
+        "refresh inventory", "refresh now", "refresh instances", "rescan instances", "resync inventory",
+    ]),
+    ("total_instances", [
+        "total instance", "total instances", "how many instances", "instance count", "count instances",
+    ]),
+    ("list_instances", [
+        "list instances", "list my instances", "show instances", "show my instances", "my instances",
+        "list ec2", "show ec2",
+    ]),
+    ("account_details", [
+        "account detail", "account details", "account info", "account id", "my account",
+    ]),
+    ("drift", [
+        "check drift", "drift check", "detect drift", "drift report", "show drift", "any drift",
+        "is state in sync", "state out of sync",
+    ]),
+    ("state_diff", [
+        "what changed", "last apply", "state diff", "diff state", "state changes", "changes in state",
+    ]),
+    # Requests for this deployment's state only: "what is terraform state"
+    # is a general question and goes to the LLM.
+    ("terraform_state", [
+        "show terraform state", "show tf state", "show state", "show the state", "state summary",
+        "list deployed resources", "show deployed resources", "what is deployed", "what's deployed",
+    ]),
+    ("list_regions", ["region", "regions", "list regions", "available regions"]),
+    ("status", ["status", "progress"]),
+    ("greeting", ["hi", "hello", "hey"]),
+    ("confirm", ["yes", "y", "confirm", "proceed"]),
+    ("cancel", ["no", "n", "cancel", "abort"]),
+]
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class IntentRouter:
+    # The table is compiled once into a trie over word tokens (Aho-Corasick
+    # style, keyed by whole words rather than characters). A message is
+    # tokenized once and walked left to right; each position costs one dict
+    # lookup unless it starts a known phrase, so routing time depends on the
+    # message length, not on how many phrases the table holds.
+    def __init__(self, table: list[tuple[str, list[str]]]):
+        self.priority = {intent: rank for rank, (intent, _) in enumerate(table)}
+        self.detectors: list[tuple[str, Callable[[str], bool]]] = []
+        self.trie: dict = {}
+        for intent, phrases in table:
+            for phrase in phrases:
+                node = self.trie
+                for token in TOKEN_PATTERN.findall(phrase.lower()):
+                    node = node.setdefault(token, {})
+                # A phrase listed under two intents keeps the higher-priority one.
+                node.setdefault(None, intent)
+
+    def add_detector(self, intent: str, detect: Callable[[str], bool]):
+        # For messages no fixed phrase can capture ("launch 20 instances across
+        # mumbai and oregon"); only consulted when the trie missed the intent.
+        if (intent, detect) not in self.detectors:
+            self.detectors.append((intent, detect))
+
+    def match(self, text: str) -> list[str]:
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        found = set()
+        for i, token in enumerate(tokens):
+            node = self.trie.get(token)
+            j = i + 1
+            while node is not None:
+                if None in node:
+                    found.add(node[None])
+                if j == len(tokens):
+                    break
+                node = node.get(tokens[j])
+                j += 1
+        for intent, detect in self.detectors:
+            if intent not in found and detect(text):
+                found.add(intent)
+        return sorted(found, key=self.priority.__getitem__)
+
+    def route(self, text: str) -> str | None:
+        intents = self.match(text)
+        return intents[0] if intents else None
+
+
+router = IntentRouter(INTENT_TABLE)
@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from lock_manager import Lease, LockManager, locks as default_locks
+
+load_dotenv()
+
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "8"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "32"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "200"))
+
+JOB_QUEUE_FULL_REPLY = "🚦 Too many operations are queued right now. Please try again shortly."
+
+STATE_ICONS = {"queued": "🕓", "running": "⏳", "succeeded": "✅", "failed": "❌", "cancelled": "❎"}
+ACTIVE_STATES = {"queued", "running"}
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+class Job:
+    # One create/terminate/pipeline operation. Only its worker mutates it; the
+    # chat handler and /jobs API just read it.
+    def __init__(self, kind: str, description: str, **meta):
+        self.id = uuid.uuid4().hex[:8]
+        self.kind = kind
+        self.description = description
+        self.meta = meta
+        self.state = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.messages: list[tuple[float, str]] = []
+        self.result = None
+
+    @property
+    def message(self) -> str:
+        return self.messages[-1][1] if self.messages else self.description
+
+    @property
+    def active(self) -> bool:
+        return self.state in ACTIVE_STATES
+
+    def progress(self, message: str):
+        self.messages.append((time.time(), message))
+
+    def start(self):
+        self.state = "running"
+        self.started_at = time.time()
+
+    def succeed(self, message: str | None = None, result=None):
+        if not self.active:
+            return
+        if message:
+            self.progress(message)
+        self.result = result
+        self._finish("succeeded")
+
+    def fail(self, message: str):
+        self.progress(message)
+        self._finish("failed")
+
+    def cancel(self, message: str):
+        self.progress(message)
+        self._finish("cancelled")
+
+    def _finish(self, state: str):
+        if self.active:
+            self.state = state
+            self.finished_at = time.time()
+
+    def elapsed(self) -> float:
+        start = self.started_at or self.created_at
+        return (self.finished_at or time.time()) - start
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "description": self.description,
+            "state": self.state,
+            "meta": self.meta,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "message": self.message,
+            "progress": [{"at": at, "message": msg} for at, msg in self.messages],
+            "result": self.result,
+        }
+
+    def summary(self) -> str:
+        return f"{STATE_ICONS[self.state]} `{self.id}` {self.description} · {self.state} · {self.elapsed():.0f}s\n   {self.message}"
+
+    def report(self) -> str:
+        lines = [f"{STATE_ICONS[self.state]} Job `{self.id}`: {self.description} · **{self.state}** · {self.elapsed():.0f}s"]
+        lines += [f"  +{at - self.created_at:.0f}s {msg}" for at, msg in self.messages]
+        return "\n".join(lines)
+
+
+class JobEngine:
+    # Jobs run on a bounded worker pool. At most `max_workers` run at once and
+    # `max_queue` more may wait; beyond that submit() refuses new work. A job
+    # that names resource keys holds them for its whole run, so only jobs on
+    # conflicting resources serialize.
+    def __init__(self, max_workers: int = JOB_MAX_WORKERS, max_queue: int = JOB_MAX_QUEUE, history: int = JOB_HISTORY,
+                 locks: LockManager = default_locks):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.history = history
+        self.locks = locks
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs: dict[str, Job] = {}
+        self._pending = 0
+
+    def create(self, kind: str, description: str, **meta) -> Job:
+        # Registers a job without scheduling it, for flows that do some async
+        # work (e.g. triggering a pipeline) before handing it to a worker, or
+        # whose progress is driven from elsewhere (the pipeline run poller).
+        with self._lock:
+            job = Job(kind, description, **meta)
+            self._jobs[job.id] = job
+            self._prune()
+        return job
+
+    def run(self, job: Job, fn, *args, keys=(), mode: str = "write", lease: Lease | None = None) -> Job:
+        # Pass keys to have the locks taken for the job, or a lease the caller
+        # already holds; either way it is released when the job finishes.
+        # Locks are taken before the job reaches the pool, so a job waiting
+        # on a busy resource never occupies a worker that a job on another
+        # resource could use. Jobs handed to the pool or waiting on locks for
+        # it count against its capacity.
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                job.cancel(JOB_QUEUE_FULL_REPLY)
+                raise JobQueueFullError()
+            self._pending += 1
+        if lease is None and keys:
+            self.locks.acquire_then(keys, lambda lease: self._pool.submit(self._execute, job, fn, args, lease),
+                                    mode, owner=job.id, on_wait=lambda key: job.progress(f"🔒 Waiting for {key}..."))
+        else:
+            self._pool.submit(self._execute, job, fn, args, lease)
+        return job
+
+    def submit(self, kind: str, description: str, fn, *args, keys=(), mode: str = "write", **meta) -> Job:
+        return self.run(self.create(kind, description, **meta), fn, *args, keys=keys, mode=mode)
+
+    def _execute(self, job: Job, fn, args, lease: Lease | None):
+        try:
+            if not job.active:
+                return
+            job.start()
+            fn(job, *args)
+            job.succeed()
+        except Exception as e:
+            job.fail(f"❌ {job.description} failed: {str(e)}")
+        finally:
+            if lease:
+                lease.release()
+            with self._lock:
+                self._pending -= 1
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if not j.active]
+        for job in sorted(finished, key=lambda j: j.finished_at)[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def list(self, active_only: bool = False) -> list[Job]:
+        jobs = sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+        return [j for j in jobs if j.active] if active_only else jobs
+
+    def find_in(self, text: str) -> Job | None:
+        # Lets "status 3f9a1c2b" in chat address one job directly.
+        for token in text.replace("`", " ").split():
+            if token in self._jobs:
+                return self._jobs[token]
+        return None
+
+    def describe(self, recent: int = 3) -> str:
+        jobs = self.list()
+        active = [j for j in jobs if j.active]
+        finished = [j for j in jobs if not j.active][:recent]
+        if not active and not finished:
+            return "✅ No operations in progress."
+        lines = [f"📋 **{len(active)}** operation(s) in progress." if active else "✅ No operations in progress."]
+        lines += [j.summary() for j in active + finished]
+        return "\n".join(lines)
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Protocol
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# === Cache limits (overridable via .env) ===
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "llm_cache.sqlite3")  # "" disables the disk tier
+
+
+# === Key construction ===
+def normalize_prompt(text: str) -> str:
+    # "What is a t2.micro?" and "  what is a   t2.micro " should share one entry.
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip(" ?!.")
+
+
+def cache_key(prompt: str, model: str, temperature: float, system_prompt: str) -> str:
+    raw = json.dumps([normalize_prompt(prompt), model, temperature, system_prompt])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# === Disk tier ===
+class CacheTier(Protocol):
+    def get(self, key: str) -> tuple[str, float] | None: ...
+    def set(self, key: str, value: str, expires_at: float) -> None: ...
+
+
+class SQLiteCacheTier:
+    # Survives restarts. Calls are short and synchronous, so ResponseCache runs
+    # them via asyncio.to_thread; the lock serialises access to one connection.
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+
+    def get(self, key: str) -> tuple[str, float] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row and row[1] >= time.time():
+            return row[0], row[1]
+        return None
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+
+
+# === Read-through cache ===
+class ResponseCache:
+    # In-process LRU bounded by entry count and total bytes, with per-entry TTL,
+    # an optional disk tier behind it, and single-flight for identical misses.
+    def __init__(
+        self,
+        ttl: float = LLM_CACHE_TTL,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+        disk: CacheTier | None = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk = disk
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._bytes = 0
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def _get_memory(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.time():
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put_memory(self, key: str, value: str, expires_at: float):
+        size = len(value.encode())
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = (value, expires_at)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str):
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value.encode())
+
+    def peek(self, key: str) -> str | None:
+        # Memory-only lookup for callers that go on to get()/get_or_fetch()
+        # on None: a hit is counted here, the miss is left for that call.
+        value = self._get_memory(key)
+        if value is not None:
+            self.hits += 1
+        return value
+
+    async def get(self, key: str) -> str | None:
+        value = self._get_memory(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.disk is not None:
+            found = await asyncio.to_thread(self.disk.get, key)
+            if found is not None:
+                value, expires_at = found
+                self._put_memory(key, value, expires_at)
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl
+        self._put_memory(key, value, expires_at)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value, expires_at)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[str]]) -> str:
+        value = self._get_memory(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        # Identical prompts already in flight share one upstream call. The
+        # shield keeps one caller's timeout from cancelling the others.
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.shared += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[str]]) -> str:
+        value = await self.get(key)
+        if value is not None:
+            return value
+        value = await fetch()
+        await self.set(key, value)
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "shared_in_flight": self.shared,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+
+def build_cache() -> ResponseCache:
+    disk = SQLiteCacheTier(LLM_CACHE_DB) if LLM_CACHE_DB else None
+    return ResponseCache(disk=disk)
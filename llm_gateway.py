@@ -0,0 +1,137 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionMessageParam
+from llm_cache import ResponseCache, cache_key
+
+load_dotenv()
+
+# === Provider defaults ===
+TOGETHER_BASE_URL = "https://api.together.xyz/v1"
+TOGETHER_MODEL = "mistralai/Mistral-7B-Instruct-v0.1"
+OPENAI_MODEL = "gpt-3.5-turbo"
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# === Gateway limits (overridable via .env) ===
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+
+class LLMGateway:
+    # One shared AsyncOpenAI client per provider. Completions are awaited on the
+    # event loop instead of blocking it, and at most `max_concurrency` of them
+    # are in flight at once; the rest wait for a slot within their timeout.
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        system_prompt: str,
+        base_url: str | None = None,
+        temperature: float = 0.7,
+        max_tokens: int = 300,
+        timeout: float = LLM_TIMEOUT,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        cache: ResponseCache | None = None,
+        name: str = "llm",
+    ):
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        self.name = name
+        self.model = model
+        self.system_prompt = system_prompt
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.cache = cache
+
+    def build_messages(self, message: str) -> list[ChatCompletionMessageParam]:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": message}
+        ]
+
+    def cache_key(self, message: str) -> str:
+        return cache_key(message, self.model, self.temperature, self.system_prompt)
+
+    async def complete(self, message: str, timeout: float | None = None) -> str:
+        # The timeout covers both waiting for a slot and the completion itself.
+        timeout = timeout or self.timeout
+        fetch = lambda: asyncio.wait_for(self._complete(message), timeout)
+        if self.cache is None:
+            return await fetch()
+        return await asyncio.wait_for(self.cache.get_or_fetch(self.cache_key(message), fetch), timeout)
+
+    async def _complete(self, message: str) -> str:
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=self.build_messages(message),
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                )
+            finally:
+                self.in_flight -= 1
+        return (response.choices[0].message.content or "").strip()
+
+    async def stream(self, message: str, timeout: float | None = None) -> AsyncIterator[str]:
+        # Yields completion deltas as they arrive. Here the timeout bounds the
+        # wait for a slot, for the first token and for each gap between tokens,
+        # so a long answer that keeps streaming is never cut off.
+        timeout = timeout or self.timeout
+        key = self.cache_key(message) if self.cache is not None else None
+        if key is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        await asyncio.wait_for(self._slots.acquire(), timeout)
+        self.in_flight += 1
+        stream = None
+        try:
+            stream = await asyncio.wait_for(
+                self.client.chat.completions.create(
+                    model=self.model,
+                    messages=self.build_messages(message),
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True
+                ),
+                timeout
+            )
+            chunks = stream.__aiter__()
+            parts = []
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+            if key is not None and parts:
+                await self.cache.set(key, "".join(parts).strip())
+        finally:
+            if stream is not None:
+                await stream.close()
+            self.in_flight -= 1
+            self._slots.release()
+
+
+# === NDJSON framing for /chat/stream ===
+async def ndjson_stream(chunks: str | AsyncIterator[str]) -> AsyncIterator[str]:
+    # One {"delta": ...} line per chunk, then a closing {"done": true} line.
+    if isinstance(chunks, str):
+        yield json.dumps({"delta": chunks}) + "\n"
+    else:
+        async for delta in chunks:
+            yield json.dumps({"delta": delta}) + "\n"
+    yield json.dumps({"done": True}) + "\n"
@@ -0,0 +1,195 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# === Breaker / admission limits (overridable via .env) ===
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+LLM_MAX_WAITING = int(os.getenv("LLM_MAX_WAITING", "32"))
+
+# === Canned replies ===
+CIRCUIT_OPEN_REPLY = "🔌 AI assist is temporarily unavailable. EC2 commands and `status` still work — please retry the question in a bit."
+LOAD_SHED_REPLY = "🚦 AI assist is busy right now. Please retry in a moment."
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class LoadShedError(Exception):
+    pass
+
+
+# === Circuit breaker ===
+class CircuitBreaker:
+    # closed -> open after `failure_threshold` consecutive failures; open ->
+    # half_open once `reset_timeout` has passed; half_open lets `half_open_max`
+    # trial calls through and closes on success or re-opens on failure.
+    def __init__(
+        self,
+        failure_threshold: int = LLM_BREAKER_FAILURES,
+        reset_timeout: float = LLM_BREAKER_RESET,
+        half_open_max: int = 1,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max = half_open_max
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trials = 0
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self.trials = 0
+        if self.state == "half_open":
+            if self.trials >= self.half_open_max:
+                return False
+            self.trials += 1
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def record_abort(self):
+        # The call never reached the provider (shed or cancelled by the client),
+        # so it says nothing about provider health; just hand back the trial slot.
+        if self.state == "half_open" and self.trials:
+            self.trials -= 1
+
+    def retry_in(self) -> float:
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+
+# === Admission control ===
+class AdmissionQueue:
+    # At most `max_in_flight` calls run; up to `max_waiting` more may queue for
+    # a slot. Anything beyond that is shed immediately instead of piling up.
+    def __init__(self, max_in_flight: int = LLM_MAX_IN_FLIGHT, max_waiting: int = LLM_MAX_WAITING):
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.waiting = 0
+        self.shed = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._slots.locked() and self.waiting >= self.max_waiting:
+            self.shed += 1
+            raise LoadShedError()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+
+# === Guarded LLM ===
+class LLMGuard:
+    # Wraps a ProviderPool/LLMGateway. Answers already in the response cache
+    # bypass the breaker; while the circuit is open everything else fails fast.
+    def __init__(self, llm, breaker: CircuitBreaker | None = None, admission: AdmissionQueue | None = None):
+        self.llm = llm
+        self.breaker = breaker or CircuitBreaker()
+        self.admission = admission or AdmissionQueue()
+        self.timeout = llm.timeout
+        self.rejected = 0
+
+    async def _admit(self, message: str) -> str | None:
+        # Cache hits are served before the breaker is consulted: they never
+        # reach a provider, so they must not use up a half-open trial slot or
+        # close the breaker on a "success" that says nothing about its health.
+        # Only memory is peeked up front; an admitted call looks the key up
+        # (disk tier included) once more inside the pool, which counts the miss.
+        cache = getattr(self.llm, "cache", None)
+        key = self.llm.cache_key(message) if cache is not None else None
+        if key is not None:
+            cached = cache.peek(key)
+            if cached is not None:
+                return cached
+        if self.breaker.allow():
+            return None
+        # No call follows a rejection, so the disk tier gets its one lookup here.
+        if key is not None:
+            cached = await cache.get(key)
+            if cached is not None:
+                return cached
+        self.rejected += 1
+        raise CircuitOpenError()
+
+    async def complete(self, message: str, timeout: float | None = None) -> str:
+        timeout = timeout or self.timeout
+        cached = await self._admit(message)
+        if cached is not None:
+            return cached
+        try:
+            async with self.admission.slot():
+                reply = await asyncio.wait_for(self.llm.complete(message, timeout), timeout)
+        except LoadShedError:
+            self.breaker.record_abort()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.record_abort()
+            raise
+        self.breaker.record_success()
+        return reply
+
+    async def stream(self, message: str, timeout: float | None = None) -> AsyncIterator[str]:
+        cached = await self._admit(message)
+        if cached is not None:
+            yield cached
+            return
+        try:
+            async with self.admission.slot():
+                async for delta in self.llm.stream(message, timeout):
+                    yield delta
+        except LoadShedError:
+            self.breaker.record_abort()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.record_abort()
+            raise
+        self.breaker.record_success()
+
+    def describe(self) -> str:
+        state = self.breaker.state
+        line = f"🔌 AI circuit: **{state}**"
+        if state == "open":
+            line += f" (retry in {self.breaker.retry_in():.0f}s)"
+        return (
+            f"{line}\n"
+            f"🚦 AI queue: {self.admission.in_flight}/{self.admission.max_in_flight} in flight, "
+            f"{self.admission.waiting}/{self.admission.max_waiting} waiting, "
+            f"{self.admission.shed} shed, {self.rejected} fast-failed"
+        )
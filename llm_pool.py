@@ -0,0 +1,173 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import AsyncIterator
+from dotenv import load_dotenv
+from llm_cache import ResponseCache
+from llm_gateway import LLMGateway
+
+load_dotenv()
+
+# === Hedging limits (overridable via .env) ===
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "3"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+LLM_HEDGE_MAX_DELAY = float(os.getenv("LLM_HEDGE_MAX_DELAY", "10"))
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_LATENCY_WINDOW = 200
+
+
+# === Rolling latency stats ===
+class LatencyWindow:
+    def __init__(self, size: int = LLM_LATENCY_WINDOW):
+        self.samples: deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> float | None:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class ProviderStats:
+    def __init__(self):
+        self.latency = LatencyWindow()
+        self.first_token = LatencyWindow()
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+
+    def summary(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "wins": self.wins,
+            "p50": self.latency.percentile(0.50),
+            "p95": self.latency.percentile(0.95),
+            "ttft_p95": self.first_token.percentile(0.95),
+        }
+
+
+# === Provider pool ===
+class ProviderPool:
+    # Providers are tried in the configured order. If the current one has not
+    # answered within its own p95 (the hedge delay) the next one is started as
+    # well, and the first success wins while the loser is cancelled. A provider
+    # that fails outright is failed over immediately, without waiting.
+    # The response cache sits in front of the pool rather than the providers so
+    # that cache hits never feed the latency windows used for hedging.
+    def __init__(self, providers: list[LLMGateway], cache: ResponseCache | None = None):
+        if not providers:
+            raise ValueError("ProviderPool needs at least one provider")
+        self.providers = providers
+        self.cache = cache
+        self.stats = {p.name: ProviderStats() for p in providers}
+        self.timeout = max(p.timeout for p in providers)
+
+    def cache_key(self, message: str) -> str:
+        return self.providers[0].cache_key(message)
+
+    def hedge_delay(self, provider: LLMGateway, first_token: bool = False) -> float:
+        stats = self.stats[provider.name]
+        window = stats.first_token if first_token else stats.latency
+        if len(window.samples) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return min(LLM_HEDGE_MAX_DELAY, max(LLM_HEDGE_MIN_DELAY, window.percentile(0.95)))
+
+    async def complete(self, message: str, timeout: float | None = None) -> str:
+        timeout = timeout or self.timeout
+        race = lambda: asyncio.wait_for(self._race(self._timed_complete, message, timeout, False), timeout)
+        if self.cache is None:
+            return await race()
+        return await asyncio.wait_for(self.cache.get_or_fetch(self.cache_key(message), race), timeout)
+
+    async def stream(self, message: str, timeout: float | None = None) -> AsyncIterator[str]:
+        # Hedging applies to the first token; once a provider has produced it,
+        # the rest of the answer is read from that provider alone.
+        timeout = timeout or self.timeout
+        key = self.cache_key(message) if self.cache is not None else None
+        if key is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        chunks, first = await asyncio.wait_for(
+            self._race(self._first_chunk, message, timeout, True), timeout
+        )
+        parts = [first] if first else []
+        try:
+            if first:
+                yield first
+            async for delta in chunks:
+                parts.append(delta)
+                yield delta
+        finally:
+            await chunks.aclose()
+        if key is not None and parts:
+            await self.cache.set(key, "".join(parts).strip())
+
+    async def _race(self, attempt, message: str, timeout: float, first_token: bool):
+        waiting = list(self.providers)
+        pending: dict[asyncio.Task, LLMGateway] = {}
+        error = None
+
+        def launch():
+            provider = waiting.pop(0)
+            self.stats[provider.name].requests += 1
+            pending[asyncio.ensure_future(attempt(provider, message, timeout))] = provider
+
+        launch()
+        try:
+            while pending:
+                current = list(pending.values())[-1]
+                delay = self.hedge_delay(current, first_token) if waiting else None
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch()
+                    continue
+                winner = None
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is not None:
+                        self.stats[provider.name].errors += 1
+                        error = task.exception()
+                    elif winner is None:
+                        self.stats[provider.name].wins += 1
+                        winner = task.result()
+                    elif first_token:
+                        # Two providers answered in the same tick; release the spare stream.
+                        await task.result()[0].aclose()
+                if winner is not None:
+                    return winner
+                if not pending and waiting:
+                    launch()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _timed_complete(self, provider: LLMGateway, message: str, timeout: float) -> str:
+        started = time.monotonic()
+        reply = await provider.complete(message, timeout)
+        self.stats[provider.name].latency.record(time.monotonic() - started)
+        return reply
+
+    async def _first_chunk(self, provider: LLMGateway, message: str, timeout: float):
+        started = time.monotonic()
+        chunks = provider.stream(message, timeout)
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = ""
+        except BaseException:
+            await chunks.aclose()
+            raise
+        self.stats[provider.name].first_token.record(time.monotonic() - started)
+        return chunks, first
+
+    def summary(self) -> dict:
+        return {name: stats.summary() for name, stats in self.stats.items()}
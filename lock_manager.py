@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Iterable, NamedTuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Locks are scoped per credential source; two profiles never contend.
+LOCK_ACCOUNT = os.getenv("AWS_ACCOUNT_ID") or os.getenv("AWS_PROFILE") or "default"
+
+
+class LockTimeoutError(Exception):
+    pass
+
+
+class ResourceKey(NamedTuple):
+    account: str
+    region: str
+    resource: str
+
+    def __str__(self):
+        return f"{self.account}/{self.region}/{self.resource}"
+
+
+def resource_key(region: str, resource: str, account: str = LOCK_ACCOUNT) -> ResourceKey:
+    return ResourceKey(account, region, resource)
+
+
+class _Waiter:
+    __slots__ = ("mode", "owner", "granted", "on_grant")
+
+    def __init__(self, mode: str, owner: str, on_grant=None):
+        self.mode = mode
+        self.owner = owner
+        self.granted = False
+        # Set for non-blocking requests: called (outside the manager's lock)
+        # once the waiter is granted, instead of waking a blocked thread.
+        self.on_grant = on_grant
+
+
+class _KeyLock:
+    # Reader/writer lock with a strict FIFO queue: a request is granted only
+    # once everything queued ahead of it has been, so a stream of readers can
+    # never starve a writer (and vice versa). Consecutive readers at the head
+    # are granted together.
+    def __init__(self):
+        self.queue: deque[_Waiter] = deque()
+        self.readers = 0
+        self.writer = False
+        self.holders: list[_Waiter] = []
+
+    def grant(self) -> list[_Waiter]:
+        # Returns the waiters granted by this call.
+        granted = []
+        while self.queue:
+            head = self.queue[0]
+            if head.mode == "write":
+                if self.writer or self.readers:
+                    break
+                self.writer = True
+            else:
+                if self.writer:
+                    break
+                self.readers += 1
+            head.granted = True
+            granted.append(head)
+            self.holders.append(self.queue.popleft())
+        return granted
+
+    def release(self, waiter: _Waiter) -> list[_Waiter]:
+        self.holders.remove(waiter)
+        if waiter.mode == "write":
+            self.writer = False
+        else:
+            self.readers -= 1
+        return self.grant()
+
+    @property
+    def idle(self) -> bool:
+        return not self.queue and not self.holders
+
+
+class Lease:
+    # Held locks for one operation. Not tied to a thread: a lease taken in a
+    # request handler can be released by the worker that finishes the job.
+    def __init__(self, manager: "LockManager", held: list[tuple[ResourceKey, _Waiter]]):
+        self.manager = manager
+        self.held = held
+
+    @property
+    def keys(self) -> list[ResourceKey]:
+        return [key for key, _ in self.held]
+
+    def release(self):
+        held, self.held = self.held, []
+        self.manager._release(held)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class LockManager:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._locks: dict[ResourceKey, _KeyLock] = {}
+
+    def acquire(self, keys: Iterable[ResourceKey], mode: str = "write", owner: str = "",
+                timeout: float | None = None, on_wait=None) -> Lease:
+        # Multi-key requests take their keys one at a time in a single global
+        # order, so two operations can never each hold a key the other wants.
+        # timeout=0 means "try once"; on_wait(key) is called once per key that
+        # has to queue, e.g. to post job progress.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        held: list[tuple[ResourceKey, _Waiter]] = []
+        try:
+            for key in sorted(set(keys)):
+                held.append((key, self._acquire_one(key, mode, owner, deadline, on_wait)))
+        except BaseException:
+            self._release(held)
+            raise
+        return Lease(self, held)
+
+    def acquire_then(self, keys: Iterable[ResourceKey], on_grant, mode: str = "write", owner: str = "",
+                     on_wait=None):
+        # Non-blocking acquire: queues for the keys (in the same global order
+        # as acquire()) and calls on_grant(lease) once all are held, either
+        # right away or from the thread whose release granted the last one.
+        # No thread is parked while the request waits.
+        keys = sorted(set(keys))
+        held: list[tuple[ResourceKey, _Waiter]] = []
+
+        def advance():
+            while len(held) < len(keys):
+                key = keys[len(held)]
+                waiter = _Waiter(mode, owner)
+                with self._cond:
+                    lock = self._locks.setdefault(key, _KeyLock())
+                    lock.queue.append(waiter)
+                    lock.grant()
+                    if not waiter.granted:
+                        waiter.on_grant = lambda key=key, waiter=waiter: granted(key, waiter)
+                        break
+                held.append((key, waiter))
+            else:
+                on_grant(Lease(self, held))
+                return
+            if on_wait:
+                on_wait(key)
+
+        def granted(key: ResourceKey, waiter: _Waiter):
+            held.append((key, waiter))
+            advance()
+
+        advance()
+
+    def _acquire_one(self, key: ResourceKey, mode: str, owner: str, deadline: float | None, on_wait) -> _Waiter:
+        waiter = _Waiter(mode, owner)
+        with self._cond:
+            lock = self._locks.setdefault(key, _KeyLock())
+            lock.queue.append(waiter)
+            lock.grant()
+            if not waiter.granted and on_wait:
+                on_wait(key)
+            while not waiter.granted:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    lock.queue.remove(waiter)
+                    # Leaving the queue may unblock readers queued behind us.
+                    callbacks = lock.grant()
+                    self._cond.notify_all()
+                    self._discard(key, lock)
+                    break
+                self._cond.wait(remaining)
+            else:
+                return waiter
+        self._run_callbacks(callbacks)
+        raise LockTimeoutError(str(key))
+
+    def _release(self, held: list[tuple[ResourceKey, _Waiter]]):
+        if not held:
+            return
+        callbacks = []
+        with self._cond:
+            for key, waiter in reversed(held):
+                lock = self._locks[key]
+                callbacks += lock.release(waiter)
+                self._discard(key, lock)
+            self._cond.notify_all()
+        self._run_callbacks(callbacks)
+
+    def _run_callbacks(self, granted: list[_Waiter]):
+        for waiter in granted:
+            if waiter.on_grant:
+                waiter.on_grant()
+
+    def _discard(self, key: ResourceKey, lock: _KeyLock):
+        if lock.idle:
+            self._locks.pop(key, None)
+
+
+locks = LockManager()
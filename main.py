@@ -1,19 +1,31 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
+import asyncio
+from contextlib import asynccontextmanager
 import boto3
-import threading
+import glob
 import json
-import httpx
 import os
-import base64
-import requests
 from dotenv import load_dotenv
-from openai import OpenAI
-from openai.types.chat import ChatCompletionMessageParam
-from requests.auth import HTTPBasicAuth
+from ami_resolver import AMIResolver
+from azure_devops import AzureDevOpsClient, PipelineResolver, PipelineRunPoller
+from coalescer import Coalescer
+from drift_detector import describe_report, drift_detector
+from intent_router import router
+from job_engine import JobEngine
+from prefetch import CONFIRMATION_EXPIRED_REPLY, Prefetch
+from region_resolver import did_you_mean, get_region_from_input
+from terraform_executor import TerraformExecutor
+from tfstate_diff import describe_delta, state_differ
+from tfstate_index import state_reader
+from tfvars_workspaces import TfvarsWorkspaces, Workspace
+from llm_cache import build_cache
+from llm_gateway import LLMGateway, NDJSON_MEDIA_TYPE, OPENAI_MODEL, TOGETHER_BASE_URL, TOGETHER_MODEL, ndjson_stream
+from llm_guard import CIRCUIT_OPEN_REPLY, LOAD_SHED_REPLY, CircuitOpenError, LLMGuard, LoadShedError
+from llm_pool import ProviderPool
 
 # === Load .env variables ===
 load_dotenv()
@@ -21,12 +33,34 @@ AZURE_ORG = os.getenv("AZURE_ORG")
 AZURE_PROJECT = os.getenv("AZURE_PROJECT")
 AZURE_PAT = os.getenv("AZURE_DEVOPS_PAT")
 TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# === Hardcoded pipeline name ===
-pipeline_name = "Cloudeasy-SudhakarRaju.terraform"
+# === IaC executor: "pipeline" (Azure DevOps) or "local" (terraform on this host) ===
+IAC_EXECUTOR = os.getenv("IAC_EXECUTOR", "pipeline").lower()
+
+# === Pipeline name (ID is resolved and cached at startup) ===
+pipeline_name = os.getenv("AZURE_PIPELINE_NAME", "Cloudeasy-SudhakarRaju.terraform")
+
+# === Pipeline lookup and run tracking ===
+azure = AzureDevOpsClient(AZURE_ORG, AZURE_PROJECT, AZURE_PAT)
+pipeline_ids = PipelineResolver(azure)
+pipeline_runs = PipelineRunPoller(azure)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    amis.start()
+    azure.start()
+    pipeline_ids.start(warm=[pipeline_name])
+    pipeline_runs.start()
+    yield
+    await launches.drain()
+    await pipeline_runs.stop()
+    await pipeline_ids.stop()
+    await azure.aclose()
+    amis.stop()
 
 # === Setup FastAPI ===
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory="templates")
 
 app.add_middleware(
@@ -37,14 +71,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# === Together AI ===
-openai_client = OpenAI(
+# === Together AI (primary) with OpenAI as hedge/failover ===
+SYSTEM_PROMPT = "You are a helpful assistant for AWS cloud operations."
+llm_providers = [LLMGateway(
+    name="together",
     api_key=TOGETHER_API_KEY,
-    base_url="https://api.together.xyz/v1"
-)
+    base_url=TOGETHER_BASE_URL,
+    model=TOGETHER_MODEL,
+    system_prompt=SYSTEM_PROMPT,
+    temperature=0.7,
+    max_tokens=300
+)]
+if OPENAI_API_KEY:
+    llm_providers.append(LLMGateway(
+        name="openai",
+        api_key=OPENAI_API_KEY,
+        model=OPENAI_MODEL,
+        system_prompt=SYSTEM_PROMPT,
+        temperature=0.7,
+        max_tokens=300
+    ))
+llm = LLMGuard(ProviderPool(llm_providers, cache=build_cache()))
 
 # === Shared state ===
-operation_status = {"status": "✅ No operations in progress.", "in_progress": False}
+jobs = JobEngine()
 session_state = {}
 
 # === AMI Mappings ===
@@ -56,6 +106,8 @@ AMI_MAP = {
     "eu-west-1": "resolve:ssm:/aws/service/ami-amazon-linux-latest/amzn2-ami-hvm-x86_64-gp2",
     "ap-south-1": "resolve:ssm:/aws/service/ami-amazon-linux-latest/amzn2-ami-hvm-x86_64-gp2"
 }
+# Literal AMI IDs for the tfvars, resolved from SSM and refreshed in the background
+amis = AMIResolver(AMI_MAP)
 
 # === Input model ===
 class ChatRequest(BaseModel):
@@ -66,112 +118,323 @@ class ChatRequest(BaseModel):
 def chat_ui(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+# === Jobs API ===
+@app.get("/jobs")
+async def list_jobs(active: bool = False):
+    return [job.to_dict() for job in jobs.list(active_only=active)]
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job.to_dict()
+
+# === Terraform state diff API ===
+@app.get("/state/diff")
+async def state_diff(path: str | None = None):
+    pairs = state_pairs()
+    if path is not None:
+        pairs = [(old, new) for old, new in pairs if os.path.abspath(new) == os.path.abspath(path)]
+        if not pairs:
+            raise HTTPException(status_code=404, detail=f"No state file with a backup at '{path}'")
+    return await asyncio.to_thread(lambda: [state_differ.diff(old, new) for old, new in pairs])
+
+# === AMI API ===
+@app.get("/amis")
+async def list_amis():
+    return amis.snapshot()
+
+# === Drift API ===
+@app.get("/drift")
+async def drift(full: bool = False):
+    return await asyncio.to_thread(scan_drift, full)
+
 # === Chat Logic ===
 @app.post("/chat")
 async def chat(req: Request):
     data = await req.json()
     user_input = data.get("message", "").lower()
 
+    reply = await handle_intent(user_input)
+    if reply is None:
+        reply = await together_ai_response(user_input)
+    return {"response": reply}
+
+# === Streaming Chat (NDJSON) ===
+@app.post("/chat/stream")
+async def chat_stream(req: Request):
+    data = await req.json()
+    user_input = data.get("message", "").lower()
+
+    reply = await handle_intent(user_input)
+    chunks = together_ai_stream(user_input) if reply is None else reply
+    return StreamingResponse(ndjson_stream(chunks), media_type=NDJSON_MEDIA_TYPE)
+
+# === Intent Handling (None = fall back to Together AI) ===
+async def handle_intent(user_input: str) -> str | None:
     region = get_region_from_input(user_input)
+    intent = router.route(user_input)
 
-    if any(kw in user_input for kw in ["create ec2", "launch instance", "spin up vm"]):
+    if intent == "create_ec2":
         if not region:
-            return {"response": "🌍 Please specify a valid AWS region (e.g., mumbai, virginia, oregon)."}
-        session_state["awaiting_creation_confirmation"] = {"region": region}
-        return {"response": f"⚠️ Confirm launch EC2 in **{region}**? Reply `yes` to proceed."}
+            return f"🌍 Please specify a valid AWS region (e.g., mumbai, virginia, oregon).{did_you_mean(user_input)}"
+        if region not in AMI_MAP:
+            return f"❌ No AMI configured for region **{region}**."
+        previous = session_state.pop("awaiting_creation_confirmation", None)
+        if previous:
+            previous["prefetch"].discard()
+        session_state["awaiting_creation_confirmation"] = {"region": region, "prefetch": prefetch_launch(region)}
+        return f"⚠️ Confirm launch EC2 in **{region}**? Reply `yes` to proceed."
 
-    elif "yes" in user_input and "awaiting_creation_confirmation" in session_state:
-        region = session_state.pop("awaiting_creation_confirmation")["region"]
-        update_tfvars(region, AMI_MAP.get(region), "t2.micro")
-        operation_status["status"] = f"🚀 Creating EC2 in {region}..."
-        operation_status["in_progress"] = True
+    elif intent == "cancel" and "awaiting_creation_confirmation" in session_state:
+        session_state.pop("awaiting_creation_confirmation")["prefetch"].discard()
+        return "❎ EC2 creation cancelled."
 
-        pipeline_id = fetch_pipeline_id(AZURE_ORG, AZURE_PROJECT, pipeline_name, AZURE_PAT)
-        if not pipeline_id:
-            return {"response": f"❌ Pipeline '{pipeline_name}' not found in project."}
+    elif intent == "confirm" and "awaiting_creation_confirmation" in session_state:
+        details = session_state.pop("awaiting_creation_confirmation")
+        region, prefetch = details["region"], details["prefetch"]
+        if prefetch.expired:
+            prefetch.discard()
+            return CONFIRMATION_EXPIRED_REPLY
+        prefetch.release()
+        via = "local terraform" if IAC_EXECUTOR == "local" else "pipeline"
+        job = jobs.create("create_ec2", f"Create EC2 in {region} via {via}", region=region, instance_type="t2.micro")
+        job.progress(f"⚡ Prefetched while awaiting confirmation: {prefetch.describe()}")
+        job.progress(f"🕓 Waiting up to {launches.window:.0f}s to share a pipeline run with other launches...")
+        launches.add(job)
+        return f"✅ Launch in **{region}** queued (job `{job.id}`). Launches confirmed within {launches.window:.0f}s share one pipeline run."
 
-        status, result = await trigger_azure_pipeline(pipeline_id)
-        if status in [200, 201]:
-            threading.Thread(target=monitor_pipeline_completion, args=(region,)).start()
-            return {"response": f"✅ Pipeline triggered to create EC2 in **{region}**."}
-        return {"response": f"❌ Pipeline trigger failed: {result}"}
-
-    elif "status" in user_input:
-        return {"response": operation_status["status"]}
-
-    return {"response": together_ai_response(user_input)}
-
-# === Region Detection ===
-def get_region_from_input(text: str) -> str:
-    mapping = {
-        "mumbai": "ap-south-1",
-        "virginia": "us-east-1",
-        "california": "us-west-1",
-        "oregon": "us-west-2",
-        "ohio": "us-east-2",
-        "ireland": "eu-west-1"
-    }
-    for k, v in mapping.items():
-        if k in text or v in text:
-            return v
-    return ""
+    elif intent == "drift":
+        report = await asyncio.to_thread(scan_drift, "full" in user_input)
+        return describe_report(report)
+
+    elif intent == "state_diff":
+        return await asyncio.to_thread(describe_state_changes)
+
+    elif intent == "terraform_state":
+        return await asyncio.to_thread(describe_terraform_state, region)
+
+    elif intent == "status":
+        job = jobs.find_in(user_input)
+        if job:
+            return job.report()
+        return f"{jobs.describe()}\n{llm.describe()}"
+
+    return None
 
-# === Update terraform.tfvars.json ===
-def update_tfvars(region: str, ami_id: str, instance_type: str):
+# === Per-run tfvars workspaces (local executor) ===
+workspaces = TfvarsWorkspaces()
+
+def update_tfvars(launch_list: list[dict]) -> Workspace:
+    # The single-launch keys stay for configs that only read one region.
+    first = launch_list[0]
     tfvars = {
-        "aws_region": region,
-        "ami_id": ami_id,
-        "instance_type": instance_type
+        "aws_region": first["region"],
+        "ami_id": first["ami_id"],
+        "instance_type": first["instance_type"],
+        "instance_count": first["count"]
     }
-    with open("terraform.tfvars.json", "w") as f:
-        json.dump(tfvars, f, indent=2)
+    return workspaces.acquire(tfvars)
+
+def build_launch_list(counts: dict[tuple[str, str], int], images: dict[str, str]) -> list[dict]:
+    return [{"region": region, "instance_type": instance_type, "count": count, "ami_id": images[region]}
+            for (region, instance_type), count in counts.items()]
+
+# === Speculative prefetch while awaiting "yes" ===
+def prefetch_launch(region: str, instance_type: str = "t2.micro") -> Prefetch:
+    # Warms what a lone launch in this region will need: the AMI, then the
+    # pipeline ID, or, when terraform runs locally, its tfvars workspace
+    # (the same content-addressed one the apply will pick up) and a saved plan.
+    ami = asyncio.ensure_future(asyncio.to_thread(amis.resolve, region))
+    if IAC_EXECUTOR != "local":
+        return Prefetch({"ami": ami, "pipeline_id": pipeline_ids.resolve(pipeline_name)})
+
+    async def payload() -> Workspace:
+        total = await asyncio.to_thread(local_instance_count, region, 1)
+        launch_list = build_launch_list({(region, instance_type): total}, {region: await ami})
+        return await asyncio.to_thread(update_tfvars, launch_list)
+
+    tfvars = asyncio.ensure_future(payload())
+
+    async def plan():
+        workspace = await asyncio.shield(tfvars)
+        return await terraform.plan(region, workspace.tfvars_file)
+
+    return Prefetch({"ami": ami, "tfvars": tfvars, "plan": plan()}, cleanup={"tfvars": workspaces.release})
 
-# === Fetch pipeline ID ===
-def fetch_pipeline_id(org: str, project: str, pipeline_name: str, pat: str) -> int:
-    url = f"https://dev.azure.com/{org}/{project}/_apis/pipelines?api-version=7.1-preview.1"
+# === Coalesced launches: one pipeline run per batch ===
+async def trigger_launch_batch(batch: list):
+    counts = {}
+    for job in batch:
+        key = (job.meta["region"], job.meta["instance_type"])
+        counts[key] = counts.get(key, 0) + 1
+
+    def fail_all(message: str):
+        for job in batch:
+            job.fail(message)
+
+    # Runs as a detached flush task: anything raised here would be lost and
+    # leave the jobs queued forever, so every step is inside the try.
     try:
-        response = requests.get(url, auth=HTTPBasicAuth("", pat))
-        pipelines = response.json().get("value", [])
-        for p in pipelines:
-            if p["name"].lower() == pipeline_name.lower():
-                return p["id"]
+        images = await asyncio.to_thread(amis.images, {region for region, _ in counts})
+        launch_list = build_launch_list(counts, images)
+        if IAC_EXECUTOR == "local":
+            return await apply_launches_locally(batch, launch_list)
+
+        summary = ", ".join(f"{l['count']}× {l['instance_type']} in {l['region']}" for l in launch_list)
+        for job in batch:
+            job.progress(f"🚀 Triggering one pipeline run for {len(batch)} launch(es): {summary}")
+        # The pipeline gets everything through its template parameters, so no
+        # tfvars workspace is written here; those are for local applies only.
+        parameters = {"region": launch_list[0]["region"], "launches": json.dumps(launch_list)}
+
+        pipeline_id = await pipeline_ids.resolve(pipeline_name)
+        if not pipeline_id:
+            return fail_all(f"❌ Pipeline '{pipeline_name}' not found in project.")
+
+        status, result = await trigger_azure_pipeline(pipeline_id, parameters)
+        if status == 404:
+            # Stale cached ID (pipeline deleted or recreated): look it up again once.
+            pipeline_ids.invalidate(pipeline_name)
+            pipeline_id = await pipeline_ids.resolve(pipeline_name)
+            if not pipeline_id:
+                return fail_all(f"❌ Pipeline '{pipeline_name}' not found in project.")
+            status, result = await trigger_azure_pipeline(pipeline_id, parameters)
+        if status in [200, 201]:
+            pipeline_runs.track(batch, pipeline_id, result["id"])
+            return
+        fail_all(f"❌ Pipeline trigger failed: {result}")
     except Exception as e:
-        print("Error fetching pipeline ID:", e)
-    return None
+        fail_all(f"❌ Launch failed: {str(e)}")
+
+launches = Coalescer(trigger_launch_batch)
+
+# === Local terraform executor ===
+terraform = TerraformExecutor()
+
+def local_instance_count(region: str, new: int) -> int:
+    # instance_count is the total terraform keeps in the region, and each
+    # region's working dir keeps its state, so a launch adds to what is there.
+    path = os.path.join(terraform.workdir(region), "terraform.tfstate")
+    existing = len(state_reader.read(path).of_type("aws_instance")) if os.path.exists(path) else 0
+    return existing + new
+
+async def apply_launches_locally(batch: list, launch_list: list[dict]):
+    # One apply per region, run concurrently; output streams into the jobs.
+    async def apply(launch: dict):
+        region = launch["region"]
+        launch_jobs = [j for j in batch if (j.meta["region"], j.meta["instance_type"]) == (region, launch["instance_type"])]
+        total = await asyncio.to_thread(local_instance_count, region, launch["count"])
+        workspace = update_tfvars([{**launch, "count": total}])
+        for job in launch_jobs:
+            job.start()
+            job.meta["tfvars"] = workspace.tfvars_file
+            job.progress(f"🛠️ Running terraform locally for {region}...")
+
+        def output(line: str):
+            for job in launch_jobs:
+                job.progress(f"[{region}] {line}")
+
+        try:
+            await terraform.apply(region, workspace.tfvars_file, on_output=output)
+            for job in launch_jobs:
+                job.succeed(f"✅ terraform apply finished in **{region}**.")
+        except Exception as e:
+            for job in launch_jobs:
+                job.fail(f"❌ terraform apply failed in **{region}**: {str(e)}")
+        finally:
+            workspaces.release(workspace)
+
+    await asyncio.gather(*(apply(launch) for launch in launch_list))
+
+# === Terraform state ===
+TERRAFORM_STATE_FILES = os.getenv("TERRAFORM_STATE_FILES", "terraform.tfstate,terraform/terraform.tfstate").split(",")
+
+def state_files() -> list[str]:
+    # The checked-in state plus one per region worked by the local executor.
+    paths = [p for p in TERRAFORM_STATE_FILES if os.path.exists(p)]
+    return paths + sorted(glob.glob(os.path.join(terraform.runs_dir, "*", "terraform.tfstate")))
+
+def describe_terraform_state(region: str = "", limit: int = 20) -> str:
+    lines = []
+    for path in state_files():
+        try:
+            index = state_reader.read(path)
+        except Exception as e:
+            lines.append(f"⚠️ {os.path.relpath(path)}: unreadable ({str(e)})")
+            continue
+        entries = [e for e in index.entries.values() if not region or e.region == region]
+        lines.append(f"🗂️ **{os.path.relpath(path)}** (serial {index.serial}): {len(entries)} resource(s)")
+        for e in entries[:limit]:
+            details = " · ".join(str(e.attributes[k]) for k in ("instance_type", "instance_state") if k in e.attributes)
+            lines.append(f"  • {e.address} · {e.id} · {e.region}" + (f" · {details}" if details else ""))
+        if len(entries) > limit:
+            lines.append(f"  …and {len(entries) - limit} more")
+    return "\n".join(lines) if lines else "🗂️ No terraform state files found."
+
+def state_pairs() -> list[tuple[str, str]]:
+    # terraform keeps the pre-apply state as <state>.backup, so each pair is
+    # (before the last apply, after it).
+    return [(path + ".backup", path) for path in state_files() if os.path.exists(path + ".backup")]
+
+def describe_state_changes() -> str:
+    sections = []
+    for old, new in state_pairs():
+        try:
+            delta = state_differ.diff(old, new)
+        except Exception as e:
+            sections.append(f"⚠️ {os.path.relpath(new)}: unable to diff ({str(e)})")
+            continue
+        sections.append(f"🗂️ **{os.path.relpath(new)}** vs backup\n{describe_delta(delta)}")
+    return "\n\n".join(sections) if sections else "🧾 No state backups to compare yet."
+
+def scan_drift(full: bool = False) -> dict:
+    # An unreadable state file is reported next to the region errors rather
+    # than failing the whole scan.
+    entries, unreadable = [], {}
+    for path in state_files():
+        try:
+            entries.extend(state_reader.read(path).entries.values())
+        except Exception as e:
+            unreadable[os.path.relpath(path)] = f"unreadable state ({str(e)})"
+    report = drift_detector.scan(entries, AMI_MAP, full=full)
+    return {**report, "errors": {**unreadable, **report["errors"]}}
 
 # === Trigger Azure Pipeline ===
-async def trigger_azure_pipeline(pipeline_id: int):
-    url = f"https://dev.azure.com/{AZURE_ORG}/{AZURE_PROJECT}/_apis/pipelines/{pipeline_id}/runs?api-version=7.1-preview.1"
-    pat = base64.b64encode(f":{AZURE_PAT}".encode()).decode()
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Basic {pat}"
-    }
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(url, headers=headers, json={})
+async def trigger_azure_pipeline(pipeline_id: int, template_parameters: dict | None = None):
+    body = {"templateParameters": template_parameters} if template_parameters else {}
+    try:
+        resp = await azure.post(f"/pipelines/{pipeline_id}/runs", json=body)
+    except Exception as e:
+        return None, str(e)
+    try:
         return resp.status_code, resp.json()
-
-# === Monitor completion (simulated) ===
-def monitor_pipeline_completion(region: str):
-    import time
-    time.sleep(90)
-    operation_status["status"] = f"✅ EC2 instance launched successfully in {region}."
-    operation_status["in_progress"] = False
+    except ValueError:
+        return resp.status_code, resp.text
 
 # === Together AI fallback ===
-def together_ai_response(message: str) -> str:
+async def together_ai_response(message: str) -> str:
     try:
-        messages: list[ChatCompletionMessageParam] = [
-            {"role": "system", "content": "You are a helpful assistant for AWS cloud operations."},
-            {"role": "user", "content": message}
-        ]
-        response = openai_client.chat.completions.create(
-            model="mistralai/Mistral-7B-Instruct-v0.1",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=300
-        )
-        return response.choices[0].message.content.strip()
+        return await llm.complete(message)
+    except CircuitOpenError:
+        return CIRCUIT_OPEN_REPLY
+    except LoadShedError:
+        return LOAD_SHED_REPLY
+    except asyncio.TimeoutError:
+        return f"⚠️ Together API timed out after {llm.timeout:.0f}s."
     except Exception as e:
         return f"⚠️ Together API error: {str(e)}"
 
+async def together_ai_stream(message: str):
+    try:
+        async for delta in llm.stream(message):
+            yield delta
+    except CircuitOpenError:
+        yield CIRCUIT_OPEN_REPLY
+    except LoadShedError:
+        yield LOAD_SHED_REPLY
+    except asyncio.TimeoutError:
+        yield f"⚠️ Together API timed out after {llm.timeout:.0f}s."
+    except Exception as e:
+        yield f"⚠️ Together API error: {str(e)}"
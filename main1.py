@@ -1,18 +1,56 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-import boto3
-import threading
+import asyncio
+from contextlib import asynccontextmanager
+from ami_resolver import AMIResolver
+from aws_pool import aws
+from bulk_launch import DEFAULT_INSTANCE_TYPE, bulk_launch, is_launch_request, parse_launch_request
 import os
 from dotenv import load_dotenv
-from openai import OpenAI  # ✅ New OpenAI import
+from instance_watcher import watcher
+from intent_router import router
+from job_engine import JOB_QUEUE_FULL_REPLY, JobEngine, JobQueueFullError
+from lock_manager import resource_key
+from prefetch import CONFIRMATION_EXPIRED_REPLY, Prefetch
+from region_resolver import did_you_mean, get_region_from_input
+from llm_cache import build_cache
+from llm_gateway import LLMGateway, NDJSON_MEDIA_TYPE, OPENAI_MODEL, TOGETHER_BASE_URL, TOGETHER_MODEL, ndjson_stream
+from llm_guard import CIRCUIT_OPEN_REPLY, LOAD_SHED_REPLY, CircuitOpenError, LLMGuard, LoadShedError
+from llm_pool import ProviderPool
 
 # Load env vars
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))  # ✅ New OpenAI client instance
-
-app = FastAPI()
+# OpenAI is the primary provider; Together (when configured) hedges and fails over
+SYSTEM_PROMPT = "You are a helpful AI Terraform Assistant for AWS operations."
+llm_providers = [LLMGateway(
+    name="openai",
+    api_key=os.getenv("OPENAI_API_KEY"),
+    model=OPENAI_MODEL,
+    system_prompt=SYSTEM_PROMPT,
+    temperature=0.5,
+    max_tokens=100
+)]
+if os.getenv("TOGETHER_API_KEY"):
+    llm_providers.append(LLMGateway(
+        name="together",
+        api_key=os.getenv("TOGETHER_API_KEY"),
+        base_url=TOGETHER_BASE_URL,
+        model=TOGETHER_MODEL,
+        system_prompt=SYSTEM_PROMPT,
+        temperature=0.5,
+        max_tokens=100
+    ))
+llm = LLMGuard(ProviderPool(llm_providers, cache=build_cache()))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    amis.start()
+    yield
+    amis.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -26,62 +64,140 @@ app.add_middleware(
 # For rendering templates
 templates = Jinja2Templates(directory="templates")
 
-# Shared status
-operation_status = {
-    "status": "✅ No operations in progress.",
-    "in_progress": False
-}
+# Background operations
+jobs = JobEngine()
+
+INSTANCE_NAME = "Terraform-Agent-Instance"
+
+# Amazon Linux 2 in every region we launch in, resolved to each region's own AMI ID
+AMAZON_LINUX_2 = "resolve:ssm:/aws/service/ami-amazon-linux-latest/amzn2-ami-hvm-x86_64-gp2"
+amis = AMIResolver(dict.fromkeys([
+    "us-east-1", "us-east-2", "us-west-1", "us-west-2", "ca-central-1", "sa-east-1",
+    "eu-west-1", "eu-west-2", "eu-west-3", "eu-central-1", "eu-north-1",
+    "ap-south-1", "ap-southeast-1", "ap-southeast-2", "ap-northeast-1", "ap-northeast-2", "ap-northeast-3",
+], AMAZON_LINUX_2))
+
+# Count-led launches ("create 5 ec2 instances in mumbai") match no fixed phrase
+router.add_detector("create_ec2", is_launch_request)
+
+session_state = {}
 
 @app.get("/", response_class=HTMLResponse)
 async def chat_ui(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
+@app.get("/jobs")
+async def list_jobs(active: bool = False):
+    return [job.to_dict() for job in jobs.list(active_only=active)]
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job.to_dict()
+
+
 @app.post("/chat")
 async def chat(request: Request):
     data = await request.json()
     user_input = data.get("message", "").lower()
 
-    if "hi" in user_input or "hello" in user_input:
-        return {"response": "👋 Hello! I’m **Terraform-Agent**. How can I assist you today?"}
+    reply = await handle_intent(user_input)
+    if reply is None:
+        reply = f"🤖 GPT Assist: {await gpt_nlp_response(user_input)}"
+    return {"response": reply}
 
-    elif "account" in user_input and "detail" in user_input:
-        return {"response": get_account_details()}
 
-    elif "region" in user_input:
-        return {"response": get_total_regions()}
-
-    elif "total instance" in user_input:
-        return {"response": get_total_instances()}
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    data = await request.json()
+    user_input = data.get("message", "").lower()
 
-    elif "create ec2" in user_input:
+    reply = await handle_intent(user_input)
+    chunks = gpt_assist_stream(user_input) if reply is None else reply
+    return StreamingResponse(ndjson_stream(chunks), media_type=NDJSON_MEDIA_TYPE)
+
+
+async def handle_intent(user_input: str) -> str | None:
+    intent = router.route(user_input)
+
+    if "awaiting_launch_confirmation" in session_state:
+        details = session_state.pop("awaiting_launch_confirmation")
+        launch, prefetch = details["launch"], details["prefetch"]
+        if prefetch.expired:
+            prefetch.discard()
+            return CONFIRMATION_EXPIRED_REPLY
+        if intent != "confirm":
+            prefetch.discard()
+            return "❎ Bulk launch cancelled."
+        prefetch.release()
+        try:
+            job = jobs.submit("bulk_launch", f"Launch {launch.total} EC2 instance(s) in {len(launch.regions)} region(s)",
+                              bulk_launch, launch, amis.resolve, INSTANCE_NAME,
+                              keys=[resource_key(r, f"Name={INSTANCE_NAME}") for r in launch.regions], mode="read",
+                              regions=launch.regions, count=launch.total, instance_type=launch.instance_type)
+        except JobQueueFullError:
+            return JOB_QUEUE_FULL_REPLY
+        return f"🚀 Launching {launch.describe()} (job `{job.id}`). Ask for the job's status to follow progress."
+
+    if intent == "greeting":
+        return "👋 Hello! I’m **Terraform-Agent**. How can I assist you today?"
+
+    elif intent == "account_details":
+        return get_account_details()
+
+    elif intent == "list_regions":
+        return get_total_regions()
+
+    elif intent == "total_instances":
+        return get_total_instances()
+
+    elif intent == "create_ec2":
         region = get_region_from_input(user_input)
-        if operation_status["in_progress"]:
-            return {"response": "⚠️ Another operation is already in progress. Please wait."}
-        thread = threading.Thread(target=create_ec2_instance, args=(region,))
-        thread.start()
-        return {"response": f"🚀 Creating EC2 instance in **{region}**. Please wait..."}
-
-    elif "terminate ec2" in user_input or "destroy ec2" in user_input:
+        if not region:
+            return f"🌍 Please specify a valid AWS region (e.g., Mumbai, Singapore, Frankfurt).{did_you_mean(user_input)}"
+        launch = parse_launch_request(user_input)
+        if launch.total > 1 or launch.instance_type != DEFAULT_INSTANCE_TYPE:
+            # Bulk launches wait for a "yes"; the AMIs and EC2 clients warm up meanwhile.
+            session_state["awaiting_launch_confirmation"] = {"launch": launch, "prefetch": Prefetch({
+                "ami": asyncio.to_thread(amis.images, launch.regions),
+                "ec2_client": asyncio.to_thread(lambda: [aws.client("ec2", r) for r in launch.regions]),
+            })}
+            return (f"⚠️ Do you want to launch {launch.describe()} ({launch.total} instance(s) in total)? "
+                    f"Reply with **yes** to confirm or **no** to cancel.")
+        try:
+            job = jobs.submit("create_ec2", f"Create EC2 in {region}", create_ec2_instance, region,
+                              keys=[resource_key(region, f"Name={INSTANCE_NAME}")], mode="read", region=region)
+        except JobQueueFullError:
+            return JOB_QUEUE_FULL_REPLY
+        return f"🚀 Creating EC2 instance in **{region}** (job `{job.id}`). Please wait..."
+
+    elif intent == "terminate_ec2":
         region = get_region_from_input(user_input)
-        if operation_status["in_progress"]:
-            return {"response": "⚠️ Another operation is already in progress. Please wait."}
-        thread = threading.Thread(target=terminate_ec2_instance, args=(region,))
-        thread.start()
-        return {"response": f"💣 Terminating EC2 instance(s) in **{region}**. Please wait..."}
+        if not region:
+            return f"🌍 Please specify the region of the EC2 instance(s) to terminate (e.g., Mumbai, Singapore).{did_you_mean(user_input)}"
+        try:
+            job = jobs.submit("terminate_ec2", f"Terminate EC2 in {region}", terminate_ec2_instance, region,
+                              keys=[resource_key(region, f"Name={INSTANCE_NAME}")], region=region)
+        except JobQueueFullError:
+            return JOB_QUEUE_FULL_REPLY
+        return f"💣 Terminating EC2 instance(s) in **{region}** (job `{job.id}`). Please wait..."
 
-    elif "status" in user_input:
-        return {"response": operation_status["status"]}
+    elif intent == "status":
+        job = jobs.find_in(user_input)
+        if job:
+            return job.report()
+        return f"{jobs.describe()}\n{llm.describe()}"
 
-    else:
-        gpt_reply = gpt_nlp_response(user_input)
-        return {"response": f"🤖 GPT Assist: {gpt_reply}"}
+    return None
 
 
 def get_account_details():
     try:
-        sts = boto3.client("sts")
-        identity = sts.get_caller_identity()
+        identity = aws.call(lambda: aws.client("sts").get_caller_identity())
         return f"👤 **Account ID:** {identity['Account']}\n🔗 **ARN:** {identity['Arn']}"
     except Exception as e:
         return f"❌ Unable to retrieve account details: {str(e)}"
@@ -89,8 +205,7 @@ def get_account_details():
 
 def get_total_regions():
     try:
-        ec2 = boto3.client("ec2")
-        regions = ec2.describe_regions()
+        regions = aws.call(lambda: aws.client("ec2").describe_regions())
         names = [r['RegionName'] for r in regions['Regions']]
         return f"🌍 Available AWS Regions:\n\n" + "\n".join([f"• {name}" for name in names])
     except Exception as e:
@@ -99,97 +214,93 @@ def get_total_regions():
 
 def get_total_instances():
     try:
-        ec2 = boto3.resource("ec2", region_name="us-east-1")
-        instances = list(ec2.instances.all())
+        instances = aws.call(lambda: list(aws.resource("ec2", "us-east-1").instances.all()))
         return f"📦 You have **{len(instances)}** EC2 instance(s) in us-east-1."
     except Exception as e:
         return f"❌ Unable to fetch instances: {str(e)}"
 
 
-def create_ec2_instance(region):
+def create_ec2_instance(job, region):
     try:
-        operation_status["in_progress"] = True
-        operation_status["status"] = f"🛠️ Creating EC2 instance in {region}..."
+        job.progress(f"🛠️ Creating EC2 instance in {region}...")
 
-        ec2 = boto3.resource("ec2", region_name=region)
+        image_id = amis.resolve(region)
+        if not image_id:
+            job.fail(f"❌ No AMI configured for region: {region}")
+            return
+
+        ec2 = aws.resource("ec2", region)
         instance = ec2.create_instances(
-            ImageId="ami-0c02fb55956c7d316",
+            ImageId=image_id,
             MinCount=1,
             MaxCount=1,
             InstanceType="t2.micro",
             TagSpecifications=[{
                 'ResourceType': 'instance',
-                'Tags': [{'Key': 'Name', 'Value': 'Terraform-Agent-Instance'}]
+                'Tags': [{'Key': 'Name', 'Value': INSTANCE_NAME}]
             }]
         )[0]
 
-        operation_status["status"] = "⏳ Launching instance... Please wait."
-        instance.wait_until_running()
-        instance.reload()
+        job.progress("⏳ Launching instance... Please wait.")
+        watcher.wait(region, [instance.id], "running")
 
-        operation_status["status"] = f"✅ EC2 Instance **{instance.id}** is running in {region}."
+        job.succeed(f"✅ EC2 Instance **{instance.id}** is running in {region}.", result={"instance_ids": [instance.id]})
     except Exception as e:
-        operation_status["status"] = f"❌ Failed to create instance: {str(e)}"
-    finally:
-        operation_status["in_progress"] = False
+        job.fail(f"❌ Failed to create instance: {str(e)}")
 
 
-def terminate_ec2_instance(region):
+def terminate_ec2_instance(job, region):
     try:
-        operation_status["in_progress"] = True
-        operation_status["status"] = f"🧨 Looking for instances to terminate in {region}..."
+        job.progress(f"🧨 Looking for instances to terminate in {region}...")
 
-        ec2 = boto3.resource("ec2", region_name=region)
+        ec2 = aws.resource("ec2", region)
         instances = ec2.instances.filter(
             Filters=[
-                {'Name': 'tag:Name', 'Values': ['Terraform-Agent-Instance']},
+                {'Name': 'tag:Name', 'Values': [INSTANCE_NAME]},
                 {'Name': 'instance-state-name', 'Values': ['running', 'pending']}
             ]
         )
         to_terminate = [i.id for i in instances]
 
         if not to_terminate:
-            operation_status["status"] = "ℹ️ No matching EC2 instances found to terminate."
+            job.succeed("ℹ️ No matching EC2 instances found to terminate.")
             return
 
         ec2.instances.filter(InstanceIds=to_terminate).terminate()
-        operation_status["status"] = f"🛑 Terminating instance(s): {', '.join(to_terminate)}..."
+        job.progress(f"🛑 Terminating instance(s): {', '.join(to_terminate)}...")
 
-        waiter = boto3.client("ec2", region_name=region).get_waiter('instance_terminated')
-        waiter.wait(InstanceIds=to_terminate)
+        watcher.wait(region, to_terminate, "terminated")
 
-        operation_status["status"] = "✅ All matching EC2 instances terminated successfully."
+        job.succeed("✅ All matching EC2 instances terminated successfully.", result={"instance_ids": to_terminate})
 
     except Exception as e:
-        operation_status["status"] = f"❌ Termination failed: {str(e)}"
-    finally:
-        operation_status["in_progress"] = False
-
+        job.fail(f"❌ Termination failed: {str(e)}")
 
-def get_region_from_input(user_input: str):
-    region = "us-east-1"
-    if "mumbai" in user_input or "india" in user_input:
-        region = "ap-south-1"
-    elif "singapore" in user_input:
-        region = "ap-southeast-1"
-    elif "frankfurt" in user_input:
-        region = "eu-central-1"
-    return region
 
-
-# ✅ Updated GPT function using openai>=1.0.0
-def gpt_nlp_response(message: str) -> str:
+# ✅ GPT fallback via the shared async gateway
+async def gpt_nlp_response(message: str) -> str:
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful AI Terraform Assistant for AWS operations."},
-                {"role": "user", "content": message}
-            ],
-            temperature=0.5,
-            max_tokens=100
-        )
-        return response.choices[0].message.content.strip()
+        return await llm.complete(message)
+    except CircuitOpenError:
+        return CIRCUIT_OPEN_REPLY
+    except LoadShedError:
+        return LOAD_SHED_REPLY
+    except asyncio.TimeoutError:
+        return f"⚠️ GPT timed out after {llm.timeout:.0f}s."
     except Exception as e:
         return f"⚠️ GPT error: {str(e)}"
 
+
+async def gpt_assist_stream(message: str):
+    yield "🤖 GPT Assist: "
+    try:
+        async for delta in llm.stream(message):
+            yield delta
+    except CircuitOpenError:
+        yield CIRCUIT_OPEN_REPLY
+    except LoadShedError:
+        yield LOAD_SHED_REPLY
+    except asyncio.TimeoutError:
+        yield f"⚠️ GPT timed out after {llm.timeout:.0f}s."
+    except Exception as e:
+        yield f"⚠️ GPT error: {str(e)}"
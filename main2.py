@@ -1,23 +1,60 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-import boto3
-import threading
+import asyncio
+from contextlib import asynccontextmanager
+from ami_resolver import AMIResolver
+from aws_pool import aws
+from bulk_launch import DEFAULT_INSTANCE_TYPE, bulk_launch, is_launch_request, parse_launch_request
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
-from openai.types.chat import ChatCompletionMessageParam
+from ec2_inventory import EC2Inventory
+from instance_watcher import watcher
+from intent_router import router
+from job_engine import JOB_QUEUE_FULL_REPLY, JobEngine, JobQueueFullError
+from lock_manager import resource_key
+from prefetch import CONFIRMATION_EXPIRED_REPLY, Prefetch
+from region_resolver import did_you_mean, get_region_from_input
+from llm_cache import build_cache
+from llm_gateway import LLMGateway, NDJSON_MEDIA_TYPE, OPENAI_MODEL, TOGETHER_BASE_URL, TOGETHER_MODEL, ndjson_stream
+from llm_guard import CIRCUIT_OPEN_REPLY, LOAD_SHED_REPLY, CircuitOpenError, LLMGuard, LoadShedError
+from llm_pool import ProviderPool
 
 # Load environment variables
 load_dotenv()
 
-client = OpenAI(
+# Together is the primary provider; OpenAI (when configured) hedges and fails over
+SYSTEM_PROMPT = "You are a helpful assistant for AWS & cloud operations."
+llm_providers = [LLMGateway(
+    name="together",
     api_key=os.getenv("TOGETHER_API_KEY"),
-    base_url="https://api.together.xyz/v1"
-)
-
-app = FastAPI()
+    base_url=TOGETHER_BASE_URL,
+    model=TOGETHER_MODEL,
+    system_prompt=SYSTEM_PROMPT,
+    temperature=0.7,
+    max_tokens=300
+)]
+if os.getenv("OPENAI_API_KEY"):
+    llm_providers.append(LLMGateway(
+        name="openai",
+        api_key=os.getenv("OPENAI_API_KEY"),
+        model=OPENAI_MODEL,
+        system_prompt=SYSTEM_PROMPT,
+        temperature=0.7,
+        max_tokens=300
+    ))
+llm = LLMGuard(ProviderPool(llm_providers, cache=build_cache()))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    amis.start()
+    inventory.start()
+    yield
+    inventory.stop()
+    amis.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,10 +66,12 @@ app.add_middleware(
 
 templates = Jinja2Templates(directory="templates")
 
-operation_status = {
-    "status": "✅ No operations in progress.",
-    "in_progress": False
-}
+jobs = JobEngine()
+
+INSTANCE_NAME = "Terraform-Agent-Instance"
+
+# Count-led launches ("create 5 ec2 instances in mumbai") match no fixed phrase
+router.add_detector("create_ec2", is_launch_request)
 
 session_state = {}
 
@@ -56,97 +95,167 @@ AMI_MAP = {
     "sa-east-1": "resolve:ssm:/aws/service/ami-amazon-linux-latest/amzn2-ami-hvm-x86_64-gp2"       
 }
 
+# Concrete AMI IDs behind the SSM parameters, prefetched for every region
+amis = AMIResolver(AMI_MAP)
+
+# Background-refreshed instance index for every region we can launch in
+inventory = EC2Inventory(AMI_MAP)
+
 @app.get("/", response_class=HTMLResponse)
 async def chat_ui(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+@app.get("/jobs")
+async def list_jobs(active: bool = False):
+    return [job.to_dict() for job in jobs.list(active_only=active)]
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job.to_dict()
+
 @app.post("/chat")
 async def chat(request: Request):
     data = await request.json()
     user_input = data.get("message", "").lower()
 
+    reply = await handle_intent(user_input)
+    if reply is None:
+        reply = f"🤖 AI Assist: {await together_ai_response(user_input)}"
+    return {"response": reply}
+
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    data = await request.json()
+    user_input = data.get("message", "").lower()
+
+    reply = await handle_intent(user_input)
+    chunks = ai_assist_stream(user_input) if reply is None else reply
+    return StreamingResponse(ndjson_stream(chunks), media_type=NDJSON_MEDIA_TYPE)
+
+async def handle_intent(user_input: str) -> str | None:
     region = get_region_from_input(user_input)
-    print(f"[DEBUG] Region extracted from input: {region}")
+    intent = router.route(user_input)
 
     if "awaiting_termination_confirmation" in session_state:
         details = session_state.pop("awaiting_termination_confirmation")
         instance_name = details["instance_name"]
         region = details["region"]
-        if "yes" in user_input or "confirm" in user_input:
-            thread = threading.Thread(target=terminate_ec2_instance, args=(region, instance_name))
-            thread.start()
-            return {"response": f"💣 Confirmed. Terminating **{instance_name}** in **{region}**. Please wait..."}
+        if intent == "confirm":
+            try:
+                job = jobs.submit("terminate_ec2", f"Terminate {instance_name} in {region}",
+                                  terminate_ec2_instance, region, instance_name,
+                                  keys=[resource_key(region, f"Name={instance_name}")], region=region)
+            except JobQueueFullError:
+                return JOB_QUEUE_FULL_REPLY
+            return f"💣 Confirmed. Terminating **{instance_name}** in **{region}** (job `{job.id}`). Please wait..."
         else:
-            return {"response": "❎ Termination cancelled."}
+            return "❎ Termination cancelled."
 
     if "awaiting_creation_confirmation" in session_state:
         details = session_state.pop("awaiting_creation_confirmation")
         region = details["region"]
-        if "yes" in user_input or "confirm" in user_input:
-            thread = threading.Thread(target=create_ec2_instance, args=(region,))
-            thread.start()
-            return {"response": f"🚀 Creating EC2 instance in **{region}**. Please wait..."}
-        else:
-            return {"response": "❎ EC2 creation cancelled."}
-
-    if "hi" in user_input or "hello" in user_input:
-        return {"response": "👋 Hello! I’m **Terraform-Agent**. How can I assist you today?"}
-
-    elif "account" in user_input and "detail" in user_input:
-        return {"response": get_account_details()}
-
-    elif "region" in user_input:
-        return {"response": get_total_regions()}
-
-    elif "total instance" in user_input:
-        region = region or "us-east-1"
-        return {"response": get_total_instances(region)}
-
-    elif any(kw in user_input for kw in ["create ec2", "launch instance", "spin up vm", "create vm", "start server", "create server"]):
+        launch = details["launch"]
+        prefetch = details["prefetch"]
+        if prefetch.expired:
+            prefetch.discard()
+            return CONFIRMATION_EXPIRED_REPLY
+        if intent != "confirm":
+            prefetch.discard()
+            return "❎ EC2 creation cancelled."
+        prefetch.release()
+        if launch.total > 1 or launch.instance_type != DEFAULT_INSTANCE_TYPE:
+            try:
+                job = submit_bulk_launch(launch)
+            except JobQueueFullError:
+                return JOB_QUEUE_FULL_REPLY
+            return f"🚀 Launching {launch.describe()} (job `{job.id}`). Ask for the job's status to follow progress."
+        # Launches only add instances, so they share the tag lock; terminate takes it
+        # exclusively and waits for in-flight launches in that region.
+        try:
+            job = jobs.submit("create_ec2", f"Create EC2 in {region}", create_ec2_instance, region,
+                              keys=[resource_key(region, f"Name={INSTANCE_NAME}")], mode="read", region=region)
+        except JobQueueFullError:
+            return JOB_QUEUE_FULL_REPLY
+        return f"🚀 Creating EC2 instance in **{region}** (job `{job.id}`). Please wait..."
+
+    if intent == "greeting":
+        return "👋 Hello! I’m **Terraform-Agent**. How can I assist you today?"
+
+    elif intent == "account_details":
+        return get_account_details()
+
+    elif intent == "list_regions":
+        return get_total_regions()
+
+    elif intent == "total_instances":
+        return get_total_instances(region)
+
+    elif intent == "list_instances":
+        return list_instances(region)
+
+    elif intent == "refresh_inventory":
+        await asyncio.to_thread(inventory.refresh)
+        return f"🔄 Inventory refreshed.\n{get_total_instances(region)}"
+
+    elif intent == "create_ec2":
         if not region:
-            return {"response": "🌍 Please specify a valid AWS region (e.g., Mumbai, ap-south-1, Virginia, us-east-1)."}
-        if operation_status["in_progress"]:
-            return {"response": "⚠️ Another operation is already in progress. Please wait."}
-
-        session_state["awaiting_creation_confirmation"] = {"region": region}
-        return {"response": f"⚠️ Do you want to launch an EC2 instance in **{region}**? Reply with **yes** to confirm or **no** to cancel."}
-
-    elif any(kw in user_input for kw in ["terminate ec2", "destroy ec2", "remove ec2", "delete ec2", "terminate instance", "delete vm", "remove instance"]):
-        instance_name = "Terraform-Agent-Instance"
+            return f"🌍 Please specify a valid AWS region (e.g., Mumbai, ap-south-1, Virginia, us-east-1).{did_you_mean(user_input)}"
+
+        launch = parse_launch_request(user_input)
+        session_state["awaiting_creation_confirmation"] = {"region": region, "launch": launch,
+                                                           "prefetch": prefetch_launch(launch.regions)}
+        if launch.total > 1 or launch.instance_type != DEFAULT_INSTANCE_TYPE:
+            return (f"⚠️ Do you want to launch {launch.describe()} ({launch.total} instance(s) in total)? "
+                    f"Reply with **yes** to confirm or **no** to cancel.")
+        return f"⚠️ Do you want to launch an EC2 instance in **{region}**? Reply with **yes** to confirm or **no** to cancel."
+
+    elif intent == "terminate_ec2":
+        instance_name = INSTANCE_NAME
         if not region:
-            return {"response": "🌍 Please specify the region of the EC2 instance you want to terminate (e.g., Mumbai, Singapore)."}
-        if operation_status["in_progress"]:
-            return {"response": "⚠️ Another operation is already in progress. Please wait."}
+            return f"🌍 Please specify the region of the EC2 instance you want to terminate (e.g., Mumbai, Singapore).{did_you_mean(user_input)}"
         session_state["awaiting_termination_confirmation"] = {"region": region, "instance_name": instance_name}
-        return {"response": f"⚠️ Are you sure you want to terminate **{instance_name}** in **{region}**? Reply with **yes** to confirm or **no** to cancel."}
+        return f"⚠️ Are you sure you want to terminate **{instance_name}** in **{region}**? Reply with **yes** to confirm or **no** to cancel."
 
-    elif "status" in user_input:
-        return {"response": operation_status["status"]}
+    elif intent == "status":
+        job = jobs.find_in(user_input)
+        if job:
+            return job.report()
+        return f"{jobs.describe()}\n{llm.describe()}"
 
-    else:
-        reply = together_ai_response(user_input)
-        return {"response": f"🤖 AI Assist: {reply}"}
+    return None
 
-def together_ai_response(message: str) -> str:
+async def together_ai_response(message: str) -> str:
     try:
-        messages: list[ChatCompletionMessageParam] = [
-            {"role": "system", "content": "You are a helpful assistant for AWS & cloud operations."},
-            {"role": "user", "content": message}
-        ]
-        response = client.chat.completions.create(
-            model="mistralai/Mistral-7B-Instruct-v0.1",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=300
-        )
-        return response.choices[0].message.content.strip()
+        return await llm.complete(message)
+    except CircuitOpenError:
+        return CIRCUIT_OPEN_REPLY
+    except LoadShedError:
+        return LOAD_SHED_REPLY
+    except asyncio.TimeoutError:
+        return f"⚠️ Together API timed out after {llm.timeout:.0f}s."
     except Exception as e:
         return f"⚠️ Together API error: {str(e)}"
 
+async def ai_assist_stream(message: str):
+    yield "🤖 AI Assist: "
+    try:
+        async for delta in llm.stream(message):
+            yield delta
+    except CircuitOpenError:
+        yield CIRCUIT_OPEN_REPLY
+    except LoadShedError:
+        yield LOAD_SHED_REPLY
+    except asyncio.TimeoutError:
+        yield f"⚠️ Together API timed out after {llm.timeout:.0f}s."
+    except Exception as e:
+        yield f"⚠️ Together API error: {str(e)}"
+
 def get_account_details():
     try:
-        sts = boto3.client("sts")
-        identity = sts.get_caller_identity()
+        identity = aws.call(lambda: aws.client("sts").get_caller_identity())
         return f"👤 **Account ID:** {identity['Account']}\n🔗 **ARN:** {identity['Arn']}"
     except Exception as e:
         return f"❌ Unable to retrieve account details: {str(e)}"
@@ -160,28 +269,81 @@ def get_total_regions():
     ]
     return "🌍 Available AWS Regions:\n\n" + "\n".join([f"• {r}" for r in regions])
 
-def get_total_instances(region="us-east-1"):
-    try:
-        ec2 = boto3.resource("ec2", region_name=region)
-        instances = list(ec2.instances.all())
-        return f"📦 You have **{len(instances)}** EC2 instance(s) in **{region}**."
-    except Exception as e:
-        return f"❌ Unable to fetch instances in {region}: {str(e)}"
+def inventory_not_ready(region=""):
+    # None once there is a snapshot to serve; otherwise why there is none.
+    if inventory.has(region) if region else inventory.age() is not None:
+        return None
+    failed: dict[str, list[str]] = {}
+    for r, error in sorted(inventory.errors().items()):
+        if not region or r == region:
+            failed.setdefault(error, []).append(r)
+    if failed:
+        return "❌ Unable to load the instance inventory:\n" + "\n".join(
+            f"• {', '.join(regions)}: {error}" for error, regions in failed.items())
+    return "⏳ Instance inventory is still loading. Please try again in a few seconds."
+
+def get_total_instances(region=""):
+    if region and region not in inventory.regions:
+        try:
+            instances = aws.call(lambda: list(aws.resource("ec2", region).instances.all()))
+            return f"📦 You have **{len(instances)}** EC2 instance(s) in **{region}**."
+        except Exception as e:
+            return f"❌ Unable to fetch instances in {region}: {str(e)}"
+
+    not_ready = inventory_not_ready(region)
+    if not_ready:
+        return not_ready
+
+    count = inventory.count(region or None)
+    states = inventory.state_counts(region or None)
+    where = f"**{region}**" if region else f"**{len(inventory.slices)}** region(s)"
+    breakdown = ", ".join(f"{state}: {n}" for state, n in sorted(states.items()))
+    reply = f"📦 You have **{count}** EC2 instance(s) in {where}" + (f" ({breakdown})." if breakdown else ".")
+    reply += f"\n🕒 Inventory updated {inventory.age(region or None):.0f}s ago."
+    errors = inventory.errors()
+    if errors and not region:
+        reply += f"\n⚠️ Could not refresh: {', '.join(sorted(errors))}"
+    elif region in errors:
+        reply += f"\n⚠️ Last refresh failed: {errors[region]}"
+    return reply
+
+def list_instances(region="", limit=20):
+    not_ready = inventory_not_ready(region)
+    if not_ready:
+        return not_ready
+    instances = sorted(inventory.instances(region or None), key=lambda r: (r.region, r.name, r.instance_id))
+    if not instances:
+        return f"ℹ️ No EC2 instances found{f' in **{region}**' if region else ''}."
+    lines = [f"• {r.instance_id} · {r.instance_type} · {r.state} · {r.name or '-'} ({r.region})" for r in instances[:limit]]
+    if len(instances) > limit:
+        lines.append(f"…and {len(instances) - limit} more")
+    return "🖥️ EC2 instances:\n\n" + "\n".join(lines)
+
+def prefetch_launch(regions: list[str]) -> Prefetch:
+    # Started with the confirmation prompt: resolves the AMIs and builds the
+    # pooled EC2 clients (session, credentials, endpoint) for every region.
+    return Prefetch({
+        "ami": asyncio.to_thread(amis.images, regions),
+        "ec2_client": asyncio.to_thread(lambda: [aws.client("ec2", r) for r in regions]),
+    })
+
+def submit_bulk_launch(launch):
+    return jobs.submit("bulk_launch", f"Launch {launch.total} EC2 instance(s) in {len(launch.regions)} region(s)",
+                       bulk_launch, launch, amis.resolve, INSTANCE_NAME,
+                       keys=[resource_key(r, f"Name={INSTANCE_NAME}") for r in launch.regions], mode="read",
+                       regions=launch.regions, count=launch.total, instance_type=launch.instance_type)
+
+def create_ec2_instance(job, region):
+    print(f"🔧 Creating EC2 in region: {region}")
+    job.progress(f"💠 Creating EC2 instance in {region}...")
+
+    image_id = amis.resolve(region)
+    if not image_id:
+        job.fail(f"❌ No AMI configured for region: {region}")
+        return
 
-def create_ec2_instance(region):
     try:
-        print(f"🔧 Creating EC2 in region: {region}")
-        operation_status["in_progress"] = True
-        operation_status["status"] = f"💠 Creating EC2 instance in {region}..."
-
-        session = boto3.session.Session(region_name=region)
-        ec2 = session.resource("ec2")
-
-        image_id = AMI_MAP.get(region)
-        if not image_id:
-            operation_status["status"] = f"❌ No AMI configured for region: {region}"
-            return
-
+        ec2 = aws.resource("ec2", region)
         instance = ec2.create_instances(
             ImageId=image_id,
             MinCount=1,
@@ -189,36 +351,29 @@ def create_ec2_instance(region):
             InstanceType="t2.micro",
             TagSpecifications=[{
                 'ResourceType': 'instance',
-                'Tags': [{'Key': 'Name', 'Value': 'Terraform-Agent-Instance'}]
+                'Tags': [{'Key': 'Name', 'Value': INSTANCE_NAME}]
             }]
         )[0]
 
-        operation_status["status"] = "⏳ Launching instance... Please wait."
-        instance.wait_until_running()
-        instance.reload()
+        job.progress(f"⏳ Launching instance **{instance.id}**... Please wait.")
+        running = watcher.wait(region, [instance.id], "running")[instance.id]
 
-        operation_status["status"] = (
+        job.succeed(
             f"✅ EC2 Instance **{instance.id}** is running in **{region}**.\n"
-            f"🔗 Public DNS: {instance.public_dns_name or 'N/A'}\n"
-            f"🔐 Private IP: {instance.private_ip_address or 'N/A'}"
+            f"🔗 Public DNS: {running['public_dns'] or 'N/A'}\n"
+            f"🔐 Private IP: {running['private_ip'] or 'N/A'}",
+            result={"instance_ids": [instance.id]}
         )
+        inventory.refresh_soon()
     except Exception as e:
-        operation_status["status"] = f"❌ Failed to create instance: {str(e)}"
-    finally:
-        operation_status["in_progress"] = False
+        job.fail(f"❌ Failed to create instance: {str(e)}")
 
-def terminate_ec2_instance(region, instance_name):
+def terminate_ec2_instance(job, region, instance_name):
     print(f"[DEBUG] Termination requested in region: {region}")
-    if not region or not instance_name:
-        print("[ERROR] Missing region or instance name")
-        return
+    job.progress(f"🔍 Searching for instance **{instance_name}** in **{region}**...")
 
     try:
-        operation_status["in_progress"] = True
-        operation_status["status"] = f"🔍 Searching for instance **{instance_name}** in **{region}**..."
-
-        session = boto3.session.Session(region_name=region)
-        ec2 = session.resource("ec2")
+        ec2 = aws.resource("ec2", region)
 
         instances = ec2.instances.filter(
             Filters=[
@@ -230,42 +385,21 @@ def terminate_ec2_instance(region, instance_name):
         to_terminate = [i.id for i in instances]
 
         if not to_terminate:
-            operation_status["status"] = f"ℹ️ No instance named **{instance_name}** found running in **{region}**."
+            job.succeed(f"ℹ️ No instance named **{instance_name}** found running in **{region}**.")
             return
 
-        operation_status["status"] = f"🛑 Terminating instance(s): {', '.join(to_terminate)} in **{region}**..."
+        job.progress(f"🛑 Terminating instance(s): {', '.join(to_terminate)} in **{region}**...")
         ec2.instances.filter(InstanceIds=to_terminate).terminate()
 
-        session.client("ec2").get_waiter("instance_terminated").wait(InstanceIds=to_terminate)
+        watcher.wait(region, to_terminate, "terminated")
 
-        operation_status["status"] = f"✅ Instance(s) {', '.join(to_terminate)} successfully terminated in **{region}**."
+        job.succeed(
+            f"✅ Instance(s) {', '.join(to_terminate)} successfully terminated in **{region}**.",
+            result={"instance_ids": to_terminate}
+        )
+        inventory.refresh_soon()
         print("[DEBUG] Termination complete.")
 
     except Exception as e:
-        operation_status["status"] = f"❌ Termination failed: {str(e)}"
+        job.fail(f"❌ Termination failed: {str(e)}")
         print(f"[ERROR] EC2 termination failed: {str(e)}")
-
-    finally:
-        operation_status["in_progress"] = False
-
-def get_region_from_input(user_input: str) -> str:
-    region_keywords = {
-        "mumbai": "ap-south-1",
-        "singapore": "ap-southeast-1",
-        "sydney": "ap-southeast-2",
-        "frankfurt": "eu-central-1",
-        "london": "eu-west-2",
-        "ireland": "eu-west-1",
-        "virginia": "us-east-1",
-        "ohio": "us-east-2",
-        "california": "us-west-1",
-        "oregon": "us-west-2"
-    }
-    for keyword, code in region_keywords.items():
-        if keyword in user_input:
-            return code
-    for region in region_keywords.values():
-        if region in user_input:
-            return region
-    return ""
-
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How long a launch confirmation prompt (and the work prefetched for it) stays valid.
+CONFIRMATION_TTL = float(os.getenv("CONFIRMATION_TTL", "300"))
+
+CONFIRMATION_EXPIRED_REPLY = "⌛ That launch confirmation expired. Please ask for the launch again."
+
+
+class Prefetch:
+    # Speculative work started as soon as a confirmation prompt goes out, so
+    # the seconds spent typing "yes" are not wasted. Each step is a
+    # coroutine run as its own task; a failed step only loses its head start,
+    # since the real path redoes anything it is missing.
+    #
+    # On "yes", release() lets running steps finish into their caches. On
+    # "no" or expiry, discard() cancels what is still running. Both run the
+    # step's cleanup (e.g. unpinning a pre-rendered workspace) on its result.
+    def __init__(self, steps: dict, cleanup: dict | None = None, ttl: float = CONFIRMATION_TTL):
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + ttl
+        self.cleanup = cleanup or {}
+        self.tasks = {name: asyncio.ensure_future(step) for name, step in steps.items()}
+        self._closed = False
+        self._timer = asyncio.get_running_loop().call_later(ttl, self.discard)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def done(self) -> dict[str, str]:
+        # Step name -> "ready", "failed" or "running"; for logs and job progress.
+        return {name: "running" if not t.done() else "failed" if t.cancelled() or t.exception() else "ready"
+                for name, t in self.tasks.items()}
+
+    def describe(self) -> str:
+        return ", ".join(f"{name} {state}" for name, state in self.done().items())
+
+    def release(self):
+        self._close(cancel=False)
+
+    def discard(self):
+        self._close(cancel=True)
+
+    def _close(self, cancel: bool):
+        if self._closed:
+            return
+        self._closed = True
+        self._timer.cancel()
+        for name, task in self.tasks.items():
+            # Steps with a cleanup run to completion: cancelling one mid-way
+            # (e.g. inside a thread) could leave what it acquired behind.
+            if cancel and not task.done() and name not in self.cleanup:
+                task.cancel()
+            task.add_done_callback(lambda t, name=name: self._clean(name, t))
+
+    def _clean(self, name: str, task: asyncio.Future):
+        if task.cancelled() or task.exception() or name not in self.cleanup:
+            return
+        try:
+            self.cleanup[name](task.result())
+        except Exception as e:
+            print(f"⚠️ Prefetch cleanup for {name} failed: {e}")
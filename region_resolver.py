@@ -0,0 +1,188 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# === Commercial AWS regions and their aliases ===
+# Each region's code is always an alias too. Country aliases point at the
+# country's oldest region (e.g. "india" -> ap-south-1, "japan" -> ap-northeast-1).
+REGION_ALIASES: dict[str, list[str]] = {
+    "us-east-1": ["virginia", "n virginia", "north virginia", "northern virginia", "us east", "ashburn"],
+    "us-east-2": ["ohio", "columbus"],
+    "us-west-1": ["california", "n california", "north california", "northern california", "san francisco"],
+    "us-west-2": ["oregon", "us west", "portland"],
+    "af-south-1": ["cape town", "south africa", "africa"],
+    "ap-east-1": ["hong kong"],
+    "ap-east-2": ["taipei", "taiwan"],
+    "ap-south-1": ["mumbai", "bombay", "india"],
+    "ap-south-2": ["hyderabad"],
+    "ap-southeast-1": ["singapore"],
+    "ap-southeast-2": ["sydney", "australia"],
+    "ap-southeast-3": ["jakarta", "indonesia"],
+    "ap-southeast-4": ["melbourne"],
+    "ap-southeast-5": ["kuala lumpur", "malaysia"],
+    "ap-southeast-7": ["bangkok", "thailand"],
+    "ap-northeast-1": ["tokyo", "japan"],
+    "ap-northeast-2": ["seoul", "korea", "south korea"],
+    "ap-northeast-3": ["osaka"],
+    "ca-central-1": ["canada", "montreal", "canada central"],
+    "ca-west-1": ["calgary", "canada west"],
+    "eu-central-1": ["frankfurt", "germany"],
+    "eu-central-2": ["zurich", "switzerland"],
+    "eu-west-1": ["ireland", "dublin"],
+    "eu-west-2": ["london", "uk", "united kingdom", "england", "britain"],
+    "eu-west-3": ["paris", "france"],
+    "eu-south-1": ["milan", "italy"],
+    "eu-south-2": ["spain", "aragon", "madrid"],
+    "eu-north-1": ["stockholm", "sweden"],
+    "il-central-1": ["tel aviv", "israel"],
+    "me-south-1": ["bahrain"],
+    "me-central-1": ["uae", "dubai", "abu dhabi", "united arab emirates"],
+    "mx-central-1": ["mexico", "queretaro"],
+    "sa-east-1": ["sao paulo", "brazil"],
+}
+
+# Chat vocabulary that must never be "corrected" into a city (e.g. region -> oregon).
+FUZZY_STOPWORDS = {
+    "region", "regions", "instance", "instances", "create", "launch", "status", "terminate",
+    "destroy", "delete", "remove", "server", "servers", "details", "account", "please", "parts",
+    "people", "where", "which", "there", "their", "these", "those", "about",
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    # Strips accents ("São Paulo" -> "sao paulo") and keeps region codes such
+    # as "ap-south-1" together as a single token.
+    text = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode()
+    return TOKEN_PATTERN.findall(text)
+
+
+def edit_distance(a: str, b: str) -> int:
+    # Damerau-Levenshtein (optimal string alignment): "mumbia" -> "mumbai" is 1.
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+# === BK-tree for bounded fuzzy lookup ===
+class BKTree:
+    def __init__(self, words: list[str]):
+        self.root = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        if self.root is None:
+            self.root = (word, {})
+            return
+        node = self.root
+        while True:
+            d = edit_distance(word, node[0])
+            if d == 0:
+                return
+            if d not in node[1]:
+                node[1][d] = (word, {})
+                return
+            node = node[1][d]
+
+    def search(self, word: str, max_distance: int) -> list[tuple[int, str]]:
+        # Triangle inequality: only children at distance d±max_distance can match.
+        found, stack = [], [self.root] if self.root else []
+        while stack:
+            candidate, children = stack.pop()
+            d = edit_distance(word, candidate)
+            if d <= max_distance:
+                found.append((d, candidate))
+            for edge, child in children.items():
+                if d - max_distance <= edge <= d + max_distance:
+                    stack.append(child)
+        return sorted(found)
+
+
+# === Precomputed index ===
+class RegionResolver:
+    def __init__(self, aliases: dict[str, list[str]]):
+        self.index: dict[tuple[str, ...], str] = {}
+        for region, names in aliases.items():
+            for name in [region] + names:
+                self.index[tuple(tokenize(name))] = region
+        self.max_ngram = max(len(key) for key in self.index)
+        self.heads = {key[0] for key in self.index}
+        # Only single-word names of 5+ letters are fuzzy targets; short names
+        # like "uk" or "ohio" are one typo away from too many ordinary words.
+        # Typos in the first letter are rare, so one small BK-tree per first
+        # letter keeps each lookup to a handful of distance computations.
+        targets: dict[str, list[str]] = {}
+        for key in self.index:
+            if len(key) == 1 and len(key[0]) >= 5 and key[0].isalpha():
+                targets.setdefault(key[0][0], []).append(key[0])
+        self.fuzzy = {letter: BKTree(words) for letter, words in targets.items()}
+        self._fuzzy = lru_cache(maxsize=4096)(self._fuzzy_lookup)
+
+    def _fuzzy_lookup(self, token: str) -> str | None:
+        # The region name `token` is most likely a typo of, if any.
+        tree = self.fuzzy.get(token[0])
+        if tree is None or len(token) < 5 or token in FUZZY_STOPWORDS or not token.isalpha():
+            return None
+        max_distance = 1 if len(token) < 7 else 2
+        matches = tree.search(token, max_distance)
+        return matches[0][1] if matches else None
+
+    def find_all(self, text: str, fuzzy: bool = False) -> list[str]:
+        # Every region mentioned, in order of first mention, longest alias first
+        # at each position ("north virginia" wins over "virginia"). Fuzzy
+        # matches are off by default: everyday words sit one edit away from
+        # city names ("pairs", "parks" -> paris), so they only feed suggest().
+        tokens = tokenize(text)
+        regions, i = [], 0
+        while i < len(tokens):
+            n, region = 1, None
+            if tokens[i] in self.heads:
+                for n in range(min(self.max_ngram, len(tokens) - i), 0, -1):
+                    region = self.index.get(tuple(tokens[i:i + n]))
+                    if region:
+                        break
+            if region is None:
+                n, alias = 1, self._fuzzy(tokens[i]) if fuzzy else None
+                region = self.index[(alias,)] if alias else None
+            if region and region not in regions:
+                regions.append(region)
+            i += n
+        return regions
+
+    def find_first(self, text: str, default: str = "") -> str:
+        regions = self.find_all(text)
+        return regions[0] if regions else default
+
+    def suggest(self, text: str) -> tuple[str, str] | None:
+        # (region name, region) for the first word that looks like a typo of one.
+        for token in tokenize(text):
+            alias = self._fuzzy(token)
+            if alias:
+                return alias, self.index[(alias,)]
+        return None
+
+
+resolver = RegionResolver(REGION_ALIASES)
+
+
+def find_regions(text: str) -> list[str]:
+    return resolver.find_all(text)
+
+
+def get_region_from_input(text: str, default: str = "") -> str:
+    return resolver.find_first(text, default)
+
+
+def did_you_mean(text: str) -> str:
+    # Appended to "please specify a region" replies; never acted on by itself.
+    suggestion = resolver.suggest(text)
+    return f" Did you mean **{suggestion[0]}** ({suggestion[1]})?" if suggestion else ""
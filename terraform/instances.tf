@@ -0,0 +1,9 @@
+resource "aws_instance" "chatops_ec2" {
+  count         = var.instance_count
+  ami           = var.ami_id
+  instance_type = var.instance_type
+
+  tags = {
+    Name = "Terraform-Agent-Instance"
+  }
+}
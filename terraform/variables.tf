@@ -10,3 +10,7 @@ variable "instance_type" {
   type = string
 }
 
+variable "instance_count" {
+  type    = number
+  default = 1
+}
@@ -0,0 +1,207 @@
+import asyncio
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import shutil
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# TERRAFORM_BIN can point at a stub script to exercise this without terraform.
+TERRAFORM_BIN = os.getenv("TERRAFORM_BIN", "terraform")
+TERRAFORM_CONFIG_DIR = os.getenv("TERRAFORM_CONFIG_DIR", "terraform")
+TERRAFORM_RUNS_DIR = os.getenv("TERRAFORM_RUNS_DIR", ".terraform-runs")
+TERRAFORM_PLUGIN_CACHE = os.getenv("TF_PLUGIN_CACHE_DIR", ".terraform-plugin-cache")
+TERRAFORM_MAX_CONCURRENCY = int(os.getenv("TERRAFORM_MAX_CONCURRENCY", "4"))
+TERRAFORM_PLAN_CACHE_MAX = int(os.getenv("TERRAFORM_PLAN_CACHE_MAX", "8"))
+
+CONFIG_PATTERNS = ["*.tf", "*.tf.json", ".terraform.lock.hcl"]
+
+
+class TerraformError(Exception):
+    def __init__(self, command: str, returncode: int, output: list[str]):
+        self.command = command
+        self.returncode = returncode
+        self.output = output
+        tail = "\n".join(output[-5:])
+        super().__init__(f"terraform {command} exited with {returncode}" + (f":\n{tail}" if tail else ""))
+
+
+def state_identity(workdir: str) -> tuple[str, int]:
+    # (lineage, serial) of the local state; terraform bumps serial on every write.
+    try:
+        with open(os.path.join(workdir, "terraform.tfstate")) as f:
+            state = json.load(f)
+        return state.get("lineage", ""), int(state.get("serial", 0))
+    except (OSError, ValueError):
+        return "", 0
+
+
+class PlanCache:
+    # Saved plan files per region working dir, keyed on everything a plan
+    # depends on: the config, the variables and the state it was made
+    # against. Any change to one of them yields a new key, so a stale plan
+    # is never found; old entries are dropped LRU beyond `max_entries`.
+    def __init__(self, max_entries: int = TERRAFORM_PLAN_CACHE_MAX):
+        self.max_entries = max_entries
+
+    def key(self, config_hash: str, tfvars_file: str, workdir: str) -> str:
+        lineage, serial = state_identity(workdir)
+        digest = hashlib.sha256(config_hash.encode())
+        with open(tfvars_file, "rb") as f:
+            digest.update(f.read())
+        digest.update(f"{lineage}:{serial}".encode())
+        return digest.hexdigest()[:24]
+
+    def path(self, workdir: str, key: str) -> str:
+        return os.path.join(workdir, ".plans", f"{key}.tfplan")
+
+    def get(self, workdir: str, key: str) -> str | None:
+        path = self.path(workdir, key)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        return path
+
+    def put(self, workdir: str, key: str, plan_file: str) -> str:
+        path = self.path(workdir, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(plan_file, path)
+        plans = sorted(glob.glob(os.path.join(workdir, ".plans", "*.tfplan")), key=os.path.getmtime)
+        for old in plans[:max(0, len(plans) - self.max_entries)]:
+            self.discard(old)
+        return path
+
+    def discard(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class TerraformExecutor:
+    # Runs terraform locally as async subprocesses. Each region gets its own
+    # working directory (a copy of the config plus its own .terraform and
+    # state), so regions apply in parallel without fighting over a selected
+    # workspace; applies to the same region queue behind each other. All
+    # directories share one provider plugin cache, so providers are
+    # downloaded once, and init only re-runs when the config changes.
+    def __init__(self, config_dir: str = TERRAFORM_CONFIG_DIR, runs_dir: str = TERRAFORM_RUNS_DIR,
+                 binary: str = TERRAFORM_BIN, plugin_cache: str = TERRAFORM_PLUGIN_CACHE,
+                 max_concurrency: int = TERRAFORM_MAX_CONCURRENCY):
+        self.config_dir = os.path.abspath(config_dir)
+        self.runs_dir = os.path.abspath(runs_dir)
+        self.binary = binary
+        self.plugin_cache = os.path.abspath(plugin_cache)
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._region_locks: dict[str, asyncio.Lock] = {}
+        self.plans = PlanCache()
+        os.makedirs(self.plugin_cache, exist_ok=True)
+
+    def workdir(self, region: str) -> str:
+        return os.path.join(self.runs_dir, region)
+
+    def config_files(self) -> list[str]:
+        return sorted(f for pattern in CONFIG_PATTERNS for f in glob.glob(os.path.join(self.config_dir, pattern)))
+
+    def config_hash(self) -> str:
+        digest = hashlib.sha256()
+        for path in self.config_files():
+            digest.update(os.path.basename(path).encode() + b"\0")
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    async def plan(self, region: str, tfvars_file: str, on_output=None) -> str:
+        # Plans without applying; the plan file is cached for a later apply.
+        async with self._region_locks.setdefault(region, asyncio.Lock()), self._slots:
+            workdir = await self._prepare(region, on_output)
+            plan_file, _ = await self._plan(workdir, tfvars_file, on_output)
+            return plan_file
+
+    async def apply(self, region: str, tfvars_file: str, on_output=None):
+        async with self._region_locks.setdefault(region, asyncio.Lock()), self._slots:
+            workdir = await self._prepare(region, on_output)
+            plan_file, cached = await self._plan(workdir, tfvars_file, on_output)
+            try:
+                await self._apply(workdir, plan_file, on_output)
+            except TerraformError as e:
+                if not cached or not any("stale" in line.lower() for line in e.output):
+                    raise
+                # State moved underneath the saved plan (e.g. changed outside
+                # this host): plan afresh once.
+                self.plans.discard(plan_file)
+                plan_file, _ = await self._plan(workdir, tfvars_file, on_output)
+                await self._apply(workdir, plan_file, on_output)
+
+    async def _plan(self, workdir: str, tfvars_file: str, on_output) -> tuple[str, bool]:
+        key = self.plans.key(self.config_hash(), tfvars_file, workdir)
+        cached = self.plans.get(workdir, key)
+        if cached:
+            if on_output:
+                on_output(f"♻️ Reusing saved plan {key} (config, variables and state unchanged).")
+            return cached, True
+        tmp_plan = os.path.join(workdir, f".tfplan-{key}")
+        await self._run(workdir, ["plan", "-input=false", "-no-color", f"-var-file={os.path.abspath(tfvars_file)}",
+                                  f"-out={tmp_plan}"], on_output)
+        return self.plans.put(workdir, key, tmp_plan), False
+
+    async def _apply(self, workdir: str, plan_file: str, on_output):
+        await self._run(workdir, ["apply", "-input=false", "-no-color", "-auto-approve", plan_file], on_output)
+        # Applied plans are spent; the state serial has moved on anyway.
+        self.plans.discard(plan_file)
+
+    async def _prepare(self, region: str, on_output) -> str:
+        workdir = self.workdir(region)
+        os.makedirs(workdir, exist_ok=True)
+        wanted = {os.path.basename(p): p for p in self.config_files()}
+        for name in os.listdir(workdir):
+            if name not in wanted and any(fnmatch.fnmatch(name, p) for p in CONFIG_PATTERNS):
+                os.remove(os.path.join(workdir, name))
+        for name, src in wanted.items():
+            shutil.copy2(src, os.path.join(workdir, name))
+
+        marker = os.path.join(workdir, ".init-hash")
+        config_hash = self.config_hash()
+        initialized = os.path.isdir(os.path.join(workdir, ".terraform"))
+        if not initialized or _read(marker) != config_hash:
+            await self._run(workdir, ["init", "-input=false", "-no-color"], on_output)
+            with open(marker, "w") as f:
+                f.write(config_hash)
+        return workdir
+
+    async def _run(self, workdir: str, args: list[str], on_output=None):
+        env = {**os.environ, "TF_PLUGIN_CACHE_DIR": self.plugin_cache, "TF_IN_AUTOMATION": "1", "TF_INPUT": "0"}
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                self.binary, *args, cwd=workdir, env=env,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+            )
+        except OSError as e:
+            raise TerraformError(args[0], -1, [str(e)])
+        tail: deque[str] = deque(maxlen=50)
+        try:
+            async for raw in proc.stdout:
+                line = raw.decode(errors="replace").rstrip()
+                if not line:
+                    continue
+                tail.append(line)
+                if on_output:
+                    on_output(line)
+            returncode = await proc.wait()
+        except asyncio.CancelledError:
+            proc.terminate()
+            raise
+        if returncode != 0:
+            raise TerraformError(args[0], returncode, list(tail))
+
+
+def _read(path: str) -> str | None:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_CACHE_DB", "")
+# The chat apps build their LLM clients at import; no request is ever sent.
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("TOGETHER_API_KEY", "test")
+# Working directories main.py creates at import go to a scratch directory.
+_scratch = tempfile.mkdtemp(prefix="terraform-agent-tests-")
+os.environ.setdefault("TFVARS_WORKSPACE_DIR", os.path.join(_scratch, "tfvars"))
+os.environ.setdefault("TERRAFORM_RUNS_DIR", os.path.join(_scratch, "runs"))
+os.environ.setdefault("TF_PLUGIN_CACHE_DIR", os.path.join(_scratch, "plugins"))
@@ -0,0 +1,78 @@
+import time
+from types import SimpleNamespace
+import pytest
+import ami_resolver
+from ami_resolver import AMIResolver
+
+SOURCE = "resolve:ssm:/aws/service/ami-amazon-linux-latest/amzn2-ami-hvm-x86_64-gp2"
+
+
+@pytest.fixture
+def ssm(monkeypatch):
+    # Per-region GetParameters; a region listed in `down` raises.
+    state = SimpleNamespace(calls=[], down=set())
+
+    def client(service, region):
+        def get_parameters(Names):
+            state.calls.append(region)
+            if region in state.down:
+                raise RuntimeError(f"ssm down in {region}")
+            return {"Parameters": [{"Name": name, "Value": f"ami-{region}-{len(state.calls)}"} for name in Names]}
+        return SimpleNamespace(get_parameters=get_parameters)
+
+    monkeypatch.setattr(ami_resolver.aws, "client", client)
+    monkeypatch.setattr(ami_resolver.aws, "call", lambda fn: fn())
+    return state
+
+
+def test_literal_ids_pass_through_and_unknown_regions_have_none(ssm):
+    resolver = AMIResolver({"us-east-1": "ami-123", "ap-south-1": SOURCE})
+    assert resolver.resolve("us-east-1") == "ami-123"
+    assert resolver.resolve("eu-west-3") is None
+    assert ssm.calls == []
+
+
+def test_ssm_sources_resolve_once_and_are_cached(ssm):
+    resolver = AMIResolver({"ap-south-1": SOURCE})
+    assert resolver.resolve("ap-south-1") == "ami-ap-south-1-1"
+    assert resolver.resolve("ap-south-1") == "ami-ap-south-1-1"
+    assert ssm.calls == ["ap-south-1"]
+
+
+def test_images_fetches_only_missing_regions(ssm):
+    resolver = AMIResolver({"ap-south-1": SOURCE, "us-west-2": SOURCE, "eu-west-1": SOURCE})
+    resolver.resolve("ap-south-1")
+    images = resolver.images(["ap-south-1", "us-west-2", "eu-west-1", "mars-1"])
+    assert set(images) == {"ap-south-1", "us-west-2", "eu-west-1"}
+    assert sorted(ssm.calls) == ["ap-south-1", "eu-west-1", "us-west-2"]
+
+
+def test_unreachable_ssm_falls_back_to_last_good_id_then_the_source(ssm):
+    resolver = AMIResolver({"ap-south-1": SOURCE, "us-west-2": SOURCE})
+    good = resolver.resolve("ap-south-1")
+    ssm.down = {"ap-south-1", "us-west-2"}
+    resolver.refresh()
+    assert resolver.resolve("ap-south-1") == good
+    assert resolver.resolve("us-west-2") == SOURCE
+    snapshot = resolver.snapshot()
+    assert snapshot["ap-south-1"]["ami_id"] == good and "ssm down" in snapshot["ap-south-1"]["error"]
+    assert snapshot["us-west-2"]["ami_id"] is None
+
+
+def test_expired_ids_are_served_while_a_refresh_is_queued(ssm):
+    resolver = AMIResolver({"ap-south-1": SOURCE}, ttl=60)
+    good = resolver.resolve("ap-south-1")
+    resolver._cache["ap-south-1"] = (good, time.time() - 61)
+    assert resolver.resolve("ap-south-1") == good
+    assert resolver._wake.is_set()
+    assert ssm.calls == ["ap-south-1"]
+
+
+def test_background_refresh_prefetches_every_region(ssm):
+    resolver = AMIResolver({"ap-south-1": SOURCE, "us-west-2": SOURCE}, ttl=3600)
+    resolver.start()
+    deadline = time.monotonic() + 5
+    while len(resolver._cache) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    resolver.stop()
+    assert sorted(resolver._cache) == ["ap-south-1", "us-west-2"]
@@ -0,0 +1,244 @@
+import asyncio
+import httpx
+import pytest
+import azure_devops
+from azure_devops import AzureDevOpsClient, PipelineResolver, PipelineRunPoller
+from job_engine import Job
+
+
+def client_with(handler, retries: int = 3) -> AzureDevOpsClient:
+    api = AzureDevOpsClient("org", "project", "pat", retries=retries)
+    api._client = httpx.AsyncClient(base_url=api.base_url, headers=api.headers,
+                                    transport=httpx.MockTransport(handler))
+    return api
+
+
+def replies(*responses):
+    # Handler answering each request with the next response (or raising it).
+    seen = []
+
+    def handler(request: httpx.Request):
+        seen.append(request)
+        response = responses[min(len(seen), len(responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    return handler, seen
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays, real_sleep = [], asyncio.sleep
+
+    async def sleep(delay):
+        delays.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(azure_devops.asyncio, "sleep", sleep)
+    return delays
+
+
+def test_requests_carry_auth_and_api_version(sleeps):
+    handler, seen = replies(httpx.Response(200, json={"value": []}))
+    resp = asyncio.run(client_with(handler).get("/pipelines", params={"$top": 5}))
+    assert resp.status_code == 200
+    request = seen[0]
+    assert request.url.path == "/org/project/_apis/pipelines"
+    assert request.url.params["api-version"] == azure_devops.AZURE_API_VERSION
+    assert request.url.params["$top"] == "5"
+    assert request.headers["Authorization"].startswith("Basic ")
+    assert sleeps == []
+
+
+def test_get_retries_server_errors_honouring_retry_after(sleeps):
+    handler, seen = replies(httpx.Response(503, headers={"Retry-After": "7"}), httpx.Response(502),
+                            httpx.Response(200))
+    assert asyncio.run(client_with(handler).get("/pipelines")).status_code == 200
+    assert len(seen) == 3
+    assert sleeps[0] == 7
+    assert 0 <= sleeps[1] <= azure_devops.AZURE_HTTP_BACKOFF * 2
+
+
+def test_get_gives_up_after_the_retry_budget(sleeps):
+    handler, seen = replies(httpx.Response(500))
+    assert asyncio.run(client_with(handler, retries=2).get("/pipelines")).status_code == 500
+    assert len(seen) == 3 and len(sleeps) == 2
+
+
+def test_post_only_retries_when_the_run_never_started(sleeps):
+    # A 503 or a read timeout may have queued the run already: not retried.
+    handler, seen = replies(httpx.Response(503), httpx.Response(200))
+    assert asyncio.run(client_with(handler).post("/pipelines/1/runs", json={})).status_code == 503
+    assert len(seen) == 1
+
+    handler, seen = replies(httpx.ReadTimeout("slow"), httpx.Response(200))
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(client_with(handler).post("/pipelines/1/runs", json={}))
+    assert len(seen) == 1
+
+    # Throttled or never connected: safe to send again.
+    handler, seen = replies(httpx.Response(429), httpx.ConnectError("refused"), httpx.Response(200))
+    assert asyncio.run(client_with(handler).post("/pipelines/1/runs", json={})).status_code == 200
+    assert len(seen) == 3
+
+
+def test_client_is_opened_once_and_closed():
+    api = AzureDevOpsClient("org", "project", "pat")
+    api.start()
+    client = api._client
+    api.start()
+    assert api._client is client
+    asyncio.run(api.aclose())
+    assert api._client is None
+
+
+def pipelines_api(pages: list[list[dict]]):
+    # /pipelines served in pages chained by continuation tokens.
+    def handler(request: httpx.Request):
+        seen.append(request)
+        page = int(request.url.params.get("continuationToken", "0"))
+        headers = {"x-ms-continuationtoken": str(page + 1)} if page + 1 < len(pages) else {}
+        return httpx.Response(200, json={"value": pages[page]}, headers=headers)
+
+    seen = []
+    return client_with(handler), seen
+
+
+def test_resolver_pages_until_the_first_match_and_caches_it():
+    api, seen = pipelines_api([[{"id": 1, "name": "alpha"}], [{"id": 2, "name": "Deploy"}], [{"id": 3, "name": "zeta"}]])
+    resolver = PipelineResolver(api)
+
+    async def run():
+        assert await resolver.resolve("deploy") == 2
+        assert await resolver.resolve("DEPLOY") == 2
+
+    asyncio.run(run())
+    assert [r.url.params.get("continuationToken") for r in seen] == [None, "1"]
+
+
+def test_resolver_shares_concurrent_lookups_and_refetches_after_invalidate():
+    api, seen = pipelines_api([[{"id": 7, "name": "deploy"}]])
+    resolver = PipelineResolver(api)
+
+    async def run():
+        assert await asyncio.gather(*(resolver.resolve("deploy") for _ in range(5))) == [7] * 5
+        assert len(seen) == 1
+        resolver.invalidate("deploy")
+        assert await resolver.resolve("deploy") == 7
+
+    asyncio.run(run())
+    assert len(seen) == 2
+
+
+def test_resolver_returns_none_for_unknown_or_failing_lookups():
+    api, seen = pipelines_api([[{"id": 1, "name": "alpha"}], [{"id": 2, "name": "beta"}]])
+    assert asyncio.run(PipelineResolver(api).resolve("missing")) is None
+    assert len(seen) == 2
+
+    handler, _ = replies(httpx.Response(401))
+    assert asyncio.run(PipelineResolver(client_with(handler)).resolve("deploy")) is None
+
+
+def test_resolver_expires_cached_ids():
+    api, seen = pipelines_api([[{"id": 7, "name": "deploy"}]])
+    resolver = PipelineResolver(api, ttl=0)
+
+    async def run():
+        await resolver.resolve("deploy")
+        await resolver.resolve("deploy")
+
+    asyncio.run(run())
+    assert len(seen) == 2
+
+
+def runs_api(states: dict[int, list[dict]]):
+    # Each listing returns every run's next state (the last one repeats);
+    # runs missing from the listing are served by the single-run endpoint.
+    calls = []
+
+    def handler(request: httpx.Request):
+        calls.append(request.url.path)
+        if request.url.path.endswith("/runs"):
+            value = [{"id": run_id, **(history.pop(0) if len(history) > 1 else history[0])}
+                     for run_id, history in states.items() if run_id < 90]
+            return httpx.Response(200, json={"value": value})
+        run_id = int(request.url.path.rsplit("/", 1)[1])
+        return httpx.Response(200, json={"id": run_id, **states[run_id][0]})
+
+    return client_with(handler), calls
+
+
+def test_poller_lists_each_pipeline_once_per_tick_and_finishes_jobs():
+    api, calls = runs_api({10: [{"state": "inProgress"}, {"state": "completed", "result": "succeeded",
+                                                          "_links": {"web": {"href": "https://run/10"}}}],
+                           11: [{"state": "inProgress"}, {"state": "completed", "result": "failed"}]})
+    poller = PipelineRunPoller(api)
+    mumbai, oregon, failing = Job("create_ec2", "mumbai"), Job("create_ec2", "oregon"), Job("create_ec2", "tokyo")
+    done = []
+
+    async def run():
+        poller.track([mumbai, oregon], 1, 10, on_done=lambda: done.append(10))
+        poller.track([failing], 1, 11)
+        await poller._check(list(poller.runs.values()))
+        assert mumbai.state == "running" and "inProgress" in mumbai.message
+        await poller._check(list(poller.runs.values()))
+
+    asyncio.run(run())
+    assert calls == ["/org/project/_apis/pipelines/1/runs"] * 2
+    assert (mumbai.state, oregon.state, failing.state) == ("succeeded", "succeeded", "failed")
+    assert mumbai.result["url"] == "https://run/10" and mumbai.meta["run_id"] == 10
+    assert done == [10] and poller.runs == {}
+
+
+def test_poller_looks_up_runs_older_than_the_listing():
+    api, calls = runs_api({99: [{"state": "completed", "result": "canceled"}]})
+    poller = PipelineRunPoller(api)
+    job = Job("create_ec2", "mumbai")
+
+    async def run():
+        poller.track([job], 1, 99)
+        await poller._check(list(poller.runs.values()))
+
+    asyncio.run(run())
+    assert calls[-1] == "/org/project/_apis/pipelines/1/runs/99"
+    assert job.state == "cancelled"
+
+
+def test_poller_gives_up_after_the_run_timeout(monkeypatch):
+    api, _ = runs_api({10: [{"state": "inProgress"}]})
+    monkeypatch.setattr(azure_devops, "PIPELINE_RUN_TIMEOUT", -1)
+    poller = PipelineRunPoller(api)
+    job = Job("create_ec2", "mumbai")
+    done = []
+
+    async def run():
+        poller.track([job], 1, 10, on_done=lambda: done.append(True))
+        await poller._check(list(poller.runs.values()))
+
+    asyncio.run(run())
+    assert job.state == "failed" and "Gave up" in job.message
+    assert done == [True] and poller.runs == {}
+
+
+def test_poller_backs_off_and_runs_in_the_background(monkeypatch):
+    monkeypatch.setattr(azure_devops, "PIPELINE_POLL_MIN", 0.01)
+    api, calls = runs_api({10: [{"state": "notStarted"}, {"state": "inProgress"},
+                                {"state": "completed", "result": "succeeded"}]})
+    poller = PipelineRunPoller(api)
+    job = Job("create_ec2", "mumbai")
+
+    async def run():
+        poller.start()
+        poller.track([job], 1, 10)
+        run = poller.runs[10]
+        for _ in range(200):
+            if not job.active:
+                break
+            await asyncio.sleep(0.01)
+        await poller.stop()
+        return run
+
+    tracked = asyncio.run(run())
+    assert job.state == "succeeded" and len(calls) == 3
+    assert tracked.interval > 0.01
@@ -0,0 +1,52 @@
+import asyncio
+from types import SimpleNamespace
+from bulk_launch import is_launch_request, parse_launch_request
+from intent_router import INTENT_TABLE, IntentRouter
+
+
+def test_count_applies_per_region_by_default():
+    request = parse_launch_request("launch 20 t3.small instances across mumbai and oregon")
+    assert request.counts == {"ap-south-1": 20, "us-west-2": 20}
+    assert request.instance_type == "t3.small"
+
+
+def test_total_is_split_between_regions():
+    request = parse_launch_request("launch 5 instances in total across mumbai and oregon")
+    assert request.counts == {"ap-south-1": 3, "us-west-2": 2}
+
+
+def test_split_keeps_every_region_when_the_total_is_small():
+    request = parse_launch_request("create ec2 in mumbai and virginia, split")
+    assert request.counts == {"ap-south-1": 1, "us-east-1": 1}
+    assert "us-east-1" in request.describe()
+
+
+def test_count_led_launch_messages_route_to_create_ec2():
+    router = IntentRouter(INTENT_TABLE)
+    router.add_detector("create_ec2", is_launch_request)
+    for text in ["launch 20 instances across mumbai and oregon", "create 5 ec2 instances in mumbai",
+                 "spin up 3 t3.small servers in frankfurt and paris, split"]:
+        assert router.route(text) == "create_ec2", text
+    for text in ["how many instances in mumbai", "launch 20 instances", "what are 5 instances in terraform?"]:
+        assert router.route(text) != "create_ec2", text
+
+
+def test_main1_bulk_launch_waits_for_confirmation(monkeypatch):
+    import main1
+    submitted = []
+    monkeypatch.setattr(main1.amis, "images", lambda regions: dict.fromkeys(regions, "ami-1"))
+    monkeypatch.setattr(main1.aws, "client", lambda service, region=None: None)
+    monkeypatch.setattr(main1.jobs, "submit", lambda kind, *args, **kwargs: submitted.append((kind, args)) or
+                        SimpleNamespace(id="job1"))
+
+    async def run():
+        prompt = await main1.handle_intent("launch 20 instances across mumbai and oregon")
+        assert "Do you want to launch" in prompt and not submitted
+        assert await main1.handle_intent("no") == "❎ Bulk launch cancelled."
+        await main1.handle_intent("create 5 ec2 instances in mumbai")
+        assert "job1" in await main1.handle_intent("yes")
+
+    asyncio.run(run())
+    (kind, (title, fn, launch, image_for, name)), = submitted
+    assert kind == "bulk_launch" and launch.counts == {"ap-south-1": 5}
+    assert image_for == main1.amis.resolve
@@ -0,0 +1,63 @@
+import asyncio
+from coalescer import Coalescer
+
+
+def collector():
+    batches = []
+
+    async def flush(batch):
+        batches.append(batch)
+
+    return batches, flush
+
+
+def test_items_within_the_window_flush_as_one_batch():
+    batches, flush = collector()
+
+    async def run():
+        coalescer = Coalescer(flush, window=0.05, max_batch=10)
+        for item in range(3):
+            coalescer.add(item)
+        await asyncio.sleep(0.1)
+        coalescer.add(3)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    assert batches == [[0, 1, 2], [3]]
+
+
+def test_full_batch_flushes_without_waiting():
+    batches, flush = collector()
+
+    async def run():
+        coalescer = Coalescer(flush, window=10, max_batch=2)
+        for item in range(5):
+            coalescer.add(item)
+        await asyncio.sleep(0)
+        assert batches == [[0, 1], [2, 3]]
+        await coalescer.drain()
+
+    asyncio.run(run())
+    assert batches == [[0, 1], [2, 3], [4]]
+
+
+def test_slow_flush_does_not_hold_up_the_next_window():
+    started = []
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def flush(batch):
+            started.append(batch)
+            await gate.wait()
+
+        coalescer = Coalescer(flush, window=0.01, max_batch=10)
+        coalescer.add("a")
+        await asyncio.sleep(0.05)
+        coalescer.add("b")
+        await asyncio.sleep(0.05)
+        assert started == [["a"], ["b"]]
+        gate.set()
+        await coalescer.drain()
+
+    asyncio.run(run())
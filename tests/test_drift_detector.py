@@ -0,0 +1,17 @@
+from drift_detector import DRIFT_BATCH_SIZE, DriftDetector, LiveInstance
+
+
+def test_instance_id_filters_stay_within_the_ec2_limit(monkeypatch):
+    detector = DriftDetector(max_workers=1)
+    filters = []
+
+    def describe(region, region_filters):
+        filters.append(region_filters)
+        return [LiveInstance(i, "running", "t2.micro", "ami-1", []) for i in region_filters[0]["Values"]]
+
+    monkeypatch.setattr(detector, "_describe", describe)
+    ids = [f"i-{n:017x}" for n in range(450)]
+    live = detector._by_ids("ap-south-1", ids)
+    assert [i.id for i in live] == ids
+    assert [len(f[0]["Values"]) for f in filters] == [200, 200, 50]
+    assert DRIFT_BATCH_SIZE <= 200
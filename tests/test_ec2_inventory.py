@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+import pytest
+import ec2_inventory
+from ec2_inventory import EC2Inventory
+
+
+class FakeEC2:
+    # One region's DescribeInstances, as rows of the inventory's projection.
+    def __init__(self, rows=None, error=None):
+        self.rows = rows or []
+        self.error = error
+
+    def get_paginator(self, name):
+        return SimpleNamespace(paginate=lambda **kwargs: SimpleNamespace(search=self.search))
+
+    def search(self, projection):
+        if self.error:
+            raise RuntimeError(self.error)
+        return self.rows
+
+
+@pytest.fixture
+def regions(monkeypatch):
+    regions = {}
+    monkeypatch.setattr(ec2_inventory.aws, "client", lambda service, region: regions[region])
+    return regions
+
+
+def test_refresh_indexes_every_region(regions):
+    regions["ap-south-1"] = FakeEC2([["i-1", "running", "t2.micro", [{"Key": "Name", "Value": "web"}]],
+                                     ["i-2", "stopped", "t3.small", None]])
+    regions["us-west-2"] = FakeEC2([["i-3", "running", "t2.micro", []]])
+    inventory = EC2Inventory(regions)
+    inventory.refresh()
+
+    assert inventory.count() == 3
+    assert inventory.count("ap-south-1", state="running") == 1
+    assert inventory.count(instance_type="t2.micro") == 2
+    assert [r.instance_id for r in inventory.instances(tag=("Name", "web"))] == ["i-1"]
+    assert inventory.state_counts() == {"running": 2, "stopped": 1}
+    assert inventory.has("us-west-2") and inventory.age() is not None
+    assert inventory.errors() == {}
+
+
+def test_failed_refresh_keeps_the_last_snapshot(regions):
+    regions["ap-south-1"] = FakeEC2([["i-1", "running", "t2.micro", []]])
+    inventory = EC2Inventory(regions)
+    inventory.refresh()
+    regions["ap-south-1"].error = "throttled"
+    inventory.refresh()
+
+    assert inventory.count() == 1
+    assert inventory.has("ap-south-1")
+    assert inventory.errors() == {"ap-south-1": "throttled"}
+
+
+def test_total_instances_reports_errors_when_nothing_ever_loaded(regions, monkeypatch):
+    import main2
+    for region in ["ap-south-1", "us-west-2"]:
+        regions[region] = FakeEC2(error="Unable to locate credentials")
+    inventory = EC2Inventory(regions)
+    monkeypatch.setattr(main2, "inventory", inventory)
+    assert "still loading" in main2.get_total_instances()
+
+    inventory.refresh()
+    assert inventory.age() is None
+    for reply in [main2.get_total_instances(), main2.get_total_instances("us-west-2"), main2.list_instances()]:
+        assert reply.startswith("❌ Unable to load the instance inventory"), reply
+        assert "Unable to locate credentials" in reply
+    assert "ap-south-1, us-west-2" in main2.get_total_instances()
+    assert "ap-south-1" not in main2.get_total_instances("us-west-2")
@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+import instance_watcher
+from instance_watcher import InstanceWatcher
+
+
+class FakePaginator:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def paginate(self, Filters, PaginationConfig):
+        values = Filters[0]["Values"]
+        self.calls.append(values)
+        return SimpleNamespace(search=lambda projection: [[i, "running", "", "10.0.0.1"] for i in values])
+
+
+def test_describe_batches_stay_within_the_ec2_filter_limit(monkeypatch):
+    calls = []
+    client = SimpleNamespace(get_paginator=lambda name: FakePaginator(calls))
+    monkeypatch.setattr(instance_watcher.aws, "client", lambda service, region: client)
+    monkeypatch.setattr(instance_watcher.aws, "call", lambda fn: fn())
+
+    ids = [f"i-{n:017x}" for n in range(1000)]
+    found = InstanceWatcher()._describe("ap-south-1", ids)
+    assert sorted(found) == ids
+    assert [len(values) for values in calls] == [200] * 5
@@ -0,0 +1,19 @@
+from intent_router import router
+
+
+def test_terraform_state_requests_route_to_the_state_summary():
+    for text in ["show terraform state", "what is deployed in mumbai?", "what's deployed", "show deployed resources"]:
+        assert router.route(text) == "terraform_state", text
+
+
+def test_general_terraform_questions_go_to_the_llm():
+    for text in ["what is terraform state", "how does terraform state locking work?", "explain tf state files"]:
+        assert router.route(text) is None, text
+
+
+def test_drift_needs_a_drift_request():
+    for text in ["check drift in mumbai", "drift report", "is state in sync?", "run a full drift check"]:
+        assert router.route(text) == "drift", text
+    for text in ["my clock is out of sync", "why does terraform drift from real infrastructure?",
+                 "keep the replicas in sync"]:
+        assert router.route(text) is None, text
@@ -0,0 +1,44 @@
+import threading
+import time
+from job_engine import JobEngine
+from lock_manager import LockManager, resource_key
+
+
+def wait_for(predicate, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_job_waiting_on_a_lock_does_not_hold_a_worker():
+    engine = JobEngine(max_workers=2, max_queue=4, locks=LockManager())
+    mumbai = resource_key("ap-south-1", "Name=agent", account="test")
+    oregon = resource_key("us-west-2", "Name=agent", account="test")
+    release_terminate = threading.Event()
+
+    terminate = engine.submit("terminate_ec2", "terminate", lambda job: release_terminate.wait(5), keys=[mumbai])
+    wait_for(lambda: terminate.state == "running")
+    blocked = engine.submit("create_ec2", "launch mumbai", lambda job: None, keys=[mumbai], mode="read")
+    other = engine.submit("create_ec2", "launch oregon", lambda job: None, keys=[oregon], mode="read")
+
+    wait_for(lambda: other.state == "succeeded")
+    assert blocked.state == "queued"
+    assert "Waiting for" in blocked.message
+    release_terminate.set()
+    wait_for(lambda: blocked.state == "succeeded")
+    assert terminate.state == "succeeded"
+
+
+def test_failing_job_releases_its_locks():
+    locks = LockManager()
+    engine = JobEngine(max_workers=1, max_queue=1, locks=locks)
+    key = resource_key("ap-south-1", "Name=agent", account="test")
+
+    def boom(job):
+        raise RuntimeError("boom")
+
+    job = engine.submit("create_ec2", "boom", boom, keys=[key])
+    wait_for(lambda: not job.active)
+    assert job.state == "failed"
+    wait_for(lambda: not locks._locks)
@@ -0,0 +1,70 @@
+import asyncio
+import time
+from llm_cache import ResponseCache, SQLiteCacheTier, cache_key
+
+
+def test_normalized_prompts_share_a_key():
+    assert cache_key("What is a t2.micro?", "m", 0.0, "s") == cache_key("  what is a   T2.micro ", "m", 0.0, "s")
+    assert cache_key("what is a t2.micro", "m", 0.0, "s") != cache_key("what is a t2.micro", "m", 0.7, "s")
+
+
+def test_lru_evicts_by_entries_and_bytes():
+    async def run():
+        cache = ResponseCache(max_entries=2, max_bytes=10)
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        assert await cache.get("a") == "1"
+        await cache.set("c", "3")
+        assert await cache.get("b") is None
+        await cache.set("d", "12345678")
+        assert await cache.get("a") is None
+        assert await cache.get("d") == "12345678"
+        await cache.set("huge", "x" * 11)
+        assert await cache.get("huge") is None
+        assert cache.stats()["bytes"] <= 10
+
+    asyncio.run(run())
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    async def run():
+        cache = ResponseCache(ttl=10)
+        await cache.set("k", "v")
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 11)
+        assert await cache.get("k") is None
+        assert cache.stats()["entries"] == 0
+
+    asyncio.run(run())
+
+
+def test_identical_misses_share_one_fetch():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run():
+        cache = ResponseCache()
+        results = await asyncio.gather(*(cache.get_or_fetch("k", fetch) for _ in range(5)))
+        assert results == ["answer"] * 5
+        assert await cache.get_or_fetch("k", fetch) == "answer"
+        return cache
+
+    cache = asyncio.run(run())
+    assert len(calls) == 1
+    assert cache.shared == 4
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+
+    async def run():
+        await ResponseCache(disk=SQLiteCacheTier(path)).set("k", "v")
+        cache = ResponseCache(disk=SQLiteCacheTier(path))
+        assert await cache.get("k") == "v"
+        return cache
+
+    assert asyncio.run(run()).disk_hits == 1
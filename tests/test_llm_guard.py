@@ -0,0 +1,86 @@
+import asyncio
+import time
+import pytest
+from llm_cache import ResponseCache, SQLiteCacheTier
+from llm_guard import CircuitBreaker, CircuitOpenError, LLMGuard
+
+
+class FakePool:
+    def __init__(self):
+        self.timeout = 5
+        self.cache = ResponseCache()
+        self.calls = 0
+        self.fail = False
+
+    def cache_key(self, message: str) -> str:
+        return message
+
+    async def complete(self, message: str, timeout: float | None = None) -> str:
+        async def fetch():
+            self.calls += 1
+            if self.fail:
+                raise RuntimeError("provider down")
+            return f"answer to {message}"
+        return await self.cache.get_or_fetch(self.cache_key(message), fetch)
+
+
+def open_breaker(guard: LLMGuard, pool: FakePool):
+    pool.fail = True
+    for i in range(guard.breaker.failure_threshold):
+        with pytest.raises(RuntimeError):
+            asyncio.run(guard.complete(f"q{i}"))
+    assert guard.breaker.state == "open"
+    pool.fail = False
+
+
+def test_cache_hit_does_not_close_half_open_breaker():
+    pool = FakePool()
+    guard = LLMGuard(pool, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.05))
+    asyncio.run(pool.cache.set("cached", "from cache"))
+    open_breaker(guard, pool)
+    time.sleep(0.06)
+    calls = pool.calls
+
+    assert asyncio.run(guard.complete("cached")) == "from cache"
+    assert pool.calls == calls
+    assert guard.breaker.state == "open"
+
+    # The trial slot is still free for a call that really reaches a provider.
+    assert asyncio.run(guard.complete("fresh")) == "answer to fresh"
+    assert pool.calls == calls + 1
+    assert guard.breaker.state == "closed"
+
+
+def test_open_breaker_serves_cache_and_fails_fast_otherwise():
+    pool = FakePool()
+    guard = LLMGuard(pool, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    asyncio.run(pool.cache.set("cached", "from cache"))
+    open_breaker(guard, pool)
+
+    assert asyncio.run(guard.complete("cached")) == "from cache"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(guard.complete("uncached"))
+    assert guard.rejected == 1
+
+
+def test_each_miss_is_counted_once():
+    pool = FakePool()
+    guard = LLMGuard(pool)
+
+    async def run():
+        for message in ["a", "b", "c", "a"]:
+            await guard.complete(message)
+
+    asyncio.run(run())
+    assert (pool.cache.misses, pool.cache.hits) == (3, 1)
+
+
+def test_open_breaker_still_serves_the_disk_tier(tmp_path):
+    pool = FakePool()
+    pool.cache = ResponseCache(disk=SQLiteCacheTier(str(tmp_path / "cache.sqlite3")))
+    guard = LLMGuard(pool, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    asyncio.run(ResponseCache(disk=pool.cache.disk).set("on disk", "from disk"))
+    open_breaker(guard, pool)
+
+    assert asyncio.run(guard.complete("on disk")) == "from disk"
+    assert pool.cache.disk_hits == 1
@@ -0,0 +1,70 @@
+import threading
+import pytest
+from lock_manager import LockManager, LockTimeoutError, resource_key
+
+A = resource_key("ap-south-1", "Name=agent", account="test")
+B = resource_key("us-west-2", "Name=agent", account="test")
+
+
+def test_readers_share_and_writer_excludes():
+    locks = LockManager()
+    first = locks.acquire([A], "read")
+    second = locks.acquire([A], "read", timeout=0)
+    with pytest.raises(LockTimeoutError):
+        locks.acquire([A], "write", timeout=0)
+    first.release()
+    second.release()
+    locks.acquire([A], "write", timeout=0).release()
+    assert not locks._locks
+
+
+def test_fifo_writer_is_not_starved_by_later_readers():
+    locks = LockManager()
+    reader = locks.acquire([A], "read")
+    order = []
+    locks.acquire_then([A], lambda lease: (order.append("writer"), lease.release()), "write")
+    locks.acquire_then([A], lambda lease: (order.append("reader"), lease.release()), "read")
+    assert order == []
+    reader.release()
+    assert order == ["writer", "reader"]
+
+
+def test_acquire_then_grants_immediately_when_free():
+    locks = LockManager()
+    leases = []
+    locks.acquire_then([B, A], leases.append)
+    assert len(leases) == 1 and leases[0].keys == sorted([A, B])
+    leases[0].release()
+    assert not locks._locks
+
+
+def test_acquire_then_waits_for_every_key_without_blocking():
+    locks = LockManager()
+    held = locks.acquire([B])
+    leases, waits = [], []
+    locks.acquire_then([A, B], leases.append, on_wait=waits.append)
+    assert leases == [] and waits == [B]
+    # A is held by the pending request in the meantime.
+    with pytest.raises(LockTimeoutError):
+        locks.acquire([A], timeout=0)
+    held.release()
+    assert len(leases) == 1
+    leases[0].release()
+    assert not locks._locks
+
+
+def test_blocking_acquire_wakes_on_release_from_another_thread():
+    locks = LockManager()
+    held = locks.acquire([A])
+    got = threading.Event()
+
+    def worker():
+        with locks.acquire([A], timeout=5):
+            got.set()
+
+    t = threading.Thread(target=worker)
+    t.start()
+    assert not got.wait(0.05)
+    held.release()
+    t.join(5)
+    assert got.is_set()
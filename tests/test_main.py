@@ -0,0 +1,47 @@
+import asyncio
+import json
+import os
+import main
+from prefetch import Prefetch
+
+
+def test_only_a_top_ranked_yes_or_no_answers_a_launch_prompt(monkeypatch):
+    queued = []
+    monkeypatch.setattr(main, "prefetch_launch", lambda region: Prefetch({}))
+    monkeypatch.setattr(main, "describe_terraform_state", lambda region: f"state of {region}")
+    monkeypatch.setattr(main.launches, "add", queued.append)
+    monkeypatch.setattr(main, "session_state", {})
+
+    async def run():
+        assert "Confirm launch" in await main.handle_intent("create ec2 in mumbai")
+        # "n virginia" holds the cancel phrase "n", and "yes" is mentioned in passing.
+        assert await main.handle_intent("show terraform state in n virginia") == "state of us-east-1"
+        assert await main.handle_intent("what is deployed, yes in oregon") == "state of us-west-2"
+        assert "awaiting_creation_confirmation" in main.session_state
+        assert "queued" in await main.handle_intent("yes")
+
+    asyncio.run(run())
+    assert [job.meta["region"] for job in queued] == ["ap-south-1"]
+
+
+def test_drift_scan_reports_unreadable_state_files(tmp_path, monkeypatch):
+    good, corrupt = tmp_path / "good.tfstate", tmp_path / "corrupt.tfstate"
+    good.write_text(json.dumps({"version": 4, "serial": 1, "lineage": "l", "resources": [
+        {"mode": "managed", "type": "aws_instance", "name": "web",
+         "instances": [{"attributes": {"id": "i-1", "availability_zone": "ap-south-1a"}}]}]}))
+    corrupt.write_text('{"version": 4, "serial": 2, "resources": [')
+    scanned = []
+
+    def scan(entries, regions, full=False):
+        scanned.extend(e.id for e in entries)
+        return {"resources": len(entries), "checked": len(entries), "skipped": 0, "drift": [],
+                "errors": {"us-west-2": "throttled"}}
+
+    monkeypatch.setattr(main, "state_files", lambda: [str(good), str(corrupt), str(tmp_path / "missing.tfstate")])
+    monkeypatch.setattr(main.drift_detector, "scan", scan)
+
+    report = main.scan_drift()
+    assert scanned == ["i-1"]
+    assert set(report["errors"]) == {"us-west-2", os.path.relpath(corrupt), os.path.relpath(tmp_path / "missing.tfstate")}
+    reply = asyncio.run(main.handle_intent("check drift"))
+    assert "unreadable state" in reply and "throttled" in reply
@@ -0,0 +1,87 @@
+import asyncio
+from prefetch import Prefetch
+
+
+async def value(result, delay: float = 0):
+    await asyncio.sleep(delay)
+    return result
+
+
+async def boom():
+    raise RuntimeError("lookup failed")
+
+
+def test_steps_report_their_state():
+    async def run():
+        prefetch = Prefetch({"ami": value("ami-1"), "plan": value("plan", 10), "pipeline_id": boom()})
+        await asyncio.sleep(0.01)
+        assert prefetch.done() == {"ami": "ready", "plan": "running", "pipeline_id": "failed"}
+        assert prefetch.describe() == "ami ready, plan running, pipeline_id failed"
+        prefetch.discard()
+
+    asyncio.run(run())
+
+
+def test_release_lets_steps_finish_and_cleans_up_their_results():
+    cleaned = []
+
+    async def run():
+        prefetch = Prefetch({"tfvars": value("workspace", 0.02), "ami": value("ami-1", 0.02)},
+                            cleanup={"tfvars": cleaned.append})
+        prefetch.release()
+        await asyncio.sleep(0.05)
+        assert prefetch.done() == {"tfvars": "ready", "ami": "ready"}
+
+    asyncio.run(run())
+    assert cleaned == ["workspace"]
+
+
+def test_discard_cancels_steps_but_lets_steps_with_a_cleanup_finish():
+    cleaned = []
+
+    async def run():
+        prefetch = Prefetch({"tfvars": value("workspace", 0.02), "plan": value("plan", 10), "bad": boom()},
+                            cleanup={"tfvars": cleaned.append, "bad": cleaned.append})
+        await asyncio.sleep(0)
+        prefetch.discard()
+        prefetch.discard()
+        await asyncio.sleep(0.05)
+        assert prefetch.tasks["plan"].cancelled()
+        return prefetch
+
+    prefetch = asyncio.run(run())
+    assert prefetch.tasks["tfvars"].result() == "workspace"
+    # Cleanup runs once, and only for steps that produced something.
+    assert cleaned == ["workspace"]
+
+
+def test_expiry_discards_on_its_own():
+    cleaned = []
+
+    async def run():
+        prefetch = Prefetch({"tfvars": value("workspace"), "plan": value("plan", 10)},
+                            cleanup={"tfvars": cleaned.append}, ttl=0.02)
+        assert not prefetch.expired
+        await asyncio.sleep(0.05)
+        assert prefetch.expired
+        assert prefetch.tasks["plan"].cancelled()
+
+    asyncio.run(run())
+    assert cleaned == ["workspace"]
+
+
+def test_a_failing_cleanup_does_not_break_the_others(capsys):
+    cleaned = []
+
+    def broken(result):
+        raise OSError("disk full")
+
+    async def run():
+        prefetch = Prefetch({"a": value(1), "b": value(2)}, cleanup={"a": broken, "b": cleaned.append})
+        await asyncio.sleep(0)
+        prefetch.release()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert cleaned == [2]
+    assert "Prefetch cleanup for a failed: disk full" in capsys.readouterr().out
@@ -0,0 +1,28 @@
+from region_resolver import did_you_mean, find_regions, get_region_from_input, resolver
+
+
+def test_region_codes_resolve_exactly():
+    assert get_region_from_input("create ec2 in ap-south-1") == "ap-south-1"
+    assert find_regions("eu-west-3 and us-east-1") == ["eu-west-3", "us-east-1"]
+
+
+def test_aliases_resolve_longest_first():
+    assert get_region_from_input("launch in mumbai") == "ap-south-1"
+    assert get_region_from_input("terminate in north virginia") == "us-east-1"
+    assert get_region_from_input("show state in n virginia") == "us-east-1"
+    assert get_region_from_input("spin up vm in São Paulo") == "sa-east-1"
+
+
+def test_typos_are_only_suggested():
+    assert get_region_from_input("create ec2 in mumbia") == ""
+    assert resolver.suggest("create ec2 in mumbia") == ("mumbai", "ap-south-1")
+    assert "Did you mean **frankfurt** (eu-central-1)?" in did_you_mean("launch in frankfrut")
+    assert find_regions("create ec2 in mumbia") == []
+    assert resolver.find_all("create ec2 in mumbia", fuzzy=True) == ["ap-south-1"]
+
+
+def test_everyday_words_never_resolve():
+    for text in ["create ec2 in pairs", "terminate instances near the parks", "list my regions please"]:
+        assert get_region_from_input(text) == "", text
+    assert resolver.suggest("list my regions and instances please") is None
+    assert did_you_mean("create ec2 somewhere") == ""
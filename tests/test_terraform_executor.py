@@ -0,0 +1,89 @@
+import asyncio
+import json
+import os
+import shutil
+import pytest
+from terraform_executor import TerraformError, TerraformExecutor
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_terraform")
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "terraform")
+
+
+@pytest.fixture
+def executor(tmp_path, monkeypatch):
+    log = tmp_path / "commands.log"
+    monkeypatch.setenv("STUB_TERRAFORM_LOG", str(log))
+    config = tmp_path / "config"
+    config.mkdir()
+    for name in os.listdir(CONFIG_DIR):
+        if name.endswith(".tf"):
+            shutil.copy(os.path.join(CONFIG_DIR, name), config)
+    executor = TerraformExecutor(config_dir=str(config), runs_dir=str(tmp_path / "runs"), binary=STUB,
+                                 plugin_cache=str(tmp_path / "plugins"))
+    executor.commands = lambda: log.read_text().split() if log.exists() else []
+    return executor
+
+
+def tfvars(tmp_path, name: str = "run.tfvars.json", **values) -> str:
+    path = tmp_path / name
+    path.write_text(json.dumps({"aws_region": "ap-south-1", "instance_count": 1, **values}))
+    return str(path)
+
+
+def test_init_runs_once_and_plan_is_reused_by_apply(executor, tmp_path):
+    output = []
+    variables = tfvars(tmp_path)
+
+    async def run():
+        await executor.plan("ap-south-1", variables, output.append)
+        await executor.apply("ap-south-1", variables, output.append)
+        await executor.apply("ap-south-1", variables, output.append)
+
+    asyncio.run(run())
+    assert executor.commands() == ["init", "plan", "apply", "plan", "apply"]
+    assert sum("Reusing saved plan" in line for line in output) == 1
+
+
+def test_config_change_reinitializes(executor, tmp_path):
+    variables = tfvars(tmp_path)
+    asyncio.run(executor.plan("ap-south-1", variables))
+    with open(os.path.join(executor.config_dir, "extra.tf"), "w") as f:
+        f.write("# changed\n")
+    asyncio.run(executor.plan("ap-south-1", variables))
+    assert executor.commands() == ["init", "plan", "init", "plan"]
+
+
+def test_stale_plan_is_replanned_once(executor, tmp_path, monkeypatch):
+    variables = tfvars(tmp_path)
+    stale = tmp_path / "stale"
+    monkeypatch.setenv("STUB_TERRAFORM_STALE", str(stale))
+    asyncio.run(executor.plan("ap-south-1", variables))
+    stale.write_text("")
+    asyncio.run(executor.apply("ap-south-1", variables))
+    assert executor.commands() == ["init", "plan", "apply", "plan", "apply"]
+
+
+def test_failed_plan_raises_terraform_error(executor, tmp_path):
+    variables = tfvars(tmp_path, ami_id="fail")
+    with pytest.raises(TerraformError) as raised:
+        asyncio.run(executor.apply("ap-south-1", variables))
+    assert raised.value.command == "plan"
+    assert raised.value.returncode == 1
+    assert "Error: boom" in raised.value.output
+    assert executor.commands() == ["init", "plan"]
+
+
+def test_missing_binary_raises_terraform_error(executor, tmp_path):
+    executor.binary = str(tmp_path / "no-such-terraform")
+    with pytest.raises(TerraformError) as raised:
+        asyncio.run(executor.plan("ap-south-1", tfvars(tmp_path)))
+    assert raised.value.returncode == -1
+
+
+def test_repo_config_holds_only_terraform_files(tmp_path):
+    executor = TerraformExecutor(config_dir=CONFIG_DIR, runs_dir=str(tmp_path / "runs"), binary=STUB,
+                                 plugin_cache=str(tmp_path / "plugins"))
+    for path in executor.config_files():
+        with open(path) as f:
+            head = f.read(200)
+        assert not head.startswith(("import ", "from ")), f"{path} is not terraform"
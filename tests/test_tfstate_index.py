@@ -0,0 +1,85 @@
+import json
+import tfstate_index
+from tfstate_diff import StateDiffer, state_differ
+from tfstate_index import STATE_READ_CHUNK, parse_state
+
+
+def instance(index: int, instance_type: str = "t2.micro") -> dict:
+    return {"index_key": index, "schema_version": 1, "attributes": {
+        "id": f"i-{index:017x}", "ami": "ami-123", "instance_type": instance_type,
+        "availability_zone": "ap-south-1a", "user_data": "x" * 200, "tags": {"Name": f"fleet-{index}"},
+    }}
+
+
+def write_state(path, serial: int, resources: list[dict]):
+    path.write_text(json.dumps({"version": 4, "terraform_version": "1.8.5", "serial": serial,
+                                "lineage": "lineage-1", "outputs": {}, "resources": resources}, indent=2))
+
+
+def fleet(count: int, changed: int | None = None) -> dict:
+    return {"mode": "managed", "type": "aws_instance", "name": "fleet", "provider": "provider[\"aws\"]",
+            "instances": [instance(i, "t3.large" if i == changed else "t2.micro") for i in range(count)]}
+
+
+def test_parses_modules_data_sources_and_for_each(tmp_path):
+    path = tmp_path / "terraform.tfstate"
+    write_state(path, 3, [
+        {"mode": "data", "type": "aws_ami", "name": "ubuntu", "instances": [{"attributes": {"id": "ami-1"}}]},
+        {"module": "module.web", "mode": "managed", "type": "aws_instance", "name": "app",
+         "instances": [{"index_key": "blue", "attributes": {"id": "i-1", "availability_zone": "us-west-2b"}}]},
+        {"mode": "managed", "type": "aws_s3_bucket", "name": "logs",
+         "instances": [{"attributes": {"id": "logs", "arn": "arn:aws:s3:eu-west-1:1:logs"}}]},
+    ])
+    index = parse_state(str(path))
+    assert (index.serial, index.lineage, index.terraform_version) == (3, "lineage-1", "1.8.5")
+    assert sorted(index.entries) == ['aws_s3_bucket.logs', 'module.web.aws_instance.app["blue"]']
+    assert index.by_id["i-1"] == 'module.web.aws_instance.app["blue"]'
+    assert index.entries['module.web.aws_instance.app["blue"]'].region == "us-west-2"
+    assert index.entries["aws_s3_bucket.logs"].region == "eu-west-1"
+
+
+def test_large_single_resource_state_streams_per_instance(tmp_path, monkeypatch):
+    # One count-based resource several times larger than the read chunk.
+    count = 20000
+    path = tmp_path / "terraform.tfstate"
+    write_state(path, 1, [fleet(count)])
+    assert path.stat().st_size > 5 * STATE_READ_CHUNK
+
+    buffered = []
+    fill = tfstate_index._JSONStream._fill
+
+    def tracked_fill(stream, *args):
+        filled = fill(stream, *args)
+        buffered.append(len(stream.buf))
+        return filled
+
+    monkeypatch.setattr(tfstate_index._JSONStream, "_fill", tracked_fill)
+    index = parse_state(str(path))
+    assert len(index.entries) == count
+    assert index.entries["aws_instance.fleet[19999]"].id == f"i-{19999:017x}"
+    assert index.entries["aws_instance.fleet[0]"].attributes["tags"] == {"Name": "fleet-0"}
+    # Only the instance being decoded is buffered, never the whole resource.
+    assert max(buffered) < 2 * STATE_READ_CHUNK
+
+
+def test_diff_of_large_single_resource_state(tmp_path):
+    old, new = tmp_path / "old.tfstate", tmp_path / "new.tfstate"
+    write_state(old, 1, [fleet(5000)])
+    write_state(new, 2, [fleet(5001, changed=42)])
+    delta = state_differ.diff(str(old), str(new))
+    assert [a["address"] for a in delta["added"]] == ["aws_instance.fleet[5000]"]
+    assert [c["address"] for c in delta["changed"]] == ["aws_instance.fleet[42]"]
+    assert delta["changed"][0]["attributes"] == {"instance_type": {"before": "t2.micro", "after": "t3.large"}}
+    assert delta["unchanged"] == 4999
+
+
+def test_differ_keeps_only_the_latest_delta_per_pair(tmp_path):
+    old, new = tmp_path / "old.tfstate", tmp_path / "new.tfstate"
+    write_state(old, 1, [fleet(3)])
+    differ = StateDiffer()
+    for serial in range(2, 7):
+        write_state(new, serial, [fleet(3 + serial)])
+        delta = differ.diff(str(old), str(new))
+        assert len(delta["added"]) == serial
+        assert differ.diff(str(old), str(new)) is delta
+    assert len(differ._cache) == 1
@@ -0,0 +1,61 @@
+import json
+import os
+import pytest
+from tfvars_workspaces import TfvarsWorkspaces
+
+
+def age(workspace, seconds: float):
+    # Pushes a workspace's last use into the past; mtime is the LRU clock.
+    stamp = os.path.getmtime(workspace.path) - seconds
+    os.utime(workspace.path, (stamp, stamp))
+
+
+def test_identical_variables_share_one_workspace(tmp_path):
+    workspaces = TfvarsWorkspaces(str(tmp_path))
+    first = workspaces.acquire({"aws_region": "ap-south-1", "instance_count": 2})
+    second = workspaces.acquire({"instance_count": 2, "aws_region": "ap-south-1"})
+    other = workspaces.acquire({"aws_region": "us-west-2", "instance_count": 2})
+
+    assert first == second and first.path != other.path
+    assert json.load(open(first.tfvars_file)) == {"aws_region": "ap-south-1", "instance_count": 2}
+    assert workspaces._pins[first.digest] == 2
+    assert sorted(os.listdir(first.path)) == ["terraform.tfvars.json"]
+
+
+def test_failed_write_leaves_no_partial_file(tmp_path):
+    workspaces = TfvarsWorkspaces(str(tmp_path))
+    with pytest.raises(TypeError):
+        workspaces.acquire({"ami_id": object()})
+    leftovers = [name for _, _, files in os.walk(tmp_path) for name in files]
+    assert leftovers == []
+
+
+def test_unpinned_workspaces_are_collected_least_recently_used_first(tmp_path):
+    workspaces = TfvarsWorkspaces(str(tmp_path), max_entries=3)
+    old = workspaces.acquire({"n": 1})
+    recent = workspaces.acquire({"n": 2})
+    pinned = workspaces.acquire({"n": 3})
+    newest = workspaces.acquire({"n": 4})
+    # Everything is pinned, so the limit is exceeded rather than breaking a run.
+    assert len(os.listdir(tmp_path)) == 4
+
+    workspaces.release(old)
+    workspaces.release(recent)
+    age(old, 20)
+    age(recent, 10)
+    age(pinned, 30)
+    workspaces.acquire({"n": 4})
+    assert sorted(os.listdir(tmp_path)) == sorted([recent.digest, pinned.digest, newest.digest])
+
+
+def test_a_workspace_stays_pinned_until_its_last_release(tmp_path):
+    workspaces = TfvarsWorkspaces(str(tmp_path), max_entries=0)
+    shared = workspaces.acquire({"n": 1})
+    workspaces.acquire({"n": 1})
+    workspaces.release(shared)
+    workspaces.acquire({"n": 2})
+    assert os.path.exists(shared.tfvars_file)
+
+    workspaces.release(shared)
+    workspaces.acquire({"n": 3})
+    assert not os.path.exists(shared.path)
@@ -0,0 +1,109 @@
+import json
+import threading
+from tfstate_index import StateIndex, iter_instances, state_reader, value_digest
+
+# Long attribute values (user_data, policies...) are cut down in the delta.
+DIFF_VALUE_MAX_CHARS = 200
+
+
+def diff_attributes(before: dict, after: dict) -> dict[str, dict]:
+    # Attribute-level hashes: equal values are skipped without deep
+    # comparison of nested blocks.
+    changed = {}
+    for name in sorted(set(before) | set(after)):
+        old, new = before.get(name), after.get(name)
+        if name in before and name in after and value_digest(old) == value_digest(new):
+            continue
+        changed[name] = {"before": _short(old), "after": _short(new)}
+    return changed
+
+
+def _short(value):
+    if isinstance(value, (dict, list)):
+        text = json.dumps(value, sort_keys=True)
+        return value if len(text) <= DIFF_VALUE_MAX_CHARS else text[:DIFF_VALUE_MAX_CHARS] + "…"
+    if isinstance(value, str) and len(value) > DIFF_VALUE_MAX_CHARS:
+        return value[:DIFF_VALUE_MAX_CHARS] + "…"
+    return value
+
+
+def _collect_attributes(path: str, addresses: set[str]) -> dict[str, dict]:
+    # Second, targeted pass: full attributes for just the changed addresses.
+    found = {}
+    if not addresses:
+        return found
+    for _, address, attrs in iter_instances(path):
+        if address in addresses:
+            found[address] = attrs
+            if len(found) == len(addresses):
+                break
+    return found
+
+
+def _summary(entry) -> dict:
+    return {"address": entry.address, "type": entry.type, "id": entry.id, "region": entry.region}
+
+
+class StateDiffer:
+    # Compares two state snapshots. The cached indexes already carry a digest
+    # per resource instance, so unchanged resources are skipped without
+    # reading them again; only changed ones are re-streamed for their
+    # attribute values. Results are cached per (lineage, serial) pair.
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Only the latest delta per pair of paths is kept; a newer serial
+        # replaces it instead of piling up next to it.
+        self._cache: dict[tuple, tuple[tuple, dict]] = {}
+
+    def diff(self, old_path: str, new_path: str) -> dict:
+        old, new = state_reader.read(old_path), state_reader.read(new_path)
+        pair = (old.path, new.path)
+        version = (old.lineage, old.serial, new.lineage, new.serial)
+        with self._lock:
+            cached = self._cache.get(pair)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        delta = self._diff(old, new)
+        with self._lock:
+            self._cache[pair] = (version, delta)
+        return delta
+
+    def _diff(self, old: StateIndex, new: StateIndex) -> dict:
+        added = [a for a in new.entries if a not in old.entries]
+        removed = [a for a in old.entries if a not in new.entries]
+        changed = [a for a, e in new.entries.items() if a in old.entries and old.entries[a].digest != e.digest]
+
+        before = _collect_attributes(old.path, set(changed))
+        after = _collect_attributes(new.path, set(changed))
+        return {
+            "old": {"path": old.path, "serial": old.serial, "lineage": old.lineage},
+            "new": {"path": new.path, "serial": new.serial, "lineage": new.lineage},
+            "same_lineage": old.lineage == new.lineage,
+            "added": [_summary(new.entries[a]) for a in added],
+            "removed": [_summary(old.entries[a]) for a in removed],
+            "changed": [{
+                **_summary(new.entries[a]),
+                "attributes": diff_attributes(before.get(a, {}), after.get(a, {})),
+            } for a in changed],
+            "unchanged": len(new.entries) - len(added) - len(changed),
+        }
+
+
+def describe_delta(delta: dict, limit: int = 10) -> str:
+    old, new = delta["old"], delta["new"]
+    lines = [f"🧾 Serial {old['serial']} → {new['serial']}: "
+             f"**{len(delta['added'])}** added, **{len(delta['changed'])}** changed, "
+             f"**{len(delta['removed'])}** removed, {delta['unchanged']} unchanged."]
+    if not delta["same_lineage"]:
+        lines.append("⚠️ The snapshots have different lineages (not the same state history).")
+    for item in delta["added"][:limit]:
+        lines.append(f"  ➕ {item['address']} · {item['id']}")
+    for item in delta["removed"][:limit]:
+        lines.append(f"  ➖ {item['address']} · {item['id']}")
+    for item in delta["changed"][:limit]:
+        names = ", ".join(list(item["attributes"])[:6])
+        lines.append(f"  ✏️ {item['address']} · {item['id']}: {names}")
+    return "\n".join(lines)
+
+
+state_differ = StateDiffer()
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Iterator, NamedTuple
+
+STATE_READ_CHUNK = 1 << 20
+# Enough of the file to find serial/lineage, which terraform writes first.
+STATE_HEADER_BYTES = 4096
+
+# Attributes kept in the index; everything else stays on disk.
+KEY_ATTRIBUTES = [
+    "instance_type", "ami", "instance_state", "availability_zone", "private_ip", "public_ip",
+    "vpc_id", "subnet_id", "tags",
+]
+
+SERIAL_PATTERN = re.compile(r'"serial"\s*:\s*(\d+)')
+LINEAGE_PATTERN = re.compile(r'"lineage"\s*:\s*"([^"]*)"')
+REGION_FROM_ARN = re.compile(r"^arn:[^:]+:[^:]+:([a-z0-9-]+):")
+
+
+class StateEntry(NamedTuple):
+    address: str
+    type: str
+    id: str
+    region: str
+    attributes: dict
+    # Hash of the full attribute set, so two snapshots can be compared
+    # without keeping (or re-reading) every attribute.
+    digest: str
+
+
+class StateIndex:
+    def __init__(self, path: str, serial: int, lineage: str, terraform_version: str, entries: list[StateEntry]):
+        self.path = path
+        self.serial = serial
+        self.lineage = lineage
+        self.terraform_version = terraform_version
+        self.entries = {e.address: e for e in entries}
+        self.by_type: dict[str, list[str]] = {}
+        self.by_id: dict[str, str] = {}
+        for e in entries:
+            self.by_type.setdefault(e.type, []).append(e.address)
+            if e.id:
+                self.by_id[e.id] = e.address
+
+    def of_type(self, resource_type: str) -> list[StateEntry]:
+        return [self.entries[a] for a in self.by_type.get(resource_type, [])]
+
+
+class _JSONStream:
+    # Pulls JSON values out of a file one at a time with raw_decode, reading
+    # more text only when the current value is incomplete, so memory is
+    # bounded by the largest single value rather than the whole file. Each
+    # retry reads at least as much again as is buffered, so even a huge value
+    # is re-decoded only a logarithmic number of times.
+    WHITESPACE = " \t\r\n"
+
+    def __init__(self, f, chunk: int = STATE_READ_CHUNK):
+        self.f = f
+        self.chunk = chunk
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size: int = 0) -> bool:
+        if self.eof:
+            return False
+        data = self.f.read(max(self.chunk, size))
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("unexpected end of state file")
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos} of state buffer")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill(len(self.buf) - self.pos):
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk.
+            if end == len(self.buf) and not self.eof and self._fill(len(self.buf) - self.pos):
+                continue
+            self.pos = end
+            return value
+
+    def object_items(self) -> Iterator[str]:
+        # Yields each key of the object at the cursor; the caller must
+        # consume its value (value() or a nested array walk) before resuming.
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("}")
+            return
+
+    def array_items(self) -> Iterator:
+        for _ in self.elements():
+            yield self.value()
+
+    def elements(self) -> Iterator[None]:
+        # Like object_items for arrays: stops at each element, which the
+        # caller consumes (value() or a nested walk) before resuming.
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def value_digest(value) -> str:
+    return hashlib.blake2b(json.dumps(value, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+
+def instance_address(resource: dict, instance: dict) -> str:
+    base = f"{resource['module']}.{resource['type']}.{resource['name']}" if resource.get("module") \
+        else f"{resource['type']}.{resource['name']}"
+    index_key = instance.get("index_key")
+    return base if index_key is None else f"{base}[{json.dumps(index_key)}]"
+
+
+def instance_entry(resource: dict, address: str, attrs: dict) -> StateEntry:
+    return StateEntry(
+        address=address,
+        type=resource["type"],
+        id=str(attrs.get("id") or ""),
+        region=_region_of(attrs),
+        attributes={k: attrs[k] for k in KEY_ATTRIBUTES if attrs.get(k) not in (None, "", [], {})},
+        digest=value_digest(attrs),
+    )
+
+
+def _region_of(attrs: dict) -> str:
+    match = REGION_FROM_ARN.match(attrs.get("arn") or "")
+    if match:
+        return match.group(1)
+    zone = attrs.get("availability_zone") or ""
+    return zone[:-1] if zone else attrs.get("region", "")
+
+
+def iter_instances(path: str, header: dict | None = None) -> Iterator[tuple[dict, str, dict]]:
+    # Streams (resource fields, address, full attributes) for every instance
+    # of a managed resource; top-level fields land in `header`. A count or
+    # for_each fleet is one resource with thousands of instances, so each
+    # instance is decoded on its own rather than the resource as a whole.
+    with open(path, encoding="utf-8") as f:
+        stream = _JSONStream(f)
+        for key in stream.object_items():
+            if key != "resources":
+                value = stream.value()
+                if header is not None:
+                    header[key] = value
+                continue
+            for _ in stream.elements():
+                resource, early = {}, []
+                for field in stream.object_items():
+                    if field != "instances":
+                        resource[field] = stream.value()
+                    elif {"mode", "type", "name"} <= resource.keys():
+                        for instance in stream.array_items():
+                            if resource["mode"] == "managed":
+                                yield resource, instance_address(resource, instance), instance.get("attributes") or {}
+                    else:
+                        # Terraform writes instances last; this only covers hand-edited files.
+                        early = stream.value()
+                if resource.get("mode") == "managed":
+                    for instance in early:
+                        yield resource, instance_address(resource, instance), instance.get("attributes") or {}
+
+
+def parse_state(path: str) -> StateIndex:
+    header, entries = {}, []
+    for resource, address, attrs in iter_instances(path, header):
+        entries.append(instance_entry(resource, address, attrs))
+    return StateIndex(path, int(header.get("serial", 0)), header.get("lineage", ""),
+                      header.get("terraform_version", ""), entries)
+
+
+def read_header(path: str) -> tuple[int, str] | None:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        head = f.read(STATE_HEADER_BYTES)
+    serial, lineage = SERIAL_PATTERN.search(head), LINEAGE_PATTERN.search(head)
+    if not serial or not lineage:
+        return None
+    return int(serial.group(1)), lineage.group(1)
+
+
+class StateReader:
+    # Caches one index per state file. An unchanged file (same size and
+    # mtime) is served straight from cache; a touched file only gets a full
+    # re-parse when its serial or lineage actually changed.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache: dict[str, tuple[tuple[int, float], StateIndex]] = {}
+
+    def read(self, path: str) -> StateIndex:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = (st.st_size, st.st_mtime)
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached:
+            if cached[0] == stamp:
+                return cached[1]
+            index = cached[1]
+            if read_header(path) == (index.serial, index.lineage):
+                with self._lock:
+                    self._cache[path] = (stamp, index)
+                return index
+        index = parse_state(path)
+        with self._lock:
+            self._cache[path] = (stamp, index)
+        return index
+
+
+state_reader = StateReader()
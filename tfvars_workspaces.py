@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import NamedTuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TFVARS_WORKSPACE_DIR = os.getenv("TFVARS_WORKSPACE_DIR", ".tfvars_workspaces")
+TFVARS_WORKSPACE_MAX = int(os.getenv("TFVARS_WORKSPACE_MAX", "64"))
+TFVARS_FILENAME = "terraform.tfvars.json"
+
+
+class Workspace(NamedTuple):
+    digest: str
+    path: str
+    tfvars_file: str
+
+
+def tfvars_digest(tfvars: dict) -> str:
+    canonical = json.dumps(tfvars, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+class TfvarsWorkspaces:
+    # Every variable set gets its own directory named after its content hash,
+    # so concurrent runs never write the same file and identical sets share
+    # one directory. Files are written to a temp file and renamed into place,
+    # so a reader never sees a half-written tfvars.
+    #
+    # Workspaces in use by a run are pinned; the least recently used unpinned
+    # ones are removed once there are more than `max_entries`.
+    def __init__(self, root: str = TFVARS_WORKSPACE_DIR, max_entries: int = TFVARS_WORKSPACE_MAX):
+        self.root = root
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pins: dict[str, int] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def acquire(self, tfvars: dict) -> Workspace:
+        digest = tfvars_digest(tfvars)
+        path = os.path.join(self.root, digest)
+        tfvars_file = os.path.join(path, TFVARS_FILENAME)
+        with self._lock:
+            self._pins[digest] = self._pins.get(digest, 0) + 1
+            if os.path.exists(tfvars_file):
+                os.utime(path)
+            else:
+                os.makedirs(path, exist_ok=True)
+                _atomic_write_json(tfvars_file, tfvars)
+            self._gc()
+        return Workspace(digest, path, tfvars_file)
+
+    def release(self, workspace: Workspace):
+        with self._lock:
+            count = self._pins.get(workspace.digest, 0) - 1
+            if count > 0:
+                self._pins[workspace.digest] = count
+            else:
+                self._pins.pop(workspace.digest, None)
+            os.utime(workspace.path)
+
+    def _gc(self):
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isdir(path):
+                entries.append((os.path.getmtime(path), name, path))
+        excess = len(entries) - self.max_entries
+        for _, name, path in sorted(entries):
+            if excess <= 0:
+                break
+            if name not in self._pins:
+                shutil.rmtree(path, ignore_errors=True)
+                excess -= 1
+
+
+def _atomic_write_json(path: str, data: dict):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise